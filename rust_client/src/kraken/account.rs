@@ -8,6 +8,19 @@ pub struct OrderResponse {
     pub description: String,
 }
 
+/// Most orders Kraken accepts in one AddOrderBatch call.
+pub const MAX_ADD_BATCH: usize = 15;
+/// Most txids Kraken accepts in one CancelOrderBatch call.
+pub const MAX_CANCEL_BATCH: usize = 50;
+
+/// Outcome of one order in an AddOrderBatch call, in request order.
+#[derive(Debug)]
+pub struct BatchOrderResult {
+    pub txid: Option<String>,
+    pub description: String,
+    pub error: Option<String>,
+}
+
 #[derive(Debug, Deserialize)]
 pub struct OrderDescription {
     pub pair: String,
@@ -76,11 +89,12 @@ impl KrakenClient {
         let body = format!("nonce={}", nonce);
 
         let path = "/0/private/OpenOrders";
-        let url = format!("https://api.kraken.com{}", path);
+        let url = format!("{}{}", self.base_url, path);
 
         let message = self.create_signature_message(path, &nonce, &body);
         let signature = self.sign_message(&message)?;
 
+        let sent = body.len();
         let response = self.client
             .post(&url)
             .header("API-Key", &self.api_key)
@@ -90,8 +104,7 @@ impl KrakenClient {
             .send()
             .map_err(KrakenError::HttpError)?;
 
-        let json_text = response.text()
-            .map_err(|e| KrakenError::ParseError(e.to_string()))?;
+        let json_text = self.read_text("OpenOrders", sent, response)?;
 
         Ok(json_text)
     }
@@ -101,11 +114,12 @@ impl KrakenClient {
         let body = format!("nonce={}&txid={}", nonce, txid);
 
         let path = "/0/private/CancelOrder";
-        let url = format!("https://api.kraken.com{}", path);
+        let url = format!("{}{}", self.base_url, path);
 
         let message = self.create_signature_message(path, &nonce, &body);
         let signature = self.sign_message(&message)?;
 
+        let sent = body.len();
         let response = self.client
             .post(&url)
             .header("API-Key", &self.api_key)
@@ -115,8 +129,7 @@ impl KrakenClient {
             .send()
             .map_err(KrakenError::HttpError)?;
 
-        let json: serde_json::Value = response.json()
-            .map_err(|e| KrakenError::ParseError(e.to_string()))?;
+        let json = self.read_json("CancelOrder", sent, response)?;
 
         if let Some(errors) = json.get("error").and_then(serde_json::Value::as_array) {
             if !errors.is_empty() {
@@ -141,11 +154,12 @@ impl KrakenClient {
         let body = format!("nonce={}", nonce);
 
         let path = "/0/private/Balance";
-        let url = format!("https://api.kraken.com{}", path);
+        let url = format!("{}{}", self.base_url, path);
 
         let message = self.create_signature_message(path, &nonce, &body);
         let signature = self.sign_message(&message)?;
 
+        let sent = body.len();
         let response = self.client
             .post(&url)
             .header("API-Key", &self.api_key)
@@ -155,8 +169,7 @@ impl KrakenClient {
             .send()
             .map_err(KrakenError::HttpError)?;
 
-        let json: serde_json::Value = response.json()
-            .map_err(|e| KrakenError::ParseError(e.to_string()))?;
+        let json = self.read_json("Balance", sent, response)?;
 
         if let Some(errors) = json.get("error").and_then(serde_json::Value::as_array) {
             if !errors.is_empty() {
@@ -208,11 +221,12 @@ impl KrakenClient {
             .join("&");
 
         let path = "/0/private/AddOrder";
-        let url = format!("https://api.kraken.com{}", path);
+        let url = format!("{}{}", self.base_url, path);
 
         let message = self.create_signature_message(path, &nonce, &body);
         let signature = self.sign_message(&message)?;
 
+        let sent = body.len();
         let response = self.client
             .post(&url)
             .header("API-Key", &self.api_key)
@@ -222,8 +236,7 @@ impl KrakenClient {
             .send()
             .map_err(KrakenError::HttpError)?;
 
-        let json: serde_json::Value = response.json()
-            .map_err(|e| KrakenError::ParseError(e.to_string()))?;
+        let json = self.read_json("AddOrder", sent, response)?;
 
         if let Some(errors) = json.get("error").and_then(serde_json::Value::as_array) {
             if !errors.is_empty() {
@@ -254,4 +267,101 @@ impl KrakenClient {
             description,
         })
     }
-}
\ No newline at end of file
+
+    // Signs and posts a JSON body; used by the batch endpoints, which do
+    // not accept form-encoded order lists.
+    fn post_private_json(&self, path: &str, mut body: serde_json::Value) -> Result<serde_json::Value, KrakenError> {
+        let nonce = self.generate_nonce();
+        body["nonce"] = serde_json::Value::String(nonce.clone());
+        let body = body.to_string();
+
+        let url = format!("{}{}", self.base_url, path);
+        let message = self.create_signature_message(path, &nonce, &body);
+        let signature = self.sign_message(&message)?;
+
+        let sent = body.len();
+        let response = self.client
+            .post(&url)
+            .header("API-Key", &self.api_key)
+            .header("API-Sign", signature)
+            .header("Content-Type", "application/json")
+            .body(body)
+            .send()
+            .map_err(KrakenError::HttpError)?;
+
+        let endpoint = path.rsplit('/').next().unwrap_or(path);
+        let json = self.read_json(endpoint, sent, response)?;
+
+        if let Some(errors) = json.get("error").and_then(serde_json::Value::as_array) {
+            if !errors.is_empty() {
+                return Err(KrakenError::ParseError(
+                    format!("Kraken API error: {:?}", errors)
+                ));
+            }
+        }
+
+        json.get("result")
+            .cloned()
+            .ok_or_else(|| KrakenError::MissingField("result".to_string()))
+    }
+
+    /// Places up to `MAX_ADD_BATCH` limit orders on one pair with a single
+    /// signed AddOrderBatch call. `orders` holds (side, price, volume).
+    pub fn add_order_batch(&self, pair: &str, orders: &[(String, f64, f64)]) -> Result<Vec<BatchOrderResult>, KrakenError> {
+        if orders.len() < 2 || orders.len() > MAX_ADD_BATCH {
+            return Err(KrakenError::ParseError(
+                format!("AddOrderBatch takes 2 to {} orders, got {}", MAX_ADD_BATCH, orders.len())
+            ));
+        }
+
+        let mut entries = Vec::with_capacity(orders.len());
+        for (side, price, volume) in orders {
+            let side_lower = side.to_lowercase();
+            if side_lower != "buy" && side_lower != "sell" {
+                return Err(KrakenError::ParseError(
+                    "Side must be 'buy' or 'sell'".to_string()
+                ));
+            }
+            entries.push(serde_json::json!({
+                "ordertype": "limit",
+                "type": side_lower,
+                "volume": volume.to_string(),
+                "price": price.to_string(),
+            }));
+        }
+
+        let body = serde_json::json!({ "pair": pair, "orders": entries });
+        let result = self.post_private_json("/0/private/AddOrderBatch", body)?;
+
+        let placed = result.get("orders")
+            .and_then(|o| o.as_array())
+            .ok_or_else(|| KrakenError::ParseError("Missing orders array".to_string()))?;
+
+        Ok(placed.iter().map(|order| BatchOrderResult {
+            txid: order.get("txid").and_then(|t| t.as_str()).map(|t| t.to_string()),
+            description: order.get("descr")
+                .and_then(|d| d.get("order"))
+                .and_then(|o| o.as_str())
+                .unwrap_or("No description available")
+                .to_string(),
+            error: order.get("error").and_then(|e| e.as_str()).map(|e| e.to_string()),
+        }).collect())
+    }
+
+    /// Cancels up to `MAX_CANCEL_BATCH` orders with one signed
+    /// CancelOrderBatch call and returns how many were cancelled.
+    pub fn cancel_order_batch(&self, txids: &[String]) -> Result<u64, KrakenError> {
+        if txids.is_empty() || txids.len() > MAX_CANCEL_BATCH {
+            return Err(KrakenError::ParseError(
+                format!("CancelOrderBatch takes 1 to {} txids, got {}", MAX_CANCEL_BATCH, txids.len())
+            ));
+        }
+
+        let body = serde_json::json!({ "orders": txids });
+        let result = self.post_private_json("/0/private/CancelOrderBatch", body)?;
+
+        result.get("count")
+            .and_then(|c| c.as_u64())
+            .ok_or_else(|| KrakenError::ParseError("Missing count field".to_string()))
+    }
+}
@@ -20,11 +20,288 @@ where
     }
 }
 
+/// Number of pairs sent per Ticker request by `get_quotes`.
+pub const DEFAULT_QUOTE_CHUNK: usize = 50;
+
+/// Ticker requests `get_quotes` keeps in flight at once.
+const MAX_PARALLEL_CHUNKS: usize = 4;
+
+/// Columnar quote snapshot for many pairs.
+///
+/// Row `i` of every column belongs to `pairs[i]`, named as the caller
+/// requested it. Pairs that could not be quoted are listed in `errors`.
+/// `requests` counts the Ticker requests sent, retries of rejected chunks
+/// included, so callers can charge them to a rate limiter.
+#[derive(Debug, Default)]
+pub struct Quotes {
+    pub pairs: Vec<String>,
+    pub bid: Vec<f64>,
+    pub bid_volume: Vec<f64>,
+    pub ask: Vec<f64>,
+    pub ask_volume: Vec<f64>,
+    pub last: Vec<f64>,
+    pub volume: Vec<f64>,
+    pub errors: HashMap<String, String>,
+    pub requests: usize,
+}
+
+// Reduces a pair name to a comparable form: "XBT/USD", "XBTUSD" and
+// "XXBTZUSD" all become "XBTUSD".
+fn normalize_pair(pair: &str) -> String {
+    let mut name: String = pair.to_uppercase().chars().filter(|c| *c != '/').collect();
+    let bytes = name.as_bytes();
+    if bytes.len() == 8
+        && (bytes[0] == b'X' || bytes[0] == b'Z')
+        && (bytes[4] == b'X' || bytes[4] == b'Z')
+    {
+        name = format!("{}{}", &name[1..4], &name[5..]);
+    }
+    if let Some(rest) = name.strip_prefix("BTC") {
+        name = format!("XBT{}", rest);
+    } else if let Some(rest) = name.strip_prefix("DOGE") {
+        name = format!("XDG{}", rest);
+    }
+    name
+}
+
+// Kraken rejects a whole Ticker request when one of its pairs is unknown.
+fn is_unknown_pair(error: &KrakenError) -> bool {
+    matches!(error, KrakenError::ParseError(message) if message.contains("EQuery:Unknown asset pair"))
+}
+
+fn parse_level(value: &serde_json::Value, index: usize) -> f64 {
+    value.get(index)
+        .and_then(|v| v.as_str())
+        .and_then(|s| s.parse().ok())
+        .unwrap_or(0.0)
+}
+
+impl Quotes {
+    fn push(&mut self, pair: &str, data: &serde_json::Value) {
+        self.pairs.push(pair.to_string());
+        self.ask.push(parse_level(&data["a"], 0));
+        self.ask_volume.push(parse_level(&data["a"], 2));
+        self.bid.push(parse_level(&data["b"], 0));
+        self.bid_volume.push(parse_level(&data["b"], 2));
+        self.last.push(parse_level(&data["c"], 0));
+        // v[1] is the rolling 24h volume
+        self.volume.push(parse_level(&data["v"], 1));
+    }
+
+    fn append(&mut self, other: Quotes) {
+        self.pairs.extend(other.pairs);
+        self.bid.extend(other.bid);
+        self.bid_volume.extend(other.bid_volume);
+        self.ask.extend(other.ask);
+        self.ask_volume.extend(other.ask_volume);
+        self.last.extend(other.last);
+        self.volume.extend(other.volume);
+        self.errors.extend(other.errors);
+        self.requests += other.requests;
+    }
+}
+
+/// Default number of levels per side for `get_orderbook`.
+pub const DEFAULT_BOOK_DEPTH: usize = 100;
+
+/// Order book levels stored column-wise so each column can be handed to
+/// NumPy without building per-level Python objects.
+#[derive(Debug, Default)]
+pub struct OrderBook {
+    pub bid_price: Vec<f64>,
+    pub bid_volume: Vec<f64>,
+    pub bid_time: Vec<f64>,
+    pub ask_price: Vec<f64>,
+    pub ask_volume: Vec<f64>,
+    pub ask_time: Vec<f64>,
+}
+
+/// Best bid and ask with sizes, taken from one Depth response.
+#[derive(Debug, Clone)]
+pub struct TopOfBook {
+    pub bid: f64,
+    pub bid_volume: f64,
+    pub ask: f64,
+    pub ask_volume: f64,
+    /// Exchange timestamp of the most recent of the two levels (seconds)
+    pub timestamp: f64,
+}
+
+fn parse_depth_level(level: &serde_json::Value) -> Result<(f64, f64, f64), KrakenError> {
+    let field = |i: usize| -> Result<f64, KrakenError> {
+        let value = &level[i];
+        value.as_str()
+            .and_then(|s| s.parse().ok())
+            .or_else(|| value.as_f64())
+            .ok_or_else(|| KrakenError::ParseError(format!("Invalid depth level: {}", level)))
+    };
+    Ok((field(0)?, field(1)?, field(2)?))
+}
+
 impl KrakenClient {
+    fn get_depth(&self, pair: &str, count: usize) -> Result<serde_json::Value, KrakenError> {
+        let url = format!(
+            "{}/0/public/Depth?pair={}&count={}",
+            self.base_url, pair, count
+        );
+
+        let response = self
+            .client
+            .get(&url)
+            .send()
+            .map_err(KrakenError::HttpError)?;
+
+        let json = self.read_json("Depth", 0, response)?;
+
+        if let Some(errors) = json.get("error").and_then(serde_json::Value::as_array) {
+            if !errors.is_empty() {
+                return Err(KrakenError::ParseError(
+                    format!("Kraken API error: {:?}", errors)
+                ));
+            }
+        }
+
+        json.get("result")
+            .and_then(|r| r.as_object())
+            .and_then(|r| r.values().next())
+            .cloned()
+            .ok_or_else(|| KrakenError::MissingField("result".to_string()))
+    }
+
+    /// Best bid/ask, sizes and exchange timestamp from a single request.
+    pub fn get_top_of_book(&self, pair: &str) -> Result<TopOfBook, KrakenError> {
+        let book = self.get_depth(pair, 1)?;
+        let (bid, bid_volume, bid_ts) = parse_depth_level(&book["bids"][0])?;
+        let (ask, ask_volume, ask_ts) = parse_depth_level(&book["asks"][0])?;
+
+        Ok(TopOfBook {
+            bid,
+            bid_volume,
+            ask,
+            ask_volume,
+            timestamp: bid_ts.max(ask_ts),
+        })
+    }
+
+    /// Ticker for several pairs in one request.
+    ///
+    /// Unlike `get_ticker`, Kraken errors are surfaced, so an unknown pair
+    /// fails the whole request.
+    pub fn get_tickers(&self, pairs: &[String]) -> Result<serde_json::Map<String, serde_json::Value>, KrakenError> {
+        let url = format!(
+            "{}/0/public/Ticker?pair={}",
+            self.base_url, pairs.join(",")
+        );
+
+        let response = self
+            .client
+            .get(&url)
+            .send()
+            .map_err(KrakenError::HttpError)?;
+
+        let json = self.read_json("Ticker", 0, response)?;
+
+        if let Some(errors) = json.get("error").and_then(serde_json::Value::as_array) {
+            if !errors.is_empty() {
+                return Err(KrakenError::ParseError(
+                    format!("Kraken API error: {:?}", errors)
+                ));
+            }
+        }
+
+        json.get("result")
+            .and_then(|r| r.as_object())
+            .cloned()
+            .ok_or_else(|| KrakenError::MissingField("result".to_string()))
+    }
+
+    /// Bid, ask, last and volume for many pairs in `chunk_size`-pair requests.
+    ///
+    /// A chunk that Kraken rejects because of an unknown pair is split in
+    /// half and retried, so a bad pair costs a few extra requests instead of
+    /// failing the sweep. Any other error fails the chunk's pairs as is.
+    pub fn get_quotes(&self, pairs: &[String], chunk_size: usize) -> Quotes {
+        let chunks: Vec<&[String]> = pairs.chunks(chunk_size.max(1)).collect();
+        let mut quotes = Quotes::default();
+        if chunks.len() == 1 {
+            self.collect_quotes(chunks[0], &mut quotes);
+            return quotes;
+        }
+        // Chunks are fetched on scoped threads sharing the connection pool
+        // and appended in request order.
+        for batch in chunks.chunks(MAX_PARALLEL_CHUNKS) {
+            let parts: Vec<Quotes> = std::thread::scope(|scope| {
+                let handles: Vec<_> = batch.iter()
+                    .map(|chunk| scope.spawn(move || {
+                        let mut part = Quotes::default();
+                        self.collect_quotes(chunk, &mut part);
+                        part
+                    }))
+                    .collect();
+                handles.into_iter().zip(batch)
+                    .map(|(handle, chunk)| handle.join().unwrap_or_else(|_| {
+                        let mut failed = Quotes::default();
+                        for pair in chunk.iter() {
+                            failed.errors.insert(pair.clone(), "Ticker worker panicked".to_string());
+                        }
+                        failed
+                    }))
+                    .collect()
+            });
+            for part in parts {
+                quotes.append(part);
+            }
+        }
+        quotes
+    }
+
+    fn collect_quotes(&self, chunk: &[String], quotes: &mut Quotes) {
+        quotes.requests += 1;
+        match self.get_tickers(chunk) {
+            Ok(result) => {
+                let mut unmatched: Vec<&String> = Vec::new();
+                let mut used: Vec<&String> = Vec::new();
+                for pair in chunk {
+                    let wanted = normalize_pair(pair);
+                    let found = result.keys()
+                        .find(|key| *key == pair || normalize_pair(key) == wanted);
+                    match found {
+                        Some(key) => {
+                            quotes.push(pair, &result[key]);
+                            used.push(key);
+                        }
+                        None => unmatched.push(pair),
+                    }
+                }
+                let spare: Vec<&String> = result.keys().filter(|k| !used.contains(k)).collect();
+                if unmatched.len() == 1 && spare.len() == 1 {
+                    quotes.push(unmatched[0], &result[spare[0]]);
+                } else {
+                    for pair in unmatched {
+                        quotes.errors.insert(pair.clone(), "Pair missing from Ticker response".to_string());
+                    }
+                }
+            }
+            // Only an unknown pair is worth isolating; a transport error or
+            // an outage would fail every half too
+            Err(e) if chunk.len() > 1 && is_unknown_pair(&e) => {
+                let mid = chunk.len() / 2;
+                self.collect_quotes(&chunk[..mid], quotes);
+                self.collect_quotes(&chunk[mid..], quotes);
+            }
+            Err(e) => {
+                let message = format!("{:?}", e);
+                for pair in chunk {
+                    quotes.errors.insert(pair.clone(), message.clone());
+                }
+            }
+        }
+    }
+
     fn get_ticker(&self, pair: &str) -> Result<HashMap<String, serde_json::Value>, KrakenError> {
         let url = format!(
-            "https://api.kraken.com/0/public/Ticker?pair={}",
-            pair
+            "{}/0/public/Ticker?pair={}",
+            self.base_url, pair
         );
 
         let response = self
@@ -33,9 +310,7 @@ impl KrakenClient {
             .send()
             .map_err(KrakenError::HttpError)?;
 
-        let json: serde_json::Value = response.json().map_err(|e| {
-            KrakenError::ParseError(format!("Failed to parse JSON: {}", e.to_string()))
-        })?;
+        let json = self.read_json("Ticker", 0, response)?;
 
         if let Some(result) = json["result"].as_object() {
             let mut result_map = HashMap::new();
@@ -71,9 +346,9 @@ impl KrakenClient {
     }
 
     pub fn get_spread(&self, pair: &str) -> Result<f64, KrakenError> {
-        let bid = self.get_bid(pair)?;
-        let ask = self.get_ask(pair)?;
-        Ok(ask - bid)
+        // Both sides from one response so the spread is consistent
+        let top = self.get_top_of_book(pair)?;
+        Ok(top.ask - top.bid)
     }
 
     pub fn get_recent_trades(&self, _ticker: &str) -> Result<Vec<(f64, f64, f64, String, String, String)>, KrakenError> {
@@ -81,8 +356,33 @@ impl KrakenClient {
         unimplemented!()
     }
 
-    pub fn get_orderbook(&self, _pair: &str) -> Result<(Vec<f64>, Vec<f64>), KrakenError> {
-        // Implementation would go here
-        unimplemented!()
+    /// Full order book up to `depth` levels per side (Kraken caps this at 500).
+    pub fn get_orderbook(&self, pair: &str, depth: usize) -> Result<OrderBook, KrakenError> {
+        let book = self.get_depth(pair, depth)?;
+        let empty = Vec::new();
+        let bids = book["bids"].as_array().unwrap_or(&empty);
+        let asks = book["asks"].as_array().unwrap_or(&empty);
+
+        let mut out = OrderBook {
+            bid_price: Vec::with_capacity(bids.len()),
+            bid_volume: Vec::with_capacity(bids.len()),
+            bid_time: Vec::with_capacity(bids.len()),
+            ask_price: Vec::with_capacity(asks.len()),
+            ask_volume: Vec::with_capacity(asks.len()),
+            ask_time: Vec::with_capacity(asks.len()),
+        };
+        for level in bids {
+            let (price, volume, time) = parse_depth_level(level)?;
+            out.bid_price.push(price);
+            out.bid_volume.push(volume);
+            out.bid_time.push(time);
+        }
+        for level in asks {
+            let (price, volume, time) = parse_depth_level(level)?;
+            out.ask_price.push(price);
+            out.ask_volume.push(volume);
+            out.ask_time.push(time);
+        }
+        Ok(out)
     }
 }
\ No newline at end of file
@@ -1,17 +1,49 @@
-use reqwest::blocking::Client;
+use reqwest::blocking::{Client, Response};
 use serde::Deserialize;
+use std::collections::HashMap;
 use std::fs;
+use std::sync::Mutex;
 use std::path::Path;
+use std::time::Duration;
 use hmac::{Hmac, Mac};
 use sha2::{Sha256, Sha512, Digest};
 use base64::{engine::general_purpose::STANDARD, Engine};
-use std::time::{SystemTime, UNIX_EPOCH};
+use nonce::NonceAllocator;
+
+pub const DEFAULT_CONFIG_PATH: &str = "config/config.yaml";
+pub const DEFAULT_BASE_URL: &str = "https://api.kraken.com";
+/// Overrides the REST host, e.g. to point the client at a local cassette server.
+pub const BASE_URL_ENV: &str = "KRAKEN_API_URL";
 
 #[derive(Debug)]
 pub enum KrakenError {
     HttpError(reqwest::Error),
     ParseError(String),
     MissingField(String),
+    ConfigError(String),
+}
+
+/// Requests, request-body bytes and response-body bytes per endpoint.
+#[derive(Default)]
+pub struct TransferStats {
+    counts: Mutex<HashMap<String, (u64, u64, u64)>>,
+}
+
+impl TransferStats {
+    pub fn record(&self, endpoint: &str, sent: usize, received: usize) {
+        let mut counts = self.counts.lock().unwrap_or_else(|e| e.into_inner());
+        let entry = match counts.get_mut(endpoint) {
+            Some(entry) => entry,
+            None => counts.entry(endpoint.to_string()).or_default(),
+        };
+        entry.0 += 1;
+        entry.1 += sent as u64;
+        entry.2 += received as u64;
+    }
+
+    pub fn snapshot(&self) -> HashMap<String, (u64, u64, u64)> {
+        self.counts.lock().unwrap_or_else(|e| e.into_inner()).clone()
+    }
 }
 
 #[derive(Debug, Deserialize)]
@@ -24,35 +56,99 @@ struct KrakenConfig {
     api_key: String,
     api_secret: String,
     default_pair: String,
+    api_url: Option<String>,
 }
 
+/// Long-lived Kraken REST client.
+///
+/// Config is read once, the API secret is base64-decoded once and the
+/// underlying `reqwest` client keeps a keep-alive connection pool, so
+/// repeated calls reuse the same TCP/TLS connection. Nonces come from a
+/// per-key allocator shared by threads and processes, so private calls
+/// can be made concurrently.
 pub struct KrakenClient {
     client: Client,
+    base_url: String,
     pair: String,
     api_key: String,
-    api_secret: String,
+    secret: Option<Vec<u8>>,
+    nonces: NonceAllocator,
+    transfer: TransferStats,
+}
+
+fn build_http_client() -> Result<Client, KrakenError> {
+    Client::builder()
+        .pool_idle_timeout(Duration::from_secs(90))
+        .pool_max_idle_per_host(16)
+        .tcp_keepalive(Duration::from_secs(30))
+        .tcp_nodelay(true)
+        .timeout(Duration::from_secs(10))
+        .build()
+        .map_err(KrakenError::HttpError)
 }
 
 impl KrakenClient {
     pub fn new() -> Self {
-        let config_path = Path::new("config/config.yaml");
-        let config_text = fs::read_to_string(config_path).expect("Failed to read config.yaml");
-        let config: Config = serde_yaml::from_str(&config_text).expect("Invalid YAML");
+        Self::from_config(DEFAULT_CONFIG_PATH).expect("Failed to create Kraken client")
+    }
+
+    pub fn from_config(config_path: &str) -> Result<Self, KrakenError> {
+        let config_text = fs::read_to_string(Path::new(config_path))
+            .map_err(|e| KrakenError::ConfigError(format!("Failed to read {}: {}", config_path, e)))?;
+        let config: Config = serde_yaml::from_str(&config_text)
+            .map_err(|e| KrakenError::ConfigError(format!("Invalid YAML: {}", e)))?;
 
-        Self {
-            client: Client::new(),
+        // Public endpoints do not need a valid secret, so a bad one only
+        // fails once a private call tries to sign with it.
+        let secret = STANDARD.decode(&config.kraken.api_secret).ok();
+
+        // KRAKEN_API_URL wins over the config's kraken.api_url
+        let base_url = std::env::var(BASE_URL_ENV).ok()
+            .or(config.kraken.api_url)
+            .unwrap_or_else(|| DEFAULT_BASE_URL.to_string())
+            .trim_end_matches('/')
+            .to_string();
+
+        Ok(Self {
+            client: build_http_client()?,
+            base_url,
             pair: config.kraken.default_pair,
+            nonces: NonceAllocator::for_key(&config.kraken.api_key),
+            transfer: TransferStats::default(),
             api_key: config.kraken.api_key,
-            api_secret: config.kraken.api_secret,
-        }
+            secret,
+        })
+    }
+
+    pub fn default_pair(&self) -> &str {
+        &self.pair
+    }
+
+    pub fn base_url(&self) -> &str {
+        &self.base_url
+    }
+
+    pub fn transfer_stats(&self) -> HashMap<String, (u64, u64, u64)> {
+        self.transfer.snapshot()
+    }
+
+    // Both readers take the whole body at once, so its size is counted
+    // before it is parsed.
+    fn read_json(&self, endpoint: &str, sent: usize, response: Response) -> Result<serde_json::Value, KrakenError> {
+        let body = response.bytes().map_err(KrakenError::HttpError)?;
+        self.transfer.record(endpoint, sent, body.len());
+        serde_json::from_slice(&body)
+            .map_err(|e| KrakenError::ParseError(format!("Failed to parse JSON: {}", e)))
+    }
+
+    fn read_text(&self, endpoint: &str, sent: usize, response: Response) -> Result<String, KrakenError> {
+        let body = response.bytes().map_err(KrakenError::HttpError)?;
+        self.transfer.record(endpoint, sent, body.len());
+        String::from_utf8(body.to_vec()).map_err(|e| KrakenError::ParseError(e.to_string()))
     }
 
     pub fn generate_nonce(&self) -> String {
-        SystemTime::now()
-            .duration_since(UNIX_EPOCH)
-            .expect("Time went backwards")
-            .as_millis()
-            .to_string()
+        self.nonces.next().to_string()
     }
 
     pub fn create_signature_message(&self, path: &str, nonce: &str, body_str: &str) -> Vec<u8> {
@@ -65,10 +161,10 @@ impl KrakenClient {
     }
 
     pub fn sign_message(&self, message: &[u8]) -> Result<String, KrakenError> {
-        let decoded_secret = STANDARD.decode(&self.api_secret)
-            .map_err(|e| KrakenError::ParseError(e.to_string()))?;
+        let decoded_secret = self.secret.as_ref()
+            .ok_or_else(|| KrakenError::ConfigError("api_secret is not valid base64".to_string()))?;
 
-        let mut mac = Hmac::<Sha512>::new_from_slice(&decoded_secret)
+        let mut mac = Hmac::<Sha512>::new_from_slice(decoded_secret)
             .map_err(|e| KrakenError::ParseError(e.to_string()))?;
 
         mac.update(message);
@@ -78,4 +174,5 @@ impl KrakenClient {
 }
 
 pub mod account;
-pub mod markets;
\ No newline at end of file
+pub mod markets;
+pub mod nonce;
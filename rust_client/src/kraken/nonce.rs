@@ -0,0 +1,138 @@
+use sha2::{Digest, Sha256};
+use std::env;
+use std::fs::{File, OpenOptions};
+use std::io::{Read, Seek, SeekFrom, Write};
+use std::path::PathBuf;
+use std::sync::atomic::{AtomicU64, Ordering};
+use std::sync::Mutex;
+use std::time::{SystemTime, UNIX_EPOCH};
+
+/// Overrides the per-key nonce file shared by processes on this host.
+pub const NONCE_FILE_ENV: &str = "KRAKEN_NONCE_FILE";
+
+fn now_millis() -> u64 {
+    SystemTime::now()
+        .duration_since(UNIX_EPOCH)
+        .map(|d| d.as_millis() as u64)
+        .unwrap_or(0)
+}
+
+/// Hands out strictly increasing nonces for one API key.
+///
+/// Nonces are wall-clock milliseconds, bumped by one whenever that would
+/// not exceed the last nonce issued. The last value is kept in an atomic
+/// for this process and in a small file, locked while it is read and
+/// written, for every process on the host using the same key. If the file
+/// cannot be opened the allocator is monotonic within the process only.
+///
+/// Requests signed in order can still reach Kraken out of order when they
+/// are sent in parallel; give the API key a nonce window for that.
+pub struct NonceAllocator {
+    last: AtomicU64,
+    file: Option<Mutex<File>>,
+}
+
+impl NonceAllocator {
+    pub fn new(path: Option<PathBuf>) -> Self {
+        let file = path.and_then(|path| {
+            OpenOptions::new()
+                .read(true)
+                .write(true)
+                .create(true)
+                .truncate(false)
+                .open(path)
+                .ok()
+        });
+        Self {
+            last: AtomicU64::new(0),
+            file: file.map(Mutex::new),
+        }
+    }
+
+    /// Allocator backed by the host-wide file for `api_key`.
+    pub fn for_key(api_key: &str) -> Self {
+        let path = env::var_os(NONCE_FILE_ENV)
+            .map(PathBuf::from)
+            .unwrap_or_else(|| {
+                let digest = Sha256::digest(api_key.as_bytes());
+                let name: String = digest[..8].iter().map(|b| format!("{:02x}", b)).collect();
+                env::temp_dir().join(format!("kraken_nonce_{}.bin", name))
+            });
+        Self::new(Some(path))
+    }
+
+    pub fn next(&self) -> u64 {
+        let now = now_millis();
+        if let Some(file) = &self.file {
+            if let Some(nonce) = self.next_shared(file, now) {
+                self.last.fetch_max(nonce, Ordering::SeqCst);
+                return nonce;
+            }
+        }
+        let previous = self.last
+            .fetch_update(Ordering::SeqCst, Ordering::SeqCst, |last| Some(now.max(last + 1)))
+            .unwrap_or(0);
+        now.max(previous + 1)
+    }
+
+    // The mutex serializes threads of this process; the file lock
+    // serializes processes. None if the file could not be used.
+    fn next_shared(&self, file: &Mutex<File>, now: u64) -> Option<u64> {
+        let mut guard = file.lock().unwrap_or_else(|e| e.into_inner());
+        guard.lock().ok()?;
+        let file: &mut File = &mut guard;
+        let nonce = (|| {
+            let mut bytes = [0u8; 8];
+            file.seek(SeekFrom::Start(0)).ok()?;
+            let stored = match file.read_exact(&mut bytes) {
+                Ok(()) => u64::from_le_bytes(bytes),
+                Err(_) => 0,
+            };
+            let last = stored.max(self.last.load(Ordering::SeqCst));
+            let nonce = now.max(last + 1);
+            file.seek(SeekFrom::Start(0)).ok()?;
+            file.write_all(&nonce.to_le_bytes()).ok()?;
+            Some(nonce)
+        })();
+        let _ = file.unlock();
+        nonce
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use std::sync::Arc;
+    use std::thread;
+
+    #[test]
+    fn nonces_are_unique_across_threads() {
+        let allocator = Arc::new(NonceAllocator::new(None));
+        let handles: Vec<_> = (0..8)
+            .map(|_| {
+                let allocator = Arc::clone(&allocator);
+                thread::spawn(move || (0..1000).map(|_| allocator.next()).collect::<Vec<_>>())
+            })
+            .collect();
+        let mut all: Vec<u64> = handles.into_iter().flat_map(|h| h.join().unwrap()).collect();
+        let count = all.len();
+        all.sort_unstable();
+        all.dedup();
+        assert_eq!(all.len(), count);
+    }
+
+    #[test]
+    fn allocators_sharing_a_file_stay_monotonic() {
+        let path = env::temp_dir().join(format!("kraken_nonce_test_{}.bin", std::process::id()));
+        let _ = std::fs::remove_file(&path);
+        let first = NonceAllocator::new(Some(path.clone()));
+        let second = NonceAllocator::new(Some(path.clone()));
+        let mut previous = 0;
+        for i in 0..100 {
+            let nonce = if i % 2 == 0 { first.next() } else { second.next() };
+            assert!(nonce > previous);
+            previous = nonce;
+        }
+        let _ = std::fs::remove_file(&path);
+    }
+}
@@ -1,10 +1,13 @@
 use pyo3::prelude::*;
 use pyo3::wrap_pyfunction;
+use numpy::{IntoPyArray, PyArray1, PyUntypedArrayMethods};
 use std::collections::HashMap;
+use std::sync::OnceLock;
 
 mod kraken;
-use kraken::{KrakenClient, KrakenError};
-use kraken::account::OrderResponse;
+use kraken::{KrakenClient, KrakenError, DEFAULT_CONFIG_PATH};
+use kraken::account::{BatchOrderResult, OrderResponse};
+use kraken::markets::{OrderBook, Quotes, DEFAULT_BOOK_DEPTH, DEFAULT_QUOTE_CHUNK};
 mod binance_api;
 use binance_api::BinanceClient;
 
@@ -53,59 +56,322 @@ impl From<OrderResponse> for PyOrderResponse {
     }
 }
 
+type BatchOrderTuple = (Option<String>, String, Option<String>);
+
+fn batch_tuples(results: Vec<BatchOrderResult>) -> Vec<BatchOrderTuple> {
+    results.into_iter().map(|r| (r.txid, r.description, r.error)).collect()
+}
+
+/// Columnar quotes for many pairs; row `i` of each column is `pairs[i]`.
+#[pyclass]
+pub struct PyQuotes {
+    #[pyo3(get, set)]
+    pub pairs: Vec<String>,
+    #[pyo3(get)]
+    pub bid: Vec<f64>,
+    #[pyo3(get)]
+    pub bid_volume: Vec<f64>,
+    #[pyo3(get)]
+    pub ask: Vec<f64>,
+    #[pyo3(get)]
+    pub ask_volume: Vec<f64>,
+    #[pyo3(get)]
+    pub last: Vec<f64>,
+    #[pyo3(get)]
+    pub volume: Vec<f64>,
+    #[pyo3(get, set)]
+    pub errors: HashMap<String, String>,
+    /// Ticker requests sent, including retries of rejected chunks.
+    #[pyo3(get)]
+    pub requests: usize,
+}
+
+#[pymethods]
+impl PyQuotes {
+    fn __len__(&self) -> usize {
+        self.pairs.len()
+    }
+
+    fn __str__(&self) -> String {
+        format!("Quotes(pairs={}, errors={})", self.pairs.len(), self.errors.len())
+    }
+
+    fn __repr__(&self) -> String {
+        self.__str__()
+    }
+
+    /// Append the rows, errors and request count of another Quotes.
+    fn extend(&mut self, other: PyRef<'_, PyQuotes>) {
+        self.pairs.extend(other.pairs.iter().cloned());
+        self.bid.extend(&other.bid);
+        self.bid_volume.extend(&other.bid_volume);
+        self.ask.extend(&other.ask);
+        self.ask_volume.extend(&other.ask_volume);
+        self.last.extend(&other.last);
+        self.volume.extend(&other.volume);
+        self.errors.extend(other.errors.iter().map(|(k, v)| (k.clone(), v.clone())));
+        self.requests += other.requests;
+    }
+}
+
+impl From<Quotes> for PyQuotes {
+    fn from(quotes: Quotes) -> Self {
+        PyQuotes {
+            pairs: quotes.pairs,
+            bid: quotes.bid,
+            bid_volume: quotes.bid_volume,
+            ask: quotes.ask,
+            ask_volume: quotes.ask_volume,
+            last: quotes.last,
+            volume: quotes.volume,
+            errors: quotes.errors,
+            requests: quotes.requests,
+        }
+    }
+}
+
+/// Order book as NumPy float64 arrays, one contiguous array per column.
+/// Levels are best-first on both sides; times are exchange seconds.
+#[pyclass]
+pub struct PyOrderBook {
+    #[pyo3(get)]
+    pub pair: String,
+    #[pyo3(get)]
+    pub bid_price: Py<PyArray1<f64>>,
+    #[pyo3(get)]
+    pub bid_volume: Py<PyArray1<f64>>,
+    #[pyo3(get)]
+    pub bid_time: Py<PyArray1<f64>>,
+    #[pyo3(get)]
+    pub ask_price: Py<PyArray1<f64>>,
+    #[pyo3(get)]
+    pub ask_volume: Py<PyArray1<f64>>,
+    #[pyo3(get)]
+    pub ask_time: Py<PyArray1<f64>>,
+}
+
+#[pymethods]
+impl PyOrderBook {
+    fn __str__(&self, py: Python<'_>) -> String {
+        format!(
+            "OrderBook(pair='{}', bids={}, asks={})",
+            self.pair,
+            self.bid_price.bind(py).len(),
+            self.ask_price.bind(py).len()
+        )
+    }
+
+    fn __repr__(&self, py: Python<'_>) -> String {
+        self.__str__(py)
+    }
+}
+
+impl PyOrderBook {
+    // The Vec buffers are moved into the arrays, so no level is copied again.
+    fn new(py: Python<'_>, pair: String, book: OrderBook) -> Self {
+        PyOrderBook {
+            pair,
+            bid_price: book.bid_price.into_pyarray(py).unbind(),
+            bid_volume: book.bid_volume.into_pyarray(py).unbind(),
+            bid_time: book.bid_time.into_pyarray(py).unbind(),
+            ask_price: book.ask_price.into_pyarray(py).unbind(),
+            ask_volume: book.ask_volume.into_pyarray(py).unbind(),
+            ask_time: book.ask_time.into_pyarray(py).unbind(),
+        }
+    }
+}
+
+// Every blocking call runs inside `allow_threads`, so the client must be
+// usable from several OS threads at once.
+const _: fn() = || {
+    fn assert_thread_safe<T: Send + Sync>() {}
+    assert_thread_safe::<KrakenClient>();
+};
+
+// Client shared by the module-level functions, created on first use
+static SHARED_CLIENT: OnceLock<KrakenClient> = OnceLock::new();
+
+fn shared_client() -> PyResult<&'static KrakenClient> {
+    if let Some(client) = SHARED_CLIENT.get() {
+        return Ok(client);
+    }
+    let client = handle_kraken_result(KrakenClient::from_config(DEFAULT_CONFIG_PATH))?;
+    Ok(SHARED_CLIENT.get_or_init(|| client))
+}
+
+/// Persistent Kraken client handle.
+///
+/// Holds the parsed config, the decoded secret and a keep-alive connection
+/// pool for its whole lifetime. Create one and reuse it across calls.
+/// Network calls release the GIL, so one handle can be shared by Python
+/// threads and their requests overlap.
+#[pyclass(name = "KrakenClient")]
+pub struct PyKrakenClient {
+    inner: KrakenClient,
+}
+
+#[pymethods]
+impl PyKrakenClient {
+    #[new]
+    #[pyo3(signature = (config_path=None))]
+    fn new(config_path: Option<String>) -> PyResult<Self> {
+        let path = config_path.unwrap_or_else(|| DEFAULT_CONFIG_PATH.to_string());
+        let inner = handle_kraken_result(KrakenClient::from_config(&path))?;
+        Ok(PyKrakenClient { inner })
+    }
+
+    #[getter]
+    fn default_pair(&self) -> String {
+        self.inner.default_pair().to_string()
+    }
+
+    #[getter]
+    fn base_url(&self) -> String {
+        self.inner.base_url().to_string()
+    }
+
+    fn get_open_orders_raw(&self, py: Python<'_>) -> PyResult<String> {
+        py.allow_threads(|| handle_kraken_result(self.inner.get_open_orders_raw()))
+    }
+
+    fn cancel_order(&self, py: Python<'_>, txid: String) -> PyResult<bool> {
+        py.allow_threads(|| handle_kraken_result(self.inner.cancel_order(&txid)))
+    }
+
+    fn get_bid(&self, py: Python<'_>, pair: String) -> PyResult<f64> {
+        py.allow_threads(|| handle_kraken_result(self.inner.get_bid(&pair)))
+    }
+
+    fn get_ask(&self, py: Python<'_>, pair: String) -> PyResult<f64> {
+        py.allow_threads(|| handle_kraken_result(self.inner.get_ask(&pair)))
+    }
+
+    fn get_spread(&self, py: Python<'_>, pair: String) -> PyResult<f64> {
+        py.allow_threads(|| handle_kraken_result(self.inner.get_spread(&pair)))
+    }
+
+    /// Returns (bid, bid_volume, ask, ask_volume, timestamp) from one Depth call.
+    fn get_top_of_book(&self, py: Python<'_>, pair: String) -> PyResult<(f64, f64, f64, f64, f64)> {
+        py.allow_threads(|| handle_kraken_result(self.inner.get_top_of_book(&pair)))
+            .map(|t| (t.bid, t.bid_volume, t.ask, t.ask_volume, t.timestamp))
+    }
+
+    #[pyo3(signature = (pairs, chunk_size=DEFAULT_QUOTE_CHUNK))]
+    fn get_quotes(&self, py: Python<'_>, pairs: Vec<String>, chunk_size: usize) -> PyQuotes {
+        PyQuotes::from(py.allow_threads(|| self.inner.get_quotes(&pairs, chunk_size)))
+    }
+
+    fn get_balance(&self, py: Python<'_>) -> PyResult<HashMap<String, f64>> {
+        py.allow_threads(|| handle_kraken_result(self.inner.get_balance()))
+    }
+
+    fn add_order(&self, py: Python<'_>, pair: String, side: String, price: f64, volume: f64) -> PyResult<PyOrderResponse> {
+        py.allow_threads(|| handle_kraken_result(self.inner.add_order(&pair, &side, price, volume)))
+            .map(PyOrderResponse::from)
+    }
+
+    fn get_recent_trades(&self, py: Python<'_>, ticker: String) -> PyResult<Vec<(f64, f64, f64, String, String, String)>> {
+        py.allow_threads(|| handle_kraken_result(self.inner.get_recent_trades(&ticker)))
+    }
+
+    #[pyo3(signature = (pair, depth=DEFAULT_BOOK_DEPTH))]
+    fn get_orderbook(&self, py: Python<'_>, pair: String, depth: usize) -> PyResult<PyOrderBook> {
+        let book = py.allow_threads(|| handle_kraken_result(self.inner.get_orderbook(&pair, depth)))?;
+        Ok(PyOrderBook::new(py, pair, book))
+    }
+
+    /// One AddOrderBatch call; `orders` is a list of (side, price, volume).
+    /// Returns (txid, description, error) per order, in request order.
+    fn add_order_batch(&self, py: Python<'_>, pair: String, orders: Vec<(String, f64, f64)>) -> PyResult<Vec<BatchOrderTuple>> {
+        py.allow_threads(|| handle_kraken_result(self.inner.add_order_batch(&pair, &orders)))
+            .map(batch_tuples)
+    }
+
+    /// One CancelOrderBatch call; returns the number of orders cancelled.
+    fn cancel_order_batch(&self, py: Python<'_>, txids: Vec<String>) -> PyResult<u64> {
+        py.allow_threads(|| handle_kraken_result(self.inner.cancel_order_batch(&txids)))
+    }
+
+    /// Returns {endpoint: (requests, bytes_sent, bytes_received)} counted
+    /// from request and response bodies since the client was created.
+    fn transfer_stats(&self) -> HashMap<String, (u64, u64, u64)> {
+        self.inner.transfer_stats()
+    }
+
+    fn __repr__(&self) -> String {
+        format!("KrakenClient(default_pair='{}')", self.inner.default_pair())
+    }
+}
+
+#[pyfunction]
+fn get_open_orders_raw(py: Python<'_>) -> PyResult<String> {
+    py.allow_threads(|| handle_kraken_result(shared_client()?.get_open_orders_raw()))
+}
+
+#[pyfunction]
+fn cancel_order(py: Python<'_>, txid: String) -> PyResult<bool> {
+    py.allow_threads(|| handle_kraken_result(shared_client()?.cancel_order(&txid)))
+}
+
 #[pyfunction]
-fn get_open_orders_raw() -> PyResult<String> {
-    let client = KrakenClient::new();
-    handle_kraken_result(client.get_open_orders_raw())
+fn get_bid(py: Python<'_>, pair: String) -> PyResult<f64> {
+    py.allow_threads(|| handle_kraken_result(shared_client()?.get_bid(&pair)))
 }
 
 #[pyfunction]
-fn cancel_order(txid: String) -> PyResult<bool> {
-    let client = KrakenClient::new();
-    handle_kraken_result(client.cancel_order(&txid))
+fn get_ask(py: Python<'_>, pair: String) -> PyResult<f64> {
+    py.allow_threads(|| handle_kraken_result(shared_client()?.get_ask(&pair)))
 }
 
 #[pyfunction]
-fn get_bid(pair: String) -> PyResult<f64> {
-    let client = KrakenClient::new();
-    handle_kraken_result(client.get_bid(&pair))
+fn get_spread(py: Python<'_>, pair: String) -> PyResult<f64> {
+    py.allow_threads(|| handle_kraken_result(shared_client()?.get_spread(&pair)))
 }
 
 #[pyfunction]
-fn get_ask(pair: String) -> PyResult<f64> {
-    let client = KrakenClient::new();
-    handle_kraken_result(client.get_ask(&pair))
+fn get_top_of_book(py: Python<'_>, pair: String) -> PyResult<(f64, f64, f64, f64, f64)> {
+    py.allow_threads(|| handle_kraken_result(shared_client()?.get_top_of_book(&pair)))
+        .map(|t| (t.bid, t.bid_volume, t.ask, t.ask_volume, t.timestamp))
 }
 
 #[pyfunction]
-fn get_spread(pair: String) -> PyResult<f64> {
-    let client = KrakenClient::new();
-    handle_kraken_result(client.get_spread(&pair))
+#[pyo3(signature = (pairs, chunk_size=DEFAULT_QUOTE_CHUNK))]
+fn get_quotes(py: Python<'_>, pairs: Vec<String>, chunk_size: usize) -> PyResult<PyQuotes> {
+    py.allow_threads(|| Ok(PyQuotes::from(shared_client()?.get_quotes(&pairs, chunk_size))))
 }
 
 #[pyfunction]
-fn get_balance() -> PyResult<HashMap<String, f64>> {
-    let client = KrakenClient::new();
-    handle_kraken_result(client.get_balance())
+fn get_balance(py: Python<'_>) -> PyResult<HashMap<String, f64>> {
+    py.allow_threads(|| handle_kraken_result(shared_client()?.get_balance()))
 }
 
 #[pyfunction]
-fn add_order(pair: String, side: String, price: f64, volume: f64) -> PyResult<PyOrderResponse> {
-    let client = KrakenClient::new();
-    handle_kraken_result(client.add_order(&pair, &side, price, volume))
+fn add_order(py: Python<'_>, pair: String, side: String, price: f64, volume: f64) -> PyResult<PyOrderResponse> {
+    py.allow_threads(|| handle_kraken_result(shared_client()?.add_order(&pair, &side, price, volume)))
         .map(PyOrderResponse::from)
 }
 
 #[pyfunction]
-fn get_recent_trades(ticker: String) -> PyResult<Vec<(f64, f64, f64, String, String, String)>> {
-    let client = KrakenClient::new();
-    handle_kraken_result(client.get_recent_trades(&ticker))
+fn get_recent_trades(py: Python<'_>, ticker: String) -> PyResult<Vec<(f64, f64, f64, String, String, String)>> {
+    py.allow_threads(|| handle_kraken_result(shared_client()?.get_recent_trades(&ticker)))
+}
+
+#[pyfunction]
+#[pyo3(signature = (pair, depth=DEFAULT_BOOK_DEPTH))]
+fn get_orderbook(py: Python<'_>, pair: String, depth: usize) -> PyResult<PyOrderBook> {
+    let book = py.allow_threads(|| handle_kraken_result(shared_client()?.get_orderbook(&pair, depth)))?;
+    Ok(PyOrderBook::new(py, pair, book))
+}
+
+#[pyfunction]
+fn add_order_batch(py: Python<'_>, pair: String, orders: Vec<(String, f64, f64)>) -> PyResult<Vec<BatchOrderTuple>> {
+    py.allow_threads(|| handle_kraken_result(shared_client()?.add_order_batch(&pair, &orders)))
+        .map(batch_tuples)
 }
 
 #[pyfunction]
-fn get_orderbook(pair: String) -> PyResult<(Vec<f64>, Vec<f64>)> {
-    let client = KrakenClient::new();
-    handle_kraken_result(client.get_orderbook(&pair))
+fn cancel_order_batch(py: Python<'_>, txids: Vec<String>) -> PyResult<u64> {
+    py.allow_threads(|| handle_kraken_result(shared_client()?.cancel_order_batch(&txids)))
 }
 
 #[pyfunction]
@@ -124,11 +390,18 @@ fn rust_kraken_client(_py: Python<'_>, m: &Bound<'_, PyModule>) -> PyResult<()>
     m.add_function(wrap_pyfunction!(get_bid, m)?)?;
     m.add_function(wrap_pyfunction!(get_ask, m)?)?;
     m.add_function(wrap_pyfunction!(get_spread, m)?)?;
+    m.add_function(wrap_pyfunction!(get_top_of_book, m)?)?;
+    m.add_function(wrap_pyfunction!(get_quotes, m)?)?;
     m.add_function(wrap_pyfunction!(get_balance, m)?)?;
     m.add_function(wrap_pyfunction!(add_order, m)?)?;
     m.add_function(wrap_pyfunction!(get_recent_trades, m)?)?;
     m.add_function(wrap_pyfunction!(get_orderbook, m)?)?;
+    m.add_function(wrap_pyfunction!(add_order_batch, m)?)?;
+    m.add_function(wrap_pyfunction!(cancel_order_batch, m)?)?;
     m.add_function(wrap_pyfunction!(get_binance_depth, m)?)?;
     m.add_class::<PyOrderResponse>()?;
+    m.add_class::<PyKrakenClient>()?;
+    m.add_class::<PyQuotes>()?;
+    m.add_class::<PyOrderBook>()?;
     Ok(())
 }
\ No newline at end of file
@@ -7,6 +7,13 @@ use url::Url;
 use std::collections::HashMap;
 use reqwest::blocking::Client;
 
+// rust_client's allocator, so both extensions draw nonces for an API key
+// from the same host-wide file (KRAKEN_NONCE_FILE or the per-key default)
+#[path = "../../rust_client/src/kraken/nonce.rs"]
+mod nonce;
+mod orders;
+mod stream;
+
 #[pyfunction]
 fn test_connection() -> PyResult<()> {
     let url = Url::parse("wss://ws.kraken.com")
@@ -43,31 +50,61 @@ struct KrakenCredentials {
     api_secret: String,
 }
 
-fn load_config() -> KrakenCredentials {
-    let content = fs::read_to_string("config/config.yaml").expect("Cannot read config");
-    let cfg: Config = serde_yaml::from_str(&content).expect("Invalid config format");
-    cfg.kraken
+fn runtime_error<E: std::fmt::Display>(context: &'static str) -> impl FnOnce(E) -> PyErr {
+    move |e| pyo3::exceptions::PyRuntimeError::new_err(format!("{}: {}", context, e))
+}
+
+fn load_config() -> PyResult<KrakenCredentials> {
+    let content = fs::read_to_string("config/config.yaml").map_err(runtime_error("Cannot read config"))?;
+    let cfg: Config = serde_yaml::from_str(&content).map_err(runtime_error("Invalid config format"))?;
+    Ok(cfg.kraken)
 }
 
-fn get_token(api_key: &str, api_secret: &str) -> String {
+fn get_token(api_key: &str, api_secret: &str) -> PyResult<String> {
+    let path = "/0/private/GetWebSocketsToken";
+    let nonce = nonce::NonceAllocator::for_key(api_key).next();
+    let body = format!("nonce={}", nonce);
+    let secret = base64::Engine::decode(&base64::engine::general_purpose::STANDARD, api_secret.trim())
+        .map_err(runtime_error("Invalid API secret"))?;
+    let signature = orders::sign(path, nonce, &body, &secret).map_err(runtime_error("Failed to sign request"))?;
+
     let client = Client::new();
     let res = client
-        .post("https://api.kraken.com/0/private/GetWebSocketsToken")
+        .post(format!("https://api.kraken.com{}", path))
         .header("API-Key", api_key)
-        .header("API-Sign", api_secret)  // Kraken expects API-Sign for private endpoints (optional here)
+        .header("API-Sign", signature)
         .header("Content-Type", "application/x-www-form-urlencoded")
-        .body("")
+        .body(body)
         .send()
-        .expect("Failed to get token");
+        .map_err(runtime_error("Failed to get token"))?;
+
+    let json: HashMap<String, serde_json::Value> = res.json().map_err(runtime_error("Invalid JSON"))?;
+    json.get("result")
+        .and_then(|result| result["token"].as_str())
+        .map(str::to_string)
+        .ok_or_else(|| pyo3::exceptions::PyRuntimeError::new_err(
+            format!("GetWebSocketsToken failed: {:?}", json.get("error"))
+        ))
+}
 
-    let json: HashMap<String, serde_json::Value> = res.json().expect("Invalid JSON");
-    json["result"]["token"].as_str().unwrap().to_string()
+fn send_text(socket: &mut stream::Socket, msg: &serde_json::Value) -> PyResult<()> {
+    socket.write_message(Message::Text(msg.to_string())).map_err(runtime_error("Failed to send message"))
 }
 
-fn connect_auth_socket(token: &str) -> tungstenite::WebSocket<tungstenite::stream::MaybeTlsStream<std::net::TcpStream>> {
-    let url = Url::parse("wss://ws-auth.kraken.com").unwrap();
-    let (mut socket, _) = connect(url).expect("Failed to connect to auth WebSocket");
+fn print_reply(socket: &mut stream::Socket) {
+    if let Ok(Message::Text(txt)) = socket.read_message() {
+        println!("{}", txt);
+    }
+}
+
+fn connect_socket(address: &str) -> PyResult<stream::Socket> {
+    let url = Url::parse(address).map_err(runtime_error("URL parse error"))?;
+    let (socket, _) = connect(url).map_err(runtime_error("WebSocket connection failed"))?;
+    Ok(socket)
+}
 
+fn connect_auth_socket(token: &str) -> PyResult<stream::Socket> {
+    let mut socket = connect_socket("wss://ws-auth.kraken.com")?;
     let login_msg = serde_json::json!({
         "event": "subscribe",
         "subscription": {
@@ -75,15 +112,15 @@ fn connect_auth_socket(token: &str) -> tungstenite::WebSocket<tungstenite::strea
             "token": token
         }
     });
-    socket.write_message(Message::Text(login_msg.to_string())).unwrap();
-    socket
+    send_text(&mut socket, &login_msg)?;
+    Ok(socket)
 }
 
 #[pyfunction]
-fn add_order(pair: String, side: String, volume: f64, ordertype: String) {
-    let cfg = load_config();
-    let token = get_token(&cfg.api_key, &cfg.api_secret);
-    let mut socket = connect_auth_socket(&token);
+fn add_order(pair: String, side: String, volume: f64, ordertype: String) -> PyResult<()> {
+    let cfg = load_config()?;
+    let token = get_token(&cfg.api_key, &cfg.api_secret)?;
+    let mut socket = connect_auth_socket(&token)?;
 
     let msg = serde_json::json!({
         "event": "addOrder",
@@ -94,19 +131,16 @@ fn add_order(pair: String, side: String, volume: f64, ordertype: String) {
         "pair": pair
     });
 
-    socket.write_message(Message::Text(msg.to_string())).unwrap();
-    if let Ok(msg) = socket.read_message() {
-        if let Message::Text(txt) = msg {
-            println!("{}", txt);
-        }
-    }
+    send_text(&mut socket, &msg)?;
+    print_reply(&mut socket);
+    Ok(())
 }
 
 #[pyfunction]
-fn get_orders() {
-    let cfg = load_config();
-    let token = get_token(&cfg.api_key, &cfg.api_secret);
-    let mut socket = connect_auth_socket(&token);
+fn get_orders() -> PyResult<()> {
+    let cfg = load_config()?;
+    let token = get_token(&cfg.api_key, &cfg.api_secret)?;
+    let mut socket = connect_auth_socket(&token)?;
 
     let msg = serde_json::json!({
         "event": "subscribe",
@@ -116,19 +150,16 @@ fn get_orders() {
         }
     });
 
-    socket.write_message(Message::Text(msg.to_string())).unwrap();
-    if let Ok(msg) = socket.read_message() {
-        if let Message::Text(txt) = msg {
-            println!("{}", txt);
-        }
-    }
+    send_text(&mut socket, &msg)?;
+    print_reply(&mut socket);
+    Ok(())
 }
 
 #[pyfunction]
-fn close_orders(txid: Vec<String>) {
-    let cfg = load_config();
-    let token = get_token(&cfg.api_key, &cfg.api_secret);
-    let mut socket = connect_auth_socket(&token);
+fn close_orders(txid: Vec<String>) -> PyResult<()> {
+    let cfg = load_config()?;
+    let token = get_token(&cfg.api_key, &cfg.api_secret)?;
+    let mut socket = connect_auth_socket(&token)?;
 
     for id in txid {
         let msg = serde_json::json!({
@@ -136,20 +167,15 @@ fn close_orders(txid: Vec<String>) {
             "token": token,
             "txid": id
         });
-        socket.write_message(Message::Text(msg.to_string())).unwrap();
-
-        if let Ok(msg) = socket.read_message() {
-            if let Message::Text(txt) = msg {
-                println!("{}", txt);
-            }
-        }
+        send_text(&mut socket, &msg)?;
+        print_reply(&mut socket);
     }
+    Ok(())
 }
 
 #[pyfunction]
-fn get_orderbook(pair: String, depth: u32) {
-    let url = Url::parse("wss://ws.kraken.com").unwrap();
-    let (mut socket, _) = connect(url).expect("WebSocket connection failed");
+fn get_orderbook(pair: String, depth: u32) -> PyResult<()> {
+    let mut socket = connect_socket("wss://ws.kraken.com")?;
 
     let msg = serde_json::json!({
         "event": "subscribe",
@@ -160,19 +186,14 @@ fn get_orderbook(pair: String, depth: u32) {
         "pair": [pair]
     });
 
-    socket.write_message(Message::Text(msg.to_string())).unwrap();
-
-    if let Ok(msg) = socket.read_message() {
-        if let Message::Text(txt) = msg {
-            println!("{}", txt);
-        }
-    }
+    send_text(&mut socket, &msg)?;
+    print_reply(&mut socket);
+    Ok(())
 }
 
 #[pyfunction]
-fn subscribe(pair: String) {
-    let url = Url::parse("wss://ws.kraken.com").unwrap();
-    let (mut socket, _) = connect(url).expect("WebSocket connection failed");
+fn subscribe(pair: String) -> PyResult<()> {
+    let mut socket = connect_socket("wss://ws.kraken.com")?;
 
     let msg = serde_json::json!({
         "event": "subscribe",
@@ -182,13 +203,9 @@ fn subscribe(pair: String) {
         "pair": [pair]
     });
 
-    socket.write_message(Message::Text(msg.to_string())).unwrap();
-
-    if let Ok(msg) = socket.read_message() {
-        if let Message::Text(txt) = msg {
-            println!("{}", txt);
-        }
-    }
+    send_text(&mut socket, &msg)?;
+    print_reply(&mut socket);
+    Ok(())
 }
 
 #[pymodule]
@@ -199,5 +216,11 @@ fn rust_ws_py(_py: Python, m: &PyModule) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(get_orders, m)?)?;
     m.add_function(wrap_pyfunction!(close_orders, m)?)?;
     m.add_function(wrap_pyfunction!(test_connection, m)?)?;
+    m.add_class::<orders::OrderSession>()?;
+    m.add_class::<stream::Subscription>()?;
+    m.add_class::<stream::TickerUpdate>()?;
+    m.add_class::<stream::BookUpdate>()?;
+    m.add_class::<stream::TradeUpdate>()?;
+    m.add_class::<stream::GapEvent>()?;
     Ok(())
 }
@@ -0,0 +1,536 @@
+//! Persistent authenticated order entry over `ws-auth`.
+//!
+//! An `OrderSession` fetches a WebSockets token once, keeps one socket to
+//! `wss://ws-auth.kraken.com` open and sends addOrder, cancelOrder and
+//! editOrder on it. Every request carries a `reqid`; a reader thread routes
+//! each acknowledgement back to the caller waiting on that reqid, so calls
+//! from several threads can be in flight at once.
+
+use crate::nonce::NonceAllocator;
+use crate::stream::{backoff, is_timeout, set_read_timeout, tcp_stream, Socket};
+use base64::{engine::general_purpose::STANDARD, Engine as _};
+use hmac::{Hmac, Mac};
+use pyo3::exceptions::{PyRuntimeError, PyTimeoutError};
+use pyo3::prelude::*;
+use reqwest::blocking::Client;
+use serde_json::{json, Value};
+use sha2::{Digest, Sha256, Sha512};
+use std::collections::HashMap;
+use std::net::TcpStream;
+use std::sync::atomic::{AtomicBool, AtomicU64, Ordering};
+use std::sync::mpsc::{sync_channel, Receiver, RecvTimeoutError, SyncSender};
+use std::sync::{Arc, Mutex};
+use std::thread;
+use std::time::{Duration, Instant};
+use tungstenite::{connect, Message};
+
+pub const AUTH_URL: &str = "wss://ws-auth.kraken.com";
+const DEFAULT_REST_URL: &str = "https://api.kraken.com";
+const TOKEN_PATH: &str = "/0/private/GetWebSocketsToken";
+// Kraken accepts a token for 15 minutes after it is issued; a connection
+// opened with it stays authenticated for as long as it is kept open
+const TOKEN_TTL: Duration = Duration::from_secs(14 * 60);
+// Idle wait for the reader, also how soon it notices close()
+const IDLE_WAIT: Duration = Duration::from_millis(100);
+// Once data arrives the reader drains with a short timeout, so a writer
+// never waits on the socket lock for long
+const DRAIN_WAIT: Duration = Duration::from_millis(1);
+const MAX_DRAIN: usize = 64;
+const EVENT_CAPACITY: usize = 10_000;
+const RECONNECT_INITIAL: Duration = Duration::from_millis(500);
+const RECONNECT_MAX: Duration = Duration::from_secs(30);
+
+fn lock<T>(mutex: &Mutex<T>) -> std::sync::MutexGuard<'_, T> {
+    mutex.lock().unwrap_or_else(|e| e.into_inner())
+}
+
+/// API-Sign for a private REST call.
+pub fn sign(path: &str, nonce: u64, body: &str, secret: &[u8]) -> Result<String, String> {
+    let mut sha = Sha256::new();
+    sha.update(nonce.to_string().as_bytes());
+    sha.update(body.as_bytes());
+    let mut mac = Hmac::<Sha512>::new_from_slice(secret).map_err(|e| format!("Invalid API secret: {}", e))?;
+    mac.update(path.as_bytes());
+    mac.update(&sha.finalize());
+    Ok(STANDARD.encode(mac.finalize().into_bytes()))
+}
+
+struct Connection {
+    socket: Mutex<Socket>,
+    // Clone of the TCP socket, used to wait for data without the lock
+    tcp: TcpStream,
+    token: String,
+    alive: AtomicBool,
+    // Tells this connection's pending requests from a replacement's
+    generation: u64,
+}
+
+impl Connection {
+    fn send(&self, text: String) -> Result<(), String> {
+        lock(&self.socket).send(Message::Text(text)).map_err(|e| {
+            self.alive.store(false, Ordering::SeqCst);
+            format!("Failed to send: {}", e)
+        })
+    }
+}
+
+struct Inner {
+    api_key: String,
+    secret: Vec<u8>,
+    rest_url: String,
+    ws_url: String,
+    feeds: Vec<String>,
+    http: Client,
+    nonces: NonceAllocator,
+    reqid: AtomicU64,
+    token: Mutex<Option<(String, Instant)>>,
+    connection: Mutex<Option<Arc<Connection>>>,
+    generations: AtomicU64,
+    // reqid -> (generation of the connection it was sent on, waiter)
+    pending: Mutex<HashMap<u64, (u64, SyncSender<Value>)>>,
+    events: SyncSender<String>,
+    dropped_events: AtomicU64,
+    // Last sequence number seen per private feed
+    sequences: Mutex<HashMap<String, u64>>,
+    connects: AtomicU64,
+    gaps: AtomicU64,
+    downtime_ms: AtomicU64,
+    last_error: Mutex<Option<String>>,
+    stop: AtomicBool,
+}
+
+impl Inner {
+    fn token(&self) -> Result<String, String> {
+        let mut cached = lock(&self.token);
+        if let Some((token, issued)) = cached.as_ref() {
+            if issued.elapsed() < TOKEN_TTL {
+                return Ok(token.clone());
+            }
+        }
+        let nonce = self.nonces.next();
+        let body = format!("nonce={}", nonce);
+        let response = self.http
+            .post(format!("{}{}", self.rest_url, TOKEN_PATH))
+            .header("API-Key", &self.api_key)
+            .header("API-Sign", sign(TOKEN_PATH, nonce, &body, &self.secret)?)
+            .header("Content-Type", "application/x-www-form-urlencoded")
+            .body(body)
+            .send()
+            .map_err(|e| format!("GetWebSocketsToken request failed: {}", e))?;
+        let json: Value = response.json().map_err(|e| format!("Invalid GetWebSocketsToken response: {}", e))?;
+        if let Some(errors) = json["error"].as_array().filter(|errors| !errors.is_empty()) {
+            return Err(format!("GetWebSocketsToken failed: {:?}", errors));
+        }
+        let token = json["result"]["token"].as_str()
+            .ok_or("GetWebSocketsToken returned no token")?
+            .to_string();
+        *cached = Some((token.clone(), Instant::now()));
+        Ok(token)
+    }
+
+    fn connection(self: &Arc<Self>) -> Result<Arc<Connection>, String> {
+        let mut current = lock(&self.connection);
+        if let Some(connection) = current.as_ref() {
+            if connection.alive.load(Ordering::SeqCst) {
+                return Ok(Arc::clone(connection));
+            }
+        }
+        let token = self.token()?;
+        let (socket, _) = connect(self.ws_url.as_str())
+            .map_err(|e| format!("WebSocket connection failed: {}", e))?;
+        let tcp = tcp_stream(&socket)
+            .ok_or("Unsupported WebSocket stream")?
+            .try_clone()
+            .map_err(|e| format!("Failed to clone socket: {}", e))?;
+        set_read_timeout(&socket, Some(IDLE_WAIT));
+
+        let connection = Arc::new(Connection {
+            socket: Mutex::new(socket),
+            tcp,
+            token,
+            alive: AtomicBool::new(true),
+            generation: self.generations.fetch_add(1, Ordering::SeqCst),
+        });
+        for feed in &self.feeds {
+            connection.send(json!({
+                "event": "subscribe",
+                "subscription": {"name": feed, "token": connection.token},
+            }).to_string())?;
+        }
+
+        lock(&self.sequences).clear();
+        let inner = Arc::clone(self);
+        let reader = Arc::clone(&connection);
+        thread::Builder::new()
+            .name("kraken-ws-orders".to_string())
+            .spawn(move || {
+                inner.read_loop(&reader);
+                inner.restore_feeds();
+            })
+            .map_err(|e| format!("Failed to start reader: {}", e))?;
+        self.connects.fetch_add(1, Ordering::SeqCst);
+        *current = Some(Arc::clone(&connection));
+        Ok(connection)
+    }
+
+    fn read_loop(&self, connection: &Connection) {
+        let mut probe = [0u8; 1];
+        while !self.stop.load(Ordering::SeqCst) && connection.alive.load(Ordering::SeqCst) {
+            // Wait for bytes without holding the socket lock
+            match connection.tcp.peek(&mut probe) {
+                Ok(0) => break,
+                Ok(_) => {}
+                Err(e) if matches!(e.kind(), std::io::ErrorKind::WouldBlock | std::io::ErrorKind::TimedOut) => continue,
+                Err(_) => break,
+            }
+            let mut socket = lock(&connection.socket);
+            set_read_timeout(&socket, Some(DRAIN_WAIT));
+            for _ in 0..MAX_DRAIN {
+                match socket.read() {
+                    Ok(Message::Text(text)) => {
+                        if let Some(feed) = self.dispatch(text) {
+                            // Resubscribing makes Kraken send the feed's snapshot again
+                            for event in ["unsubscribe", "subscribe"] {
+                                let message = json!({
+                                    "event": event,
+                                    "subscription": {"name": feed, "token": connection.token},
+                                });
+                                if socket.send(Message::Text(message.to_string())).is_err() {
+                                    connection.alive.store(false, Ordering::SeqCst);
+                                }
+                            }
+                        }
+                    }
+                    Ok(Message::Close(_)) => {
+                        connection.alive.store(false, Ordering::SeqCst);
+                        break;
+                    }
+                    Ok(_) => {}
+                    Err(e) if is_timeout(&e) => break,
+                    Err(_) => {
+                        connection.alive.store(false, Ordering::SeqCst);
+                        break;
+                    }
+                }
+            }
+            set_read_timeout(&socket, Some(IDLE_WAIT));
+        }
+        connection.alive.store(false, Ordering::SeqCst);
+        // Waiters see a disconnected channel instead of timing out; requests
+        // already sent on a replacement connection keep waiting
+        lock(&self.pending).retain(|_, (generation, _)| *generation != connection.generation);
+    }
+
+    // Keeps the private feeds alive across connection losses; requests
+    // reconnect on their own
+    fn restore_feeds(self: &Arc<Self>) {
+        if self.feeds.is_empty() {
+            return;
+        }
+        let down_since = Instant::now();
+        let mut attempt = 0;
+        while !self.stop.load(Ordering::SeqCst) {
+            thread::sleep(backoff(attempt, RECONNECT_INITIAL, RECONNECT_MAX));
+            attempt = attempt.saturating_add(1);
+            match self.connection() {
+                Ok(_) => {
+                    self.downtime_ms.fetch_add(down_since.elapsed().as_millis() as u64, Ordering::SeqCst);
+                    return;
+                }
+                Err(e) => *lock(&self.last_error) = Some(e),
+            }
+        }
+    }
+
+    // Routes an acknowledgement to its waiter and everything else to the
+    // event queue. Returns the name of a private feed whose sequence
+    // numbers skipped, which must be resubscribed.
+    fn dispatch(&self, text: String) -> Option<String> {
+        let mut resync = None;
+        if let Ok(value) = serde_json::from_str::<Value>(&text) {
+            if value["event"] == "heartbeat" {
+                return None;
+            }
+            if let Some(reqid) = value["reqid"].as_u64() {
+                if let Some((_, waiter)) = lock(&self.pending).remove(&reqid) {
+                    let _ = waiter.try_send(value);
+                    return None;
+                }
+            }
+            // [payload, "openOrders", {"sequence": n}]
+            if let (Some(feed), Some(sequence)) = (value[1].as_str(), value[2]["sequence"].as_u64()) {
+                let mut sequences = lock(&self.sequences);
+                match sequences.insert(feed.to_string(), sequence) {
+                    Some(last) if sequence != last + 1 => {
+                        self.gaps.fetch_add(1, Ordering::SeqCst);
+                        // A new subscription numbers from the start again
+                        sequences.remove(feed);
+                        resync = Some(feed.to_string());
+                    }
+                    _ => {}
+                }
+            }
+        }
+        if self.events.try_send(text).is_err() {
+            self.dropped_events.fetch_add(1, Ordering::Relaxed);
+        }
+        resync
+    }
+
+    /// Send `message` with a fresh reqid and the session token, and wait
+    /// for the acknowledgement carrying the same reqid.
+    fn request(self: &Arc<Self>, mut message: Value, timeout: Duration) -> Result<Value, RequestError> {
+        let connection = self.connection().map_err(RequestError::Failed)?;
+        let reqid = self.reqid.fetch_add(1, Ordering::SeqCst);
+        message["reqid"] = json!(reqid);
+        message["token"] = json!(connection.token);
+
+        let (waiter, ack) = sync_channel(1);
+        lock(&self.pending).insert(reqid, (connection.generation, waiter));
+        if let Err(e) = connection.send(message.to_string()) {
+            lock(&self.pending).remove(&reqid);
+            return Err(RequestError::Failed(e));
+        }
+        match ack.recv_timeout(timeout) {
+            Ok(value) => Ok(value),
+            Err(RecvTimeoutError::Timeout) => {
+                lock(&self.pending).remove(&reqid);
+                Err(RequestError::Timeout(format!("No acknowledgement for reqid {} within {:?}", reqid, timeout)))
+            }
+            Err(RecvTimeoutError::Disconnected) => Err(RequestError::Failed("Connection lost before acknowledgement".to_string())),
+        }
+    }
+}
+
+enum RequestError {
+    Failed(String),
+    Timeout(String),
+}
+
+impl From<RequestError> for PyErr {
+    fn from(error: RequestError) -> PyErr {
+        match error {
+            RequestError::Failed(message) => PyRuntimeError::new_err(message),
+            RequestError::Timeout(message) => PyTimeoutError::new_err(message),
+        }
+    }
+}
+
+fn ack_to_py(py: Python<'_>, ack: Value) -> PyResult<PyObject> {
+    if ack["status"] == "error" {
+        let event = ack["event"].as_str().unwrap_or("request");
+        let message = ack["errorMessage"].as_str().unwrap_or("unknown error");
+        return Err(PyRuntimeError::new_err(format!("{} rejected: {}", event, message)));
+    }
+    let loads = PyModule::import(py, "json")?.getattr("loads")?;
+    Ok(loads.call1((ack.to_string(),))?.into_py(py))
+}
+
+fn insert_number(message: &mut Value, key: &str, value: Option<f64>) {
+    if let Some(value) = value {
+        message[key] = json!(value.to_string());
+    }
+}
+
+/// Order entry over one persistent authenticated WebSocket.
+///
+/// The token and the connection are set up on first use (or by
+/// `connect()`) and reused afterwards; a dropped connection is reopened by
+/// the next request, or right away when private feeds are subscribed.
+/// Sequence gaps on those feeds trigger a resubscribe, which replays the
+/// feed's snapshot. Requests wait for their acknowledgement with the GIL
+/// released and return it as a dict; a rejected request raises
+/// RuntimeError and a missing acknowledgement TimeoutError.
+#[pyclass]
+pub struct OrderSession {
+    inner: Arc<Inner>,
+    events: Mutex<Receiver<String>>,
+    #[pyo3(get, set)]
+    timeout: f64,
+}
+
+impl OrderSession {
+    fn call(&self, py: Python<'_>, message: Value) -> PyResult<PyObject> {
+        let timeout = Duration::from_secs_f64(self.timeout.max(0.0));
+        let inner = &self.inner;
+        let ack = py.allow_threads(|| inner.request(message, timeout))?;
+        ack_to_py(py, ack)
+    }
+}
+
+#[pymethods]
+impl OrderSession {
+    #[new]
+    #[pyo3(signature = (config_path="config/config.yaml", timeout=5.0, feeds=None, ws_url=None, rest_url=None))]
+    fn new(config_path: &str, timeout: f64, feeds: Option<Vec<String>>, ws_url: Option<String>,
+           rest_url: Option<String>) -> PyResult<Self> {
+        let content = std::fs::read_to_string(config_path)
+            .map_err(|e| PyRuntimeError::new_err(format!("Cannot read config {}: {}", config_path, e)))?;
+        let config: super::Config = serde_yaml::from_str(&content)
+            .map_err(|e| PyRuntimeError::new_err(format!("Invalid config format: {}", e)))?;
+        let secret = STANDARD.decode(config.kraken.api_secret.trim())
+            .map_err(|e| PyRuntimeError::new_err(format!("Invalid API secret: {}", e)))?;
+        let rest_url = rest_url
+            .or_else(|| std::env::var("KRAKEN_API_URL").ok())
+            .unwrap_or_else(|| DEFAULT_REST_URL.to_string());
+
+        let (events, events_rx) = sync_channel(EVENT_CAPACITY);
+        let nonces = NonceAllocator::for_key(&config.kraken.api_key);
+        let inner = Arc::new(Inner {
+            api_key: config.kraken.api_key,
+            secret,
+            rest_url: rest_url.trim_end_matches('/').to_string(),
+            ws_url: ws_url.unwrap_or_else(|| AUTH_URL.to_string()),
+            feeds: feeds.unwrap_or_default(),
+            http: Client::new(),
+            nonces,
+            reqid: AtomicU64::new(1),
+            token: Mutex::new(None),
+            connection: Mutex::new(None),
+            generations: AtomicU64::new(0),
+            pending: Mutex::new(HashMap::new()),
+            events,
+            dropped_events: AtomicU64::new(0),
+            sequences: Mutex::new(HashMap::new()),
+            connects: AtomicU64::new(0),
+            gaps: AtomicU64::new(0),
+            downtime_ms: AtomicU64::new(0),
+            last_error: Mutex::new(None),
+            stop: AtomicBool::new(false),
+        });
+        Ok(OrderSession { inner, events: Mutex::new(events_rx), timeout })
+    }
+
+    /// Fetch the token and open the socket now instead of on the first order.
+    fn connect(&self, py: Python<'_>) -> PyResult<()> {
+        let inner = &self.inner;
+        py.allow_threads(|| inner.connection().map(|_| ()))
+            .map_err(PyRuntimeError::new_err)
+    }
+
+    #[pyo3(signature = (pair, side, volume, ordertype="limit", price=None, price2=None, leverage=None,
+                        oflags=None, userref=None, validate=false))]
+    fn add_order(&self, py: Python<'_>, pair: &str, side: &str, volume: f64, ordertype: &str,
+                 price: Option<f64>, price2: Option<f64>, leverage: Option<String>,
+                 oflags: Option<String>, userref: Option<i64>, validate: bool) -> PyResult<PyObject> {
+        let mut message = json!({
+            "event": "addOrder",
+            "pair": pair,
+            "type": side,
+            "ordertype": ordertype,
+            "volume": volume.to_string(),
+        });
+        insert_number(&mut message, "price", price);
+        insert_number(&mut message, "price2", price2);
+        if let Some(leverage) = leverage {
+            message["leverage"] = json!(leverage);
+        }
+        if let Some(oflags) = oflags {
+            message["oflags"] = json!(oflags);
+        }
+        if let Some(userref) = userref {
+            message["userref"] = json!(userref.to_string());
+        }
+        if validate {
+            message["validate"] = json!("true");
+        }
+        self.call(py, message)
+    }
+
+    /// Cancel one or more orders in a single request.
+    fn cancel_order(&self, py: Python<'_>, txids: Vec<String>) -> PyResult<PyObject> {
+        self.call(py, json!({"event": "cancelOrder", "txid": txids}))
+    }
+
+    #[pyo3(signature = (txid, pair, volume=None, price=None, price2=None, oflags=None, validate=false))]
+    fn edit_order(&self, py: Python<'_>, txid: &str, pair: &str, volume: Option<f64>, price: Option<f64>,
+                  price2: Option<f64>, oflags: Option<String>, validate: bool) -> PyResult<PyObject> {
+        let mut message = json!({"event": "editOrder", "orderid": txid, "pair": pair});
+        insert_number(&mut message, "volume", volume);
+        insert_number(&mut message, "price", price);
+        insert_number(&mut message, "price2", price2);
+        if let Some(oflags) = oflags {
+            message["oflags"] = json!(oflags);
+        }
+        if validate {
+            message["validate"] = json!("true");
+        }
+        self.call(py, message)
+    }
+
+    /// Next message that was not an acknowledgement (feed updates,
+    /// subscription status), as JSON text, or None after `timeout` seconds.
+    #[pyo3(signature = (timeout=None))]
+    fn next_event(&self, py: Python<'_>, timeout: Option<f64>) -> PyResult<Option<String>> {
+        let deadline = timeout.map(|t| Instant::now() + Duration::from_secs_f64(t.max(0.0)));
+        loop {
+            let wait = match deadline {
+                Some(deadline) => deadline.saturating_duration_since(Instant::now()).min(IDLE_WAIT),
+                None => IDLE_WAIT,
+            };
+            let events = &self.events;
+            match py.allow_threads(|| lock(events).recv_timeout(wait)) {
+                Ok(text) => return Ok(Some(text)),
+                Err(RecvTimeoutError::Timeout) => {
+                    py.check_signals()?;
+                    if deadline.map_or(false, |d| Instant::now() >= d) {
+                        return Ok(None);
+                    }
+                }
+                Err(RecvTimeoutError::Disconnected) => return Ok(None),
+            }
+        }
+    }
+
+    fn close(&self) {
+        self.inner.stop.store(true, Ordering::SeqCst);
+        if let Some(connection) = lock(&self.inner.connection).take() {
+            connection.alive.store(false, Ordering::SeqCst);
+            let _ = lock(&connection.socket).close(None);
+        }
+    }
+
+    fn __enter__(slf: PyRef<'_, Self>) -> PyRef<'_, Self> {
+        slf
+    }
+
+    fn __exit__(&self, _exc_type: PyObject, _exc: PyObject, _tb: PyObject) {
+        self.close();
+    }
+
+    #[getter]
+    fn connected(&self) -> bool {
+        lock(&self.inner.connection).as_ref().map_or(false, |c| c.alive.load(Ordering::SeqCst))
+    }
+
+    /// Seconds since the cached token was issued, or None.
+    #[getter]
+    fn token_age(&self) -> Option<f64> {
+        lock(&self.inner.token).as_ref().map(|(_, issued)| issued.elapsed().as_secs_f64())
+    }
+
+    #[getter]
+    fn dropped_events(&self) -> u64 {
+        self.inner.dropped_events.load(Ordering::Relaxed)
+    }
+
+    /// Connection health: connects, sequence gaps on the private feeds,
+    /// downtime in seconds while restoring feeds and the last reconnect error.
+    fn stats(&self, py: Python<'_>) -> PyResult<PyObject> {
+        let inner = &self.inner;
+        let stats = pyo3::types::PyDict::new(py);
+        stats.set_item("connected", self.connected())?;
+        stats.set_item("connects", inner.connects.load(Ordering::SeqCst))?;
+        stats.set_item("gaps", inner.gaps.load(Ordering::SeqCst))?;
+        stats.set_item("downtime", inner.downtime_ms.load(Ordering::SeqCst) as f64 / 1000.0)?;
+        stats.set_item("dropped_events", inner.dropped_events.load(Ordering::Relaxed))?;
+        stats.set_item("last_error", lock(&inner.last_error).clone())?;
+        Ok(stats.into_py(py))
+    }
+}
+
+impl Drop for OrderSession {
+    fn drop(&mut self) {
+        self.close();
+    }
+}
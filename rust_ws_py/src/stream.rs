@@ -0,0 +1,828 @@
+//! Persistent public-feed subscriptions.
+//!
+//! A `Subscription` owns one WebSocket connection on a background thread.
+//! Frames are read and decoded into plain Rust structs on that thread,
+//! without the GIL, and handed to Python through a bounded channel.
+
+use pyo3::exceptions::{PyRuntimeError, PyValueError};
+use pyo3::prelude::*;
+use serde_json::Value;
+use std::collections::{BTreeMap, HashMap};
+use std::net::TcpStream;
+use std::sync::atomic::{AtomicBool, AtomicU64, Ordering};
+use std::sync::mpsc::{self, sync_channel, Receiver, RecvTimeoutError, Sender, SyncSender, TrySendError};
+use std::sync::{Arc, Mutex};
+use std::thread::{self, JoinHandle};
+use std::time::{Duration, Instant, SystemTime, UNIX_EPOCH};
+use tungstenite::stream::MaybeTlsStream;
+use tungstenite::{connect, Message, WebSocket};
+
+pub const PUBLIC_URL: &str = "wss://ws.kraken.com";
+const DEFAULT_CAPACITY: usize = 10_000;
+// How often the reader checks for close() and recv() checks for Ctrl-C
+const POLL_INTERVAL: Duration = Duration::from_millis(100);
+
+pub type Socket = WebSocket<MaybeTlsStream<TcpStream>>;
+
+fn now() -> f64 {
+    SystemTime::now()
+        .duration_since(UNIX_EPOCH)
+        .map(|d| d.as_secs_f64())
+        .unwrap_or(0.0)
+}
+
+fn number(value: &Value) -> f64 {
+    value.as_str()
+        .and_then(|s| s.parse().ok())
+        .or_else(|| value.as_f64())
+        .unwrap_or(f64::NAN)
+}
+
+fn text(value: &Value) -> String {
+    value.as_str().map(str::to_string).unwrap_or_else(|| value.to_string())
+}
+
+/// Best bid/ask and last trade for one pair.
+#[pyclass(get_all)]
+#[derive(Clone, Debug)]
+pub struct TickerUpdate {
+    pub pair: String,
+    pub bid: f64,
+    pub bid_volume: f64,
+    pub ask: f64,
+    pub ask_volume: f64,
+    pub last: f64,
+    pub volume: f64,
+    pub recv_time: f64,
+}
+
+/// Book snapshot or delta. Each level is (price, volume, timestamp,
+/// price_text, volume_text); the texts are kept exactly as sent, which the
+/// book checksum is computed from.
+#[pyclass(get_all)]
+#[derive(Clone, Debug)]
+pub struct BookUpdate {
+    pub pair: String,
+    pub asks: Vec<(f64, f64, f64, String, String)>,
+    pub bids: Vec<(f64, f64, f64, String, String)>,
+    pub snapshot: bool,
+    pub checksum: Option<u32>,
+    pub recv_time: f64,
+}
+
+/// Trades for one pair; each is (price, volume, time, side, ordertype).
+#[pyclass(get_all)]
+#[derive(Clone, Debug)]
+pub struct TradeUpdate {
+    pub pair: String,
+    pub trades: Vec<(f64, f64, f64, String, String)>,
+    pub recv_time: f64,
+}
+
+#[pymethods]
+impl TickerUpdate {
+    fn __repr__(&self) -> String {
+        format!("TickerUpdate(pair='{}', bid={}, ask={}, last={})", self.pair, self.bid, self.ask, self.last)
+    }
+}
+
+#[pymethods]
+impl BookUpdate {
+    fn __repr__(&self) -> String {
+        format!("BookUpdate(pair='{}', snapshot={}, asks={}, bids={}, checksum={:?})",
+                self.pair, self.snapshot, self.asks.len(), self.bids.len(), self.checksum)
+    }
+}
+
+#[pymethods]
+impl TradeUpdate {
+    fn __repr__(&self) -> String {
+        format!("TradeUpdate(pair='{}', trades={})", self.pair, self.trades.len())
+    }
+}
+
+pub enum Event {
+    Ticker(TickerUpdate),
+    Book(BookUpdate),
+    Trade(TradeUpdate),
+    Gap(GapEvent),
+}
+
+impl Event {
+    fn into_py_object(self, py: Python<'_>) -> PyResult<PyObject> {
+        Ok(match self {
+            Event::Ticker(update) => Py::new(py, update)?.into_py(py),
+            Event::Book(update) => Py::new(py, update)?.into_py(py),
+            Event::Trade(update) => Py::new(py, update)?.into_py(py),
+            Event::Gap(gap) => Py::new(py, gap)?.into_py(py),
+        })
+    }
+}
+
+fn book_levels(levels: &Value) -> Vec<(f64, f64, f64, String, String)> {
+    levels.as_array()
+        .map(|levels| levels.iter().map(|level| (
+            number(&level[0]),
+            number(&level[1]),
+            number(&level[2]),
+            text(&level[0]),
+            text(&level[1]),
+        )).collect())
+        .unwrap_or_default()
+}
+
+/// Decodes one v1 public-feed frame. Heartbeats and status events give
+/// `Ok(None)`; a rejected subscription gives `Err` with Kraken's message.
+pub fn decode(frame: &str, recv_time: f64) -> Result<Option<Event>, String> {
+    let value: Value = match serde_json::from_str(frame) {
+        Ok(value) => value,
+        Err(_) => return Ok(None),
+    };
+
+    if let Some(event) = value.as_object() {
+        let is_error = event.get("event").and_then(Value::as_str) == Some("subscriptionStatus")
+            && event.get("status").and_then(Value::as_str) == Some("error");
+        if is_error {
+            return Err(event.get("errorMessage").map(text).unwrap_or_else(|| frame.to_string()));
+        }
+        return Ok(None);
+    }
+
+    // [channelID, payload..., channelName, pair]
+    let parts = match value.as_array() {
+        Some(parts) if parts.len() >= 4 => parts,
+        _ => return Ok(None),
+    };
+    let channel = parts[parts.len() - 2].as_str().unwrap_or_default();
+    let pair = text(&parts[parts.len() - 1]);
+    let payload = &parts[1..parts.len() - 2];
+
+    if channel == "ticker" {
+        let data = &payload[0];
+        return Ok(Some(Event::Ticker(TickerUpdate {
+            pair,
+            bid: number(&data["b"][0]),
+            bid_volume: number(&data["b"][2]),
+            ask: number(&data["a"][0]),
+            ask_volume: number(&data["a"][2]),
+            last: number(&data["c"][0]),
+            // v[1] is the rolling 24h volume
+            volume: number(&data["v"][1]),
+            recv_time,
+        })));
+    }
+
+    if channel.starts_with("book") {
+        let mut update = BookUpdate {
+            pair,
+            asks: Vec::new(),
+            bids: Vec::new(),
+            snapshot: false,
+            checksum: None,
+            recv_time,
+        };
+        // A delta touching both sides arrives as two objects
+        for part in payload.iter().filter_map(Value::as_object) {
+            for (key, levels) in part {
+                match key.as_str() {
+                    "as" => { update.snapshot = true; update.asks.extend(book_levels(levels)); }
+                    "bs" => { update.snapshot = true; update.bids.extend(book_levels(levels)); }
+                    "a" => update.asks.extend(book_levels(levels)),
+                    "b" => update.bids.extend(book_levels(levels)),
+                    "c" => update.checksum = levels.as_str().and_then(|c| c.parse().ok()),
+                    _ => {}
+                }
+            }
+        }
+        return Ok(Some(Event::Book(update)));
+    }
+
+    if channel == "trade" {
+        let trades = payload[0].as_array()
+            .map(|trades| trades.iter().map(|trade| (
+                number(&trade[0]),
+                number(&trade[1]),
+                number(&trade[2]),
+                text(&trade[3]),
+                text(&trade[4]),
+            )).collect())
+            .unwrap_or_default();
+        return Ok(Some(Event::Trade(TradeUpdate { pair, trades, recv_time })));
+    }
+
+    Ok(None)
+}
+
+// Levels Kraken's book checksum covers on each side
+const CHECKSUM_LEVELS: usize = 10;
+
+fn crc32(bytes: &[u8]) -> u32 {
+    let mut crc = !0u32;
+    for &byte in bytes {
+        crc ^= byte as u32;
+        for _ in 0..8 {
+            crc = if crc & 1 != 0 { (crc >> 1) ^ 0xEDB8_8320 } else { crc >> 1 };
+        }
+    }
+    !crc
+}
+
+fn checksum_text(text: &str) -> String {
+    text.replace('.', "").trim_start_matches('0').to_string()
+}
+
+/// The price and volume texts of one pair's book, kept only to check the
+/// checksum Kraken sends with each delta. Prices are positive, so their
+/// bit patterns sort like the prices themselves.
+#[derive(Default)]
+struct ChecksumBook {
+    asks: BTreeMap<u64, (String, String)>,
+    bids: BTreeMap<u64, (String, String)>,
+    synced: bool,
+    updated_at: f64,
+}
+
+impl ChecksumBook {
+    fn apply_side(side: &mut BTreeMap<u64, (String, String)>, levels: &[(f64, f64, f64, String, String)]) {
+        for (price, volume, _, price_text, volume_text) in levels {
+            if *volume == 0.0 {
+                side.remove(&price.to_bits());
+            } else {
+                side.insert(price.to_bits(), (price_text.clone(), volume_text.clone()));
+            }
+        }
+    }
+
+    fn checksum(&self) -> u32 {
+        let mut text = String::new();
+        for (price, volume) in self.asks.values().take(CHECKSUM_LEVELS).chain(self.bids.values().rev().take(CHECKSUM_LEVELS)) {
+            text.push_str(&checksum_text(price));
+            text.push_str(&checksum_text(volume));
+        }
+        crc32(text.as_bytes())
+    }
+
+    /// Applies an update. Returns the time of the last update that
+    /// matched when this one leaves the book off Kraken's checksum.
+    fn apply(&mut self, update: &BookUpdate, depth: usize) -> Option<f64> {
+        if update.snapshot {
+            self.asks.clear();
+            self.bids.clear();
+            self.synced = true;
+        } else if !self.synced {
+            // Waiting for the snapshot a resubscribe brings
+            return None;
+        }
+        Self::apply_side(&mut self.asks, &update.asks);
+        Self::apply_side(&mut self.bids, &update.bids);
+        // Kraken stops updating levels pushed out of the subscribed depth
+        while self.asks.len() > depth {
+            self.asks.pop_last();
+        }
+        while self.bids.len() > depth {
+            self.bids.pop_first();
+        }
+        let since = self.updated_at;
+        self.updated_at = update.recv_time;
+        match update.checksum {
+            Some(expected) if expected != self.checksum() => {
+                self.synced = false;
+                Some(since)
+            }
+            _ => None,
+        }
+    }
+}
+
+/// A subscribe or unsubscribe request for `pairs` on one channel.
+pub fn subscription_message(event: &str, channel: &str, pairs: &[String], depth: u32) -> String {
+    let mut subscription = serde_json::json!({ "name": channel });
+    if channel == "book" {
+        subscription["depth"] = serde_json::json!(depth);
+    }
+    serde_json::json!({
+        "event": event,
+        "pair": pairs,
+        "subscription": subscription,
+    }).to_string()
+}
+
+/// The TCP socket under a plain or TLS WebSocket.
+pub fn tcp_stream(socket: &Socket) -> Option<&TcpStream> {
+    match socket.get_ref() {
+        MaybeTlsStream::Plain(stream) => Some(stream),
+        MaybeTlsStream::NativeTls(stream) => Some(stream.get_ref()),
+        _ => None,
+    }
+}
+
+// Lets the blocking read wake up periodically to notice close()
+pub fn set_read_timeout(socket: &Socket, timeout: Option<Duration>) {
+    if let Some(stream) = tcp_stream(socket) {
+        let _ = stream.set_read_timeout(timeout);
+    }
+}
+
+pub fn is_timeout(error: &tungstenite::Error) -> bool {
+    matches!(error, tungstenite::Error::Io(e)
+        if e.kind() == std::io::ErrorKind::WouldBlock || e.kind() == std::io::ErrorKind::TimedOut)
+}
+
+/// Reconnect behaviour of a Subscription.
+#[derive(Clone, Copy)]
+pub struct Reconnect {
+    pub enabled: bool,
+    pub initial_backoff: Duration,
+    pub max_backoff: Duration,
+    // Kraken sends a heartbeat every second on an idle subscription, so a
+    // silent socket this long is treated as dead
+    pub stale_after: Duration,
+    pub report_gaps: bool,
+}
+
+// A connection that stayed up this long resets the backoff
+const STABLE_AFTER: Duration = Duration::from_secs(30);
+
+/// Backoff before reconnect attempt `attempt`: exponential, capped, with
+/// jitter in [50%, 100%] so many clients do not reconnect in lockstep.
+pub fn backoff(attempt: u32, initial: Duration, max: Duration) -> Duration {
+    let ceiling = initial.saturating_mul(1u32 << attempt.min(16)).min(max);
+    let nanos = SystemTime::now().duration_since(UNIX_EPOCH).map(|d| d.subsec_nanos()).unwrap_or(0);
+    let jitter = 0.5 + 0.5 * (nanos % 1000) as f64 / 1000.0;
+    ceiling.mul_f64(jitter)
+}
+
+/// Data missed while a subscription was disconnected, or by one book whose
+/// checksum stopped matching on a live connection. Book subscriptions
+/// receive fresh snapshots right after it.
+#[pyclass(get_all)]
+#[derive(Clone, Debug)]
+pub struct GapEvent {
+    pub channel: String,
+    pub pairs: Vec<String>,
+    pub start: f64,
+    pub end: f64,
+    pub reason: String,
+}
+
+#[pymethods]
+impl GapEvent {
+    fn __repr__(&self) -> String {
+        format!("GapEvent(channel='{}', seconds={:.3}, reason='{}')", self.channel, self.end - self.start, self.reason)
+    }
+}
+
+struct Shared {
+    stop: AtomicBool,
+    closed: AtomicBool,
+    connected: AtomicBool,
+    received: AtomicU64,
+    dropped: AtomicU64,
+    connects: AtomicU64,
+    reconnects: AtomicU64,
+    stale: AtomicU64,
+    gaps: AtomicU64,
+    downtime_ms: AtomicU64,
+    error: Mutex<Option<String>>,
+    last_disconnect: Mutex<Option<String>>,
+    rejections: Mutex<Vec<String>>,
+    pairs: Mutex<Vec<String>>,
+}
+
+fn lock<T>(mutex: &Mutex<T>) -> std::sync::MutexGuard<'_, T> {
+    mutex.lock().unwrap_or_else(|e| e.into_inner())
+}
+
+fn deliver(tx: &SyncSender<Event>, event: Event, shared: &Shared) -> Result<(), Disconnect> {
+    shared.received.fetch_add(1, Ordering::Relaxed);
+    match tx.try_send(event) {
+        Ok(()) => Ok(()),
+        // A consumer that falls behind loses the newest updates
+        Err(TrySendError::Full(_)) => {
+            shared.dropped.fetch_add(1, Ordering::Relaxed);
+            Ok(())
+        }
+        Err(TrySendError::Disconnected(_)) => Err(Disconnect::fatal("Subscription dropped")),
+    }
+}
+
+struct Disconnect {
+    reason: String,
+    fatal: bool,
+}
+
+impl Disconnect {
+    fn retry(reason: String) -> Self {
+        Disconnect { reason, fatal: false }
+    }
+
+    fn fatal(reason: &str) -> Self {
+        Disconnect { reason: reason.to_string(), fatal: true }
+    }
+}
+
+struct Worker {
+    url: String,
+    channel: String,
+    depth: u32,
+    reconnect: Reconnect,
+    commands: Receiver<String>,
+    tx: SyncSender<Event>,
+    shared: Arc<Shared>,
+}
+
+impl Worker {
+    fn run(&self) {
+        let mut attempt = 0;
+        let mut down_since: Option<(f64, String)> = None;
+        while !self.shared.stop.load(Ordering::SeqCst) {
+            let started = Instant::now();
+            let disconnect = match self.session(&mut down_since) {
+                Ok(()) => break,
+                Err(disconnect) => disconnect,
+            };
+            self.shared.connected.store(false, Ordering::SeqCst);
+            *lock(&self.shared.last_disconnect) = Some(disconnect.reason.clone());
+            if disconnect.fatal || !self.reconnect.enabled {
+                *lock(&self.shared.error) = Some(disconnect.reason);
+                break;
+            }
+            if down_since.is_none() {
+                down_since = Some((now(), disconnect.reason));
+            }
+            if started.elapsed() >= STABLE_AFTER {
+                attempt = 0;
+            }
+            let deadline = Instant::now() + backoff(attempt, self.reconnect.initial_backoff, self.reconnect.max_backoff);
+            attempt = attempt.saturating_add(1);
+            while Instant::now() < deadline && !self.shared.stop.load(Ordering::SeqCst) {
+                thread::sleep(POLL_INTERVAL.min(deadline.saturating_duration_since(Instant::now())));
+            }
+        }
+        self.shared.connected.store(false, Ordering::SeqCst);
+    }
+
+    // Subscribes the current pair set; changes queued while disconnected
+    // are already part of it
+    fn subscribe(&self, socket: &mut Socket) -> Result<(), Disconnect> {
+        let pairs = lock(&self.shared.pairs);
+        while self.commands.try_recv().is_ok() {}
+        if !pairs.is_empty() {
+            socket.send(Message::Text(subscription_message("subscribe", &self.channel, &pairs, self.depth)))
+                .map_err(|e| Disconnect::retry(format!("Failed to send subscription: {}", e)))?;
+        }
+        Ok(())
+    }
+
+    fn session(&self, down_since: &mut Option<(f64, String)>) -> Result<(), Disconnect> {
+        let shared = &self.shared;
+        let (mut socket, _) = connect(self.url.as_str())
+            .map_err(|e| Disconnect::retry(format!("WebSocket connection failed: {}", e)))?;
+        set_read_timeout(&socket, Some(POLL_INTERVAL));
+        self.subscribe(&mut socket)?;
+
+        if shared.connects.fetch_add(1, Ordering::SeqCst) > 0 {
+            shared.reconnects.fetch_add(1, Ordering::SeqCst);
+        }
+        shared.connected.store(true, Ordering::SeqCst);
+        if let Some((start, reason)) = down_since.take() {
+            let end = now();
+            shared.gaps.fetch_add(1, Ordering::SeqCst);
+            shared.downtime_ms.fetch_add(((end - start) * 1000.0) as u64, Ordering::SeqCst);
+            if self.reconnect.report_gaps {
+                let pairs = lock(&shared.pairs).clone();
+                deliver(&self.tx, Event::Gap(GapEvent { channel: self.channel.clone(), pairs, start, end, reason }), shared)?;
+            }
+        }
+
+        // Book texts per pair, rebuilt from the snapshots of this connection
+        let mut books: HashMap<String, ChecksumBook> = HashMap::new();
+        let mut last_frame = Instant::now();
+        while !shared.stop.load(Ordering::Relaxed) {
+            // Pair changes requested from Python go out on the same socket
+            while let Ok(message) = self.commands.try_recv() {
+                socket.send(Message::Text(message))
+                    .map_err(|e| Disconnect::retry(format!("Failed to send subscription change: {}", e)))?;
+            }
+            match socket.read() {
+                Ok(Message::Text(frame)) => {
+                    last_frame = Instant::now();
+                    match decode(&frame, now()) {
+                        Ok(Some(event)) => {
+                            if let Event::Book(update) = &event {
+                                let book = books.entry(update.pair.clone()).or_default();
+                                if let Some(since) = book.apply(update, self.depth as usize) {
+                                    self.checksum_gap(&mut socket, &update.pair, since)?;
+                                }
+                            }
+                            deliver(&self.tx, event, shared)?
+                        }
+                        Ok(None) => {}
+                        // One rejected pair must not take down the others on this socket
+                        Err(rejection) => lock(&shared.rejections).push(rejection),
+                    }
+                }
+                Ok(Message::Close(_)) => return Err(Disconnect::retry("Connection closed by server".to_string())),
+                Ok(_) => last_frame = Instant::now(),
+                Err(e) if is_timeout(&e) => {
+                    if last_frame.elapsed() > self.reconnect.stale_after {
+                        shared.stale.fetch_add(1, Ordering::SeqCst);
+                        return Err(Disconnect::retry(format!("No data for {:?}", self.reconnect.stale_after)));
+                    }
+                }
+                Err(e) => return Err(Disconnect::retry(format!("WebSocket error: {}", e))),
+            }
+        }
+        let _ = socket.close(None);
+        Ok(())
+    }
+
+    // Public feeds carry no sequence numbers; a book that no longer matches
+    // its checksum is how a missed update on a live socket shows. As on the
+    // private feeds, the pair is resubscribed, which brings a new snapshot.
+    fn checksum_gap(&self, socket: &mut Socket, pair: &str, since: f64) -> Result<(), Disconnect> {
+        let shared = &self.shared;
+        shared.gaps.fetch_add(1, Ordering::SeqCst);
+        let pairs = vec![pair.to_string()];
+        for event in ["unsubscribe", "subscribe"] {
+            socket.send(Message::Text(subscription_message(event, &self.channel, &pairs, self.depth)))
+                .map_err(|e| Disconnect::retry(format!("Failed to resubscribe {}: {}", pair, e)))?;
+        }
+        if self.reconnect.report_gaps {
+            let gap = GapEvent {
+                channel: self.channel.clone(),
+                pairs,
+                start: since,
+                end: now(),
+                reason: "Book checksum mismatch".to_string(),
+            };
+            deliver(&self.tx, Event::Gap(gap), shared)?;
+        }
+        Ok(())
+    }
+}
+
+/// Live subscription to one public channel ('ticker', 'book' or 'trade').
+///
+/// Iterate over it, or call `recv(timeout)`; both wait with the GIL
+/// released. Messages arrive as TickerUpdate, BookUpdate or TradeUpdate.
+/// A dropped or silent connection is reopened with jittered exponential
+/// backoff and the current pairs are subscribed again; book subscriptions
+/// start over from fresh snapshots. A book whose checksum stops matching
+/// is resubscribed on the open connection. With `report_gaps` each outage
+/// and each checksum mismatch is also delivered as a GapEvent, ahead of the
+/// update that revealed it.
+#[pyclass]
+pub struct Subscription {
+    receiver: Mutex<Receiver<Event>>,
+    shared: Arc<Shared>,
+    worker: Mutex<Option<JoinHandle<()>>>,
+    commands: Mutex<Sender<String>>,
+    #[pyo3(get)]
+    channel: String,
+    #[pyo3(get)]
+    depth: u32,
+}
+
+enum Next {
+    Event(Event),
+    Timeout,
+    Closed,
+}
+
+impl Subscription {
+    fn send_command(&self, message: String) -> PyResult<()> {
+        lock(&self.commands)
+            .send(message)
+            .map_err(|_| PyRuntimeError::new_err(
+                self.error().unwrap_or_else(|| "Subscription closed".to_string())
+            ))
+    }
+
+    fn next_event(&self, py: Python<'_>, timeout: Option<f64>) -> PyResult<Next> {
+        let deadline = timeout.map(|t| Instant::now() + Duration::from_secs_f64(t.max(0.0)));
+        loop {
+            let wait = match deadline {
+                Some(deadline) => deadline.saturating_duration_since(Instant::now()).min(POLL_INTERVAL),
+                None => POLL_INTERVAL,
+            };
+            let received = py.allow_threads(|| lock(&self.receiver).recv_timeout(wait));
+            match received {
+                Ok(event) => return Ok(Next::Event(event)),
+                Err(RecvTimeoutError::Timeout) => {
+                    py.check_signals()?;
+                    if deadline.map_or(false, |d| Instant::now() >= d) {
+                        return Ok(Next::Timeout);
+                    }
+                }
+                Err(RecvTimeoutError::Disconnected) => return Ok(Next::Closed),
+            }
+        }
+    }
+
+    fn error(&self) -> Option<String> {
+        lock(&self.shared.error).clone()
+    }
+}
+
+#[pymethods]
+impl Subscription {
+    #[new]
+    #[pyo3(signature = (channel, pairs, depth=10, url=None, capacity=DEFAULT_CAPACITY, reconnect=true,
+                        initial_backoff=0.5, max_backoff=30.0, stale_after=10.0, report_gaps=false))]
+    fn new(channel: String, pairs: Vec<String>, depth: u32, url: Option<String>, capacity: usize,
+           reconnect: bool, initial_backoff: f64, max_backoff: f64, stale_after: f64,
+           report_gaps: bool) -> PyResult<Self> {
+        if !matches!(channel.as_str(), "ticker" | "book" | "trade") {
+            return Err(PyValueError::new_err(format!("Unsupported channel '{}'", channel)));
+        }
+        let (tx, rx) = sync_channel(capacity.max(1));
+        let shared = Arc::new(Shared {
+            stop: AtomicBool::new(false),
+            closed: AtomicBool::new(false),
+            connected: AtomicBool::new(false),
+            received: AtomicU64::new(0),
+            dropped: AtomicU64::new(0),
+            connects: AtomicU64::new(0),
+            reconnects: AtomicU64::new(0),
+            stale: AtomicU64::new(0),
+            gaps: AtomicU64::new(0),
+            downtime_ms: AtomicU64::new(0),
+            error: Mutex::new(None),
+            last_disconnect: Mutex::new(None),
+            rejections: Mutex::new(Vec::new()),
+            // A subscription may start empty and get its pairs later
+            pairs: Mutex::new(pairs),
+        });
+
+        let (commands, command_rx) = mpsc::channel();
+        let worker = Worker {
+            url: url.unwrap_or_else(|| PUBLIC_URL.to_string()),
+            channel: channel.clone(),
+            depth,
+            reconnect: Reconnect {
+                enabled: reconnect,
+                initial_backoff: Duration::from_secs_f64(initial_backoff.max(0.0)),
+                max_backoff: Duration::from_secs_f64(max_backoff.max(0.0)),
+                stale_after: Duration::from_secs_f64(stale_after.max(0.0)),
+                report_gaps,
+            },
+            commands: command_rx,
+            tx,
+            shared: Arc::clone(&shared),
+        };
+        let handle = thread::Builder::new()
+            .name(format!("kraken-ws-{}", channel))
+            .spawn(move || {
+                worker.run();
+                worker.shared.closed.store(true, Ordering::SeqCst);
+            })
+            .map_err(|e| PyRuntimeError::new_err(format!("Failed to start reader: {}", e)))?;
+
+        Ok(Subscription {
+            receiver: Mutex::new(rx),
+            shared,
+            worker: Mutex::new(Some(handle)),
+            commands: Mutex::new(commands),
+            channel,
+            depth,
+        })
+    }
+
+    /// Next message, or None if nothing arrives within `timeout` seconds.
+    /// Raises RuntimeError once the connection is gone.
+    #[pyo3(signature = (timeout=None))]
+    fn recv(&self, py: Python<'_>, timeout: Option<f64>) -> PyResult<Option<PyObject>> {
+        match self.next_event(py, timeout)? {
+            Next::Event(event) => event.into_py_object(py).map(Some),
+            Next::Timeout => Ok(None),
+            Next::Closed => Err(PyRuntimeError::new_err(
+                self.error().unwrap_or_else(|| "Subscription closed".to_string())
+            )),
+        }
+    }
+
+    fn __iter__(slf: PyRef<'_, Self>) -> PyRef<'_, Self> {
+        slf
+    }
+
+    fn __next__(&self, py: Python<'_>) -> PyResult<Option<PyObject>> {
+        match self.next_event(py, None)? {
+            Next::Event(event) => event.into_py_object(py).map(Some),
+            Next::Timeout => Ok(None),
+            Next::Closed => match self.error() {
+                Some(error) => Err(PyRuntimeError::new_err(error)),
+                None => Ok(None),
+            },
+        }
+    }
+
+    /// Stop the reader thread and close the connection.
+    fn close(&self, py: Python<'_>) {
+        self.shared.stop.store(true, Ordering::SeqCst);
+        let worker = lock(&self.worker).take();
+        if let Some(worker) = worker {
+            py.allow_threads(|| {
+                let _ = worker.join();
+            });
+        }
+    }
+
+    fn __enter__(slf: PyRef<'_, Self>) -> PyRef<'_, Self> {
+        slf
+    }
+
+    fn __exit__(&self, py: Python<'_>, _exc_type: PyObject, _exc: PyObject, _tb: PyObject) {
+        self.close(py);
+    }
+
+    /// Subscribe more pairs on this connection.
+    fn add_pairs(&self, pairs: Vec<String>) -> PyResult<()> {
+        let mut current = lock(&self.shared.pairs);
+        let added: Vec<String> = pairs.into_iter().filter(|p| !current.contains(p)).collect();
+        if added.is_empty() {
+            return Ok(());
+        }
+        self.send_command(subscription_message("subscribe", &self.channel, &added, self.depth))?;
+        current.extend(added);
+        Ok(())
+    }
+
+    /// Unsubscribe pairs; the connection stays open.
+    fn remove_pairs(&self, pairs: Vec<String>) -> PyResult<()> {
+        let mut current = lock(&self.shared.pairs);
+        let removed: Vec<String> = pairs.into_iter().filter(|p| current.contains(p)).collect();
+        if removed.is_empty() {
+            return Ok(());
+        }
+        self.send_command(subscription_message("unsubscribe", &self.channel, &removed, self.depth))?;
+        current.retain(|p| !removed.contains(p));
+        Ok(())
+    }
+
+    #[getter]
+    fn pairs(&self) -> Vec<String> {
+        lock(&self.shared.pairs).clone()
+    }
+
+    #[getter]
+    fn is_closed(&self) -> bool {
+        self.shared.closed.load(Ordering::SeqCst)
+    }
+
+    /// Messages decoded since the subscription started.
+    #[getter]
+    fn received(&self) -> u64 {
+        self.shared.received.load(Ordering::Relaxed)
+    }
+
+    /// Messages discarded because the consumer fell `capacity` behind.
+    #[getter]
+    fn dropped(&self) -> u64 {
+        self.shared.dropped.load(Ordering::Relaxed)
+    }
+
+    #[getter]
+    fn last_error(&self) -> Option<String> {
+        self.error()
+    }
+
+    /// Error messages of subscribe requests the exchange rejected.
+    #[getter]
+    fn rejections(&self) -> Vec<String> {
+        lock(&self.shared.rejections).clone()
+    }
+
+    #[getter]
+    fn connected(&self) -> bool {
+        self.shared.connected.load(Ordering::SeqCst)
+    }
+
+    /// Connection health: connects, reconnects, stale (silent connections
+    /// dropped), gaps (outages and book checksum mismatches), downtime in
+    /// seconds and the last disconnect reason.
+    fn stats(&self, py: Python<'_>) -> PyResult<PyObject> {
+        let shared = &self.shared;
+        let stats = pyo3::types::PyDict::new(py);
+        stats.set_item("connected", shared.connected.load(Ordering::SeqCst))?;
+        stats.set_item("connects", shared.connects.load(Ordering::SeqCst))?;
+        stats.set_item("reconnects", shared.reconnects.load(Ordering::SeqCst))?;
+        stats.set_item("stale", shared.stale.load(Ordering::SeqCst))?;
+        stats.set_item("gaps", shared.gaps.load(Ordering::SeqCst))?;
+        stats.set_item("downtime", shared.downtime_ms.load(Ordering::SeqCst) as f64 / 1000.0)?;
+        stats.set_item("received", shared.received.load(Ordering::Relaxed))?;
+        stats.set_item("dropped", shared.dropped.load(Ordering::Relaxed))?;
+        stats.set_item("last_disconnect", lock(&shared.last_disconnect).clone())?;
+        Ok(stats.into_py(py))
+    }
+
+    fn __repr__(&self) -> String {
+        format!("Subscription(channel='{}', pairs={:?}, closed={})", self.channel, self.pairs(), self.is_closed())
+    }
+}
+
+impl Drop for Subscription {
+    fn drop(&mut self) {
+        self.shared.stop.store(true, Ordering::SeqCst);
+    }
+}
@@ -4,15 +4,19 @@ import json
 import time
 import boto3
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../clients")))
 from kraken_python_client import KrakenPythonClient
+from pair_registry import PAIR_REGISTRY
 
 
 class KrakenOrderBookCollector:
-    def __init__(self, config_path: str, bucket_name: str):
+    def __init__(self, config_path: str, bucket_name: str, workers: int = 16):
+        # One client shared by every worker thread; its calls release the GIL
         self.kraken = KrakenPythonClient()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='collector')
         self.pairs = [
                         "XBTEUR",
                         "XBTUSD",
@@ -171,6 +175,7 @@ class KrakenOrderBookCollector:
                         "EURQUSD",
                         "EURQEUR"
                     ]
+        self.pairs = self._valid_pairs(self.pairs)
   
         aws_credentials = self._load_aws_credentials(config_path)
         session = boto3.Session(
@@ -184,6 +189,17 @@ class KrakenOrderBookCollector:
         with open(path, 'r') as f:
             return json.load(f)
 
+    def _valid_pairs(self, pairs):
+        # Drop pairs Kraken does not list so they never cost a round trip
+        try:
+            valid, invalid = PAIR_REGISTRY.split_valid(pairs)
+        except Exception as e:
+            print(f'Pair registry unavailable, keeping all pairs: {e}')
+            return pairs
+        if invalid:
+            print(f'Skipping unknown pairs: {", ".join(invalid)}')
+        return valid
+
     def _load_aws_credentials(self, config_path):
         with open(config_path, 'r') as f:
             config = yaml.safe_load(f)
@@ -211,8 +227,32 @@ class KrakenOrderBookCollector:
             print(f'Error occured during fetch_snapshot: {e}')
 
     def collect_once(self):
-        for pair in self.pairs:
-            self._fetch_snapshot(pair)
+        # One chunked Ticker sweep instead of a bid and an ask call per pair
+        quotes = self.kraken.get_quotes(self.pairs)
+        if quotes is None:
+            return
+        # S3 uploads overlap on the worker threads instead of running back to back
+        uploads = []
+        for pair, bid, ask in zip(quotes.pairs, quotes.bid, quotes.ask):
+            if bid and ask:
+                uploads.append((pair, self.executor.submit(self._upload_to_s3, pair, bid, ask)))
+            else:
+                print(f'Error occured during fetch_snapshot: {pair}, {bid}, {ask}')
+        for pair, upload in uploads:
+            try:
+                upload.result()
+            except Exception as e:
+                print(f'Error occured during upload: {pair}, {e}')
+        for pair, error in quotes.errors.items():
+            print(f'Error occured during fetch_snapshot: {pair}, {error}')
+
+    def collect_pairs(self, pairs=None):
+        """
+        Fetch and upload each pair on its own worker thread with per-pair
+        top-of-book calls. The GIL is released during every request, so
+        the calls overlap.
+        """
+        list(self.executor.map(self._fetch_snapshot, pairs or self.pairs))
 
     def collect_continuous(self, interval: float = 1.0):
         i = 0
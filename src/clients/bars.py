@@ -0,0 +1,248 @@
+import math
+import threading
+import time
+from array import array
+from collections import namedtuple
+from itertools import accumulate, repeat
+
+"""
+Rolling OHLCV/VWAP bars built incrementally from trades or quotes.
+BarAggregator keeps several intervals per pair at once (1s, 1m, 5m and 1h
+by default). Each trade touches the current bar of every interval a
+constant number of times, so it costs the same however long the history
+is. Bars live in preallocated ring buffers of typed arrays, one per
+field; the oldest bar is overwritten once a series is full.
+
+Trades come from the WebSocket trade channel (on_trades takes a
+rust_ws_py TradeUpdate). Collector-style bid/ask ticks go through on_tick,
+which builds bars from the mid price with zero volume.
+"""
+
+INTERVALS = {'1s': 1, '1m': 60, '5m': 300, '1h': 3600}
+DEFAULT_CAPACITY = 1000
+
+Bar = namedtuple('Bar', ['start', 'open', 'high', 'low', 'close', 'volume', 'vwap', 'trades'])
+
+
+def _parse_interval(interval):
+    if isinstance(interval, str):
+        if interval not in INTERVALS:
+            raise ValueError(f"Unknown bar interval: {interval}")
+        return INTERVALS[interval]
+    return interval
+
+
+class BarSeries:
+    """
+    Ring buffer of bars for one pair and one interval. Callers provide locking.
+    """
+    __slots__ = ('interval', 'capacity', 'fill_gaps', 'start', 'open', 'high', 'low', 'close',
+                 'volume', 'notional', 'trades', 'head', 'count', 'late')
+
+    def __init__(self, interval, capacity=DEFAULT_CAPACITY, fill_gaps=True):
+        """
+        Args:
+            interval (int): Bar length in seconds.
+            capacity (int): Bars kept; the oldest is overwritten beyond this.
+            fill_gaps (bool): Insert flat zero-volume bars for intervals
+                without trades, so bars are evenly spaced in time.
+        """
+        self.interval = interval
+        self.capacity = capacity
+        self.fill_gaps = fill_gaps
+        self.start = array('d', bytes(8 * capacity))
+        self.open = array('d', bytes(8 * capacity))
+        self.high = array('d', bytes(8 * capacity))
+        self.low = array('d', bytes(8 * capacity))
+        self.close = array('d', bytes(8 * capacity))
+        self.volume = array('d', bytes(8 * capacity))
+        self.notional = array('d', bytes(8 * capacity))
+        self.trades = array('q', bytes(8 * capacity))
+        self.head = -1  # slot of the current (newest) bar
+        self.count = 0
+        self.late = 0
+
+    def _open_bar(self, start, price):
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        i = self.head
+        self.start[i] = start
+        self.open[i] = self.high[i] = self.low[i] = self.close[i] = price
+        self.volume[i] = self.notional[i] = 0.0
+        self.trades[i] = 0
+
+    def _fill(self, start, k, price):
+        """
+        Advance the head over k flat zero-volume bars from start on. Each
+        field is written with slice assignments rather than bar by bar.
+        """
+        first = (self.head + 1) % self.capacity
+        split = min(k, self.capacity - first)
+        flat = array('d', [price]) * k
+        zeros = array('d', bytes(8 * k))
+        columns = (
+            (self.start, array('d', accumulate(repeat(float(self.interval), k - 1), initial=start))),
+            (self.open, flat), (self.high, flat), (self.low, flat), (self.close, flat),
+            (self.volume, zeros), (self.notional, zeros),
+            (self.trades, array('q', bytes(8 * k))),
+        )
+        for column, values in columns:
+            # The run may wrap around the end of the ring
+            column[first:first + split] = values[:split]
+            column[:k - split] = values[split:]
+        self.head = (self.head + k) % self.capacity
+        self.count = min(self.count + k, self.capacity)
+
+    def add(self, price, volume, timestamp):
+        """
+        Apply one trade. Returns the number of bars completed by it.
+        """
+        start = timestamp - timestamp % self.interval
+        completed = 0
+        if self.count == 0:
+            self._open_bar(start, price)
+        else:
+            current = self.start[self.head]
+            if start > current:
+                completed = 1
+                if self.fill_gaps:
+                    missing = int(round((start - current) / self.interval)) - 1
+                    # Older fillers would be overwritten anyway; the bar that
+                    # just closed is always kept
+                    kept = min(missing, max(0, self.capacity - 2))
+                    if kept:
+                        self._fill(start - kept * self.interval, kept, self.close[self.head])
+                    completed += missing
+                self._open_bar(start, price)
+            elif start < current:
+                back = int(round((current - start) / self.interval))
+                if not self.fill_gaps or back >= self.count:
+                    self.late += 1
+                    return 0
+                self._update((self.head - back) % self.capacity, price, volume)
+                return 0
+        self._update(self.head, price, volume)
+        return completed
+
+    def _update(self, i, price, volume):
+        if price > self.high[i]:
+            self.high[i] = price
+        if price < self.low[i]:
+            self.low[i] = price
+        self.close[i] = price
+        self.volume[i] += volume
+        self.notional[i] += price * volume
+        self.trades[i] += 1
+
+    def bar(self, back=0):
+        """
+        Bar back steps before the current one (0 is the bar in progress).
+        """
+        if back >= self.count:
+            raise IndexError('bar index out of range')
+        i = (self.head - back) % self.capacity
+        volume = self.volume[i]
+        vwap = self.notional[i] / volume if volume else self.close[i]
+        return Bar(self.start[i], self.open[i], self.high[i], self.low[i], self.close[i],
+                   volume, vwap, self.trades[i])
+
+    def bars(self, n=None, include_current=True):
+        """
+        Up to n most recent bars, oldest first.
+        """
+        skip = 0 if include_current else 1
+        available = max(0, self.count - skip)
+        n = available if n is None else min(n, available)
+        return [self.bar(back) for back in range(n - 1 + skip, skip - 1, -1)]
+
+    def column(self, name, n=None):
+        """
+        One field of the n most recent bars, oldest first, e.g. column('close', 20).
+        """
+        values = getattr(self, name)
+        n = self.count if n is None else min(n, self.count)
+        return [values[(self.head - back) % self.capacity] for back in range(n - 1, -1, -1)]
+
+    def __len__(self):
+        return self.count
+
+
+class BarAggregator:
+    def __init__(self, intervals=tuple(INTERVALS), capacity=DEFAULT_CAPACITY, fill_gaps=True, on_bar=None):
+        """
+        Args:
+            intervals (iterable): Interval names ('1s', '1m', ...) or seconds.
+            capacity (int|dict): Bars kept per series, or per interval.
+            fill_gaps (bool): See BarSeries.
+            on_bar (callable, optional): Called as on_bar(pair, interval, bar)
+                for every bar that completes, oldest first, outside the
+                aggregator's lock. Flat gap fillers are reported too, as far
+                as the series still holds them.
+        """
+        self.intervals = {name: _parse_interval(name) for name in intervals}
+        self.capacity = capacity
+        self.fill_gaps = fill_gaps
+        self.on_bar = on_bar
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _pair_series(self, pair):
+        series = self._series.get(pair)
+        if series is None:
+            series = self._series[pair] = {
+                name: BarSeries(
+                    seconds,
+                    self.capacity.get(name, DEFAULT_CAPACITY) if isinstance(self.capacity, dict) else self.capacity,
+                    self.fill_gaps,
+                )
+                for name, seconds in self.intervals.items()
+            }
+        return series
+
+    def on_trade(self, pair, price, volume, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        completed = []
+        with self._lock:
+            for name, series in self._pair_series(pair).items():
+                closed = series.add(price, volume, timestamp)
+                if closed and self.on_bar is not None:
+                    # bar(closed) is the bar that traded; fillers follow it
+                    for back in range(min(closed, series.capacity - 1), 0, -1):
+                        completed.append((name, series.bar(back)))
+        for name, bar in completed:
+            self.on_bar(pair, name, bar)
+
+    def on_trades(self, update):
+        """
+        Apply a TradeUpdate from rust_ws_py.Subscription.
+        """
+        for price, volume, timestamp, _, _ in update.trades:
+            self.on_trade(update.pair, price, volume, timestamp)
+
+    def on_tick(self, pair, bid, ask, timestamp=None):
+        """
+        Apply a quote, e.g. a collector snapshot; bars follow the mid price.
+        """
+        mid = (float(bid) + float(ask)) / 2
+        if not math.isnan(mid):
+            self.on_trade(pair, mid, 0.0, timestamp)
+
+    def series(self, pair, interval):
+        return self._series.get(pair, {}).get(interval)
+
+    def bars(self, pair, interval, n=None, include_current=True):
+        """
+        Copy of up to n recent bars, oldest first; [] for an unknown pair.
+        """
+        with self._lock:
+            series = self.series(pair, interval)
+            return series.bars(n, include_current) if series is not None else []
+
+    def latest(self, pair, interval):
+        with self._lock:
+            series = self.series(pair, interval)
+            return series.bar() if series else None
+
+    def pairs(self):
+        with self._lock:
+            return list(self._series)
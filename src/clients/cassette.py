@@ -0,0 +1,313 @@
+import argparse
+import gzip
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+"""
+Record-and-replay stand-in for the Kraken REST host.
+CassetteServer listens on localhost. In record mode it forwards every
+request to the real exchange and appends the exchange's answer to a
+cassette. In replay mode it answers from the cassette after a configurable
+delay, without touching the network.
+
+All three client stacks read KRAKEN_API_URL, so pointing it at the server
+captures or replays the Rust binding, KrakenPythonClient and the async
+KrakenClient the same way:
+
+    with CassetteServer.open('resources/cassettes/quotes.json.gz', mode='replay', latency=0.02):
+        client = KrakenPythonClient()   # talks to the stand-in
+        ...
+
+or, for other processes:
+
+    python src/clients/cassette.py replay resources/cassettes/quotes.json.gz --port 8765
+    KRAKEN_API_URL=http://127.0.0.1:8765 python benchmark.py
+
+Requests are matched on method, path, sorted query and body with the nonce
+removed, so signed private calls replay too. API keys and signatures are
+forwarded upstream but never written to a cassette.
+"""
+
+DEFAULT_UPSTREAM = 'https://api.kraken.com'
+CASSETTE_VERSION = 1
+
+_FORWARD_HEADERS = ('API-Key', 'API-Sign', 'Content-Type', 'User-Agent')
+
+
+def request_key(method, path, body=b'', content_type=''):
+    """
+    Identity of a request for matching, independent of nonce and query order.
+    """
+    split = urlsplit(path)
+    query = urlencode(sorted(parse_qsl(split.query, keep_blank_values=True)))
+    fields = ''
+    if body:
+        text = body.decode('utf-8', 'replace')
+        if 'json' in (content_type or ''):
+            try:
+                data = json.loads(text)
+                if isinstance(data, dict):
+                    data.pop('nonce', None)
+                fields = json.dumps(data, sort_keys=True, separators=(',', ':'))
+            except ValueError:
+                fields = text
+        else:
+            pairs = [(k, v) for k, v in parse_qsl(text, keep_blank_values=True) if k != 'nonce']
+            fields = urlencode(sorted(pairs))
+    return f"{method} {split.path}?{query} {fields}"
+
+
+class Cassette:
+    def __init__(self, path=None, interactions=None):
+        """
+        Args:
+            path (str, optional): File the cassette is loaded from and saved to.
+                A '.gz' suffix stores it gzip-compressed.
+            interactions (list, optional): Recorded answers, oldest first.
+        """
+        self.path = path
+        self.interactions = []
+        self._lock = threading.Lock()
+        self._by_key = {}
+        self._cursor = {}
+        for interaction in interactions or []:
+            self._index(interaction)
+
+    @classmethod
+    def load(cls, path):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(path, data.get('interactions', []))
+
+    @classmethod
+    def load_or_new(cls, path):
+        return cls.load(path) if os.path.exists(path) else cls(path)
+
+    def save(self, path=None):
+        path = path or self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        opener = gzip.open if path.endswith('.gz') else open
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            data = {'version': CASSETTE_VERSION, 'interactions': list(self.interactions)}
+        with opener(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def _index(self, interaction):
+        self.interactions.append(interaction)
+        self._by_key.setdefault(interaction['key'], []).append(interaction)
+
+    def record(self, key, status, content_type, body, latency):
+        with self._lock:
+            self._index({
+                'key': key,
+                'status': status,
+                'content_type': content_type,
+                'body': body.decode('utf-8', 'replace'),
+                'latency': round(latency, 6),
+            })
+
+    def play(self, key):
+        """
+        Next recorded answer for key, cycling through repeats in recorded
+        order, or None if the request was never recorded.
+        """
+        with self._lock:
+            answers = self._by_key.get(key)
+            if not answers:
+                return None
+            cursor = self._cursor.get(key, 0)
+            self._cursor[key] = (cursor + 1) % len(answers)
+            return answers[cursor]
+
+    def rewind(self):
+        with self._lock:
+            self._cursor.clear()
+
+    def __len__(self):
+        return len(self.interactions)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients reuse pooled connections as they would upstream
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.owner._handle(self)
+
+    def do_POST(self):
+        self.server.owner._handle(self)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CassetteServer:
+    def __init__(self, cassette, mode='replay', upstream=DEFAULT_UPSTREAM, latency=0.0, jitter=0.0,
+                 host='127.0.0.1', port=0):
+        """
+        Args:
+            cassette (Cassette): Interactions to replay, or to record into.
+            mode (str): 'record' forwards to upstream and records; 'replay' serves the cassette.
+            upstream (str): Exchange host used in record mode.
+            latency (float|str): Replay delay in seconds, or 'recorded' to reuse
+                each interaction's recorded latency.
+            jitter (float): Extra uniform random delay in seconds added in replay.
+            host (str): Interface to listen on.
+            port (int): Port to listen on; 0 picks a free one.
+        """
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.cassette = cassette
+        self.mode = mode
+        self.upstream = upstream.rstrip('/')
+        self.latency = latency
+        self.jitter = jitter
+        self.host = host
+        self.port = port
+        self.stats = dict.fromkeys(('served', 'recorded', 'missing', 'upstream_errors'), 0)
+        self._stats_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._previous_env = None
+
+    @classmethod
+    def open(cls, path, mode='replay', **kwargs):
+        cassette = Cassette.load_or_new(path) if mode == 'record' else Cassette.load(path)
+        return cls(cassette, mode=mode, **kwargs)
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='kraken-cassette', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self.mode == 'record' and self.cassette.path:
+            self.cassette.save()
+
+    def __enter__(self):
+        self.start()
+        # Clients created inside the block talk to the stand-in
+        self._previous_env = os.environ.get('KRAKEN_API_URL')
+        os.environ['KRAKEN_API_URL'] = self.url
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._previous_env is None:
+            os.environ.pop('KRAKEN_API_URL', None)
+        else:
+            os.environ['KRAKEN_API_URL'] = self._previous_env
+        self.stop()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _handle(self, handler):
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        content_type = handler.headers.get('Content-Type', '')
+        key = request_key(handler.command, handler.path, body, content_type)
+
+        if self.mode == 'record':
+            status, answer_type, answer, latency = self._forward(handler, body)
+            self.cassette.record(key, status, answer_type, answer, latency)
+            self._count('recorded')
+        else:
+            interaction = self.cassette.play(key)
+            if interaction is None:
+                self._count('missing')
+                status, answer_type = 404, 'application/json'
+                answer = json.dumps({'error': [f'EGeneral:Not in cassette: {key}'], 'result': {}}).encode()
+            else:
+                status = interaction['status']
+                answer_type = interaction['content_type']
+                answer = interaction['body'].encode('utf-8')
+                delay = interaction['latency'] if self.latency == 'recorded' else self.latency
+                delay += random.uniform(0, self.jitter) if self.jitter else 0.0
+                if delay > 0:
+                    time.sleep(delay)
+
+        self._count('served')
+        handler.send_response(status)
+        handler.send_header('Content-Type', answer_type or 'application/json')
+        handler.send_header('Content-Length', str(len(answer)))
+        handler.end_headers()
+        handler.wfile.write(answer)
+
+    def _forward(self, handler, body):
+        headers = {name: handler.headers[name] for name in _FORWARD_HEADERS if handler.headers.get(name)}
+        request = urllib.request.Request(
+            self.upstream + handler.path, data=body or None, headers=headers, method=handler.command
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=15) as response:
+                answer = response.read()
+                status = response.status
+                answer_type = response.headers.get('Content-Type', 'application/json')
+        except urllib.error.HTTPError as e:
+            answer = e.read()
+            status = e.code
+            answer_type = e.headers.get('Content-Type', 'application/json')
+        except Exception as e:
+            self._count('upstream_errors')
+            answer = json.dumps({'error': [f'EService:Upstream unavailable: {e}'], 'result': {}}).encode()
+            status = 502
+            answer_type = 'application/json'
+        return status, answer_type, answer, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record or replay Kraken REST traffic.')
+    parser.add_argument('mode', choices=('record', 'replay'))
+    parser.add_argument('cassette', help='Cassette file; a .gz suffix compresses it')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--upstream', default=DEFAULT_UPSTREAM)
+    parser.add_argument('--latency', default='0', help="Replay delay in seconds, or 'recorded'")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    args = parser.parse_args()
+
+    latency = args.latency if args.latency == 'recorded' else float(args.latency)
+    server = CassetteServer.open(
+        args.cassette, mode=args.mode, upstream=args.upstream, latency=latency,
+        jitter=args.jitter, host=args.host, port=args.port,
+    ).start()
+    print(f"Cassette {args.mode} on {server.url} ({len(server.cassette)} interactions)")
+    print(f"export KRAKEN_API_URL={server.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"Stopped: {server.stats}")
+
+
+if __name__ == '__main__':
+    main()
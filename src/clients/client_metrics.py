@@ -0,0 +1,290 @@
+import re
+import threading
+import time
+import weakref
+
+from rate_limiter import is_rate_limit_error
+
+"""
+Per-endpoint call metrics for the Kraken client wrappers.
+Every REST call made through KrakenPythonClient or the async KrakenClient
+records its latency in a log-linear (HDR-style) histogram together with
+success/error counts, error classes and rate-limit hits. Byte counts come
+from the Rust client's transfer counters. METRICS.snapshot() returns the
+numbers as a dict and METRICS.to_prometheus() as Prometheus text.
+
+Recording is a perf_counter difference, one integer bucket index and a
+few additions under a per-endpoint lock, cheap enough to leave on.
+"""
+
+# 2**SUB_BITS buckets per power of two, about 6% relative precision
+SUB_BITS = 4
+_SUB_COUNT = 1 << SUB_BITS
+# Latencies are bucketed in microseconds, up to about 67 s
+_MAX_MICROS = (1 << 26) - 1
+
+# Prometheus histogram bounds in seconds
+PROMETHEUS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_KRAKEN_ERROR = re.compile(r'\b(E[A-Z][A-Za-z]*):')
+
+
+def _bucket_index(micros):
+    shift = max(0, micros.bit_length() - SUB_BITS - 1)
+    return (shift << SUB_BITS) + (micros >> shift)
+
+
+def _bucket_upper(index):
+    # Largest microsecond value that lands in the bucket
+    if index < 2 * _SUB_COUNT:
+        return index
+    shift = (index >> SUB_BITS) - 1
+    return (((index - (shift << SUB_BITS)) + 1) << shift) - 1
+
+
+def classify_error(error):
+    """
+    Reduce an exception to a low-cardinality class: 'rate_limit',
+    a Kraken error family ('EOrder', 'EGeneral', ...), 'timeout', 'http',
+    'circuit_open' or the exception type name.
+    """
+    if is_rate_limit_error(error):
+        return 'rate_limit'
+    text = str(error)
+    match = _KRAKEN_ERROR.search(text)
+    if match:
+        return match.group(1)
+    lowered = text.lower()
+    if 'timed out' in lowered or 'timeout' in lowered:
+        return 'timeout'
+    if 'HttpError' in text:
+        return 'http'
+    if type(error).__name__ == 'CircuitOpenError':
+        return 'circuit_open'
+    return type(error).__name__
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of latencies with microsecond resolution.
+    Callers provide locking.
+    """
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (_bucket_index(_MAX_MICROS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        micros = min(_MAX_MICROS, max(0, int(seconds * 1e6)))
+        self.counts[_bucket_index(micros)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """
+        Upper bound of the bucket holding the q-quantile, in seconds.
+        """
+        if not self.count:
+            return None
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_bucket_upper(index) / 1e6, self.max)
+        return self.max
+
+    def cumulative(self, bounds):
+        """
+        Counts of samples at or below each bound (seconds), bucket resolution.
+        """
+        result = []
+        index = 0
+        seen = 0
+        for bound in bounds:
+            limit = int(bound * 1e6)
+            while index < len(self.counts) and _bucket_upper(index) <= limit:
+                seen += self.counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+
+class EndpointMetrics:
+    __slots__ = ('lock', 'latency', 'calls', 'errors', 'rate_limit_hits')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = LatencyHistogram()
+        self.calls = 0
+        self.errors = {}
+        self.rate_limit_hits = 0
+
+
+class ClientMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._transfer_sources = []
+
+    def _endpoint(self, endpoint):
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            with self._lock:
+                metrics = self._endpoints.setdefault(endpoint, EndpointMetrics())
+        return metrics
+
+    def observe(self, endpoint, seconds, error=None):
+        """
+        Record one finished call. error is the exception it raised, if any.
+        """
+        metrics = self._endpoint(endpoint)
+        error_class = None if error is None else classify_error(error)
+        with metrics.lock:
+            metrics.calls += 1
+            metrics.latency.record(seconds)
+            if error_class is not None:
+                metrics.errors[error_class] = metrics.errors.get(error_class, 0) + 1
+                if error_class == 'rate_limit':
+                    metrics.rate_limit_hits += 1
+
+    def timed(self, endpoint, func, *args):
+        """
+        Call func(*args) and record its latency and outcome under endpoint.
+        """
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+        except Exception as e:
+            self.observe(endpoint, time.perf_counter() - start, e)
+            raise
+        self.observe(endpoint, time.perf_counter() - start)
+        return result
+
+    def add_transfer_source(self, method):
+        """
+        Register a bound method returning {endpoint: (requests, bytes_sent,
+        bytes_received)}, such as KrakenPythonClient.transfer_stats. Only a
+        weak reference is kept, so clients can still be garbage collected.
+        """
+        with self._lock:
+            self._transfer_sources.append(weakref.WeakMethod(method))
+
+    def transfer(self):
+        totals = {}
+        with self._lock:
+            sources = list(self._transfer_sources)
+        for ref in sources:
+            method = ref()
+            if method is None:
+                continue
+            try:
+                stats = method()
+            except Exception:
+                continue
+            for endpoint, (requests, sent, received) in stats.items():
+                total = totals.setdefault(endpoint, [0, 0, 0])
+                total[0] += requests
+                total[1] += sent
+                total[2] += received
+        with self._lock:
+            self._transfer_sources = [ref for ref in self._transfer_sources if ref() is not None]
+        return totals
+
+    def snapshot(self):
+        """
+        Per-endpoint calls, errors by class, rate-limit hits, latency
+        percentiles (seconds) and byte counts.
+        """
+        transfer = self.transfer()
+        with self._lock:
+            endpoints = dict(self._endpoints)
+        snapshot = {}
+        for endpoint in sorted(set(endpoints) | set(transfer)):
+            entry = {'calls': 0, 'errors': {}, 'rate_limit_hits': 0}
+            metrics = endpoints.get(endpoint)
+            if metrics is not None:
+                with metrics.lock:
+                    histogram = metrics.latency
+                    entry = {
+                        'calls': metrics.calls,
+                        'errors': dict(metrics.errors),
+                        'rate_limit_hits': metrics.rate_limit_hits,
+                        'latency': {
+                            'count': histogram.count,
+                            'mean': histogram.total / histogram.count if histogram.count else None,
+                            'min': histogram.min,
+                            'p50': histogram.percentile(0.50),
+                            'p90': histogram.percentile(0.90),
+                            'p99': histogram.percentile(0.99),
+                            'p999': histogram.percentile(0.999),
+                            'max': histogram.max,
+                        },
+                    }
+            _, sent, received = transfer.get(endpoint, (0, 0, 0))
+            entry['bytes_sent'] = sent
+            entry['bytes_received'] = received
+            snapshot[endpoint] = entry
+        return snapshot
+
+    def to_prometheus(self, prefix='kraken_client'):
+        """
+        Render the metrics in the Prometheus text exposition format.
+        """
+        transfer = self.transfer()
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+        lines = [
+            f'# HELP {prefix}_requests_total REST calls made, by endpoint.',
+            f'# TYPE {prefix}_requests_total counter',
+        ]
+        histograms = []
+        errors = []
+        rate_limits = []
+        for endpoint, metrics in endpoints:
+            with metrics.lock:
+                calls = metrics.calls
+                error_counts = sorted(metrics.errors.items())
+                hits = metrics.rate_limit_hits
+                cumulative = metrics.latency.cumulative(PROMETHEUS_BUCKETS)
+                count = metrics.latency.count
+                total = metrics.latency.total
+            label = f'endpoint="{endpoint}"'
+            lines.append(f'{prefix}_requests_total{{{label}}} {calls}')
+            errors.extend(f'{prefix}_errors_total{{{label},class="{cls}"}} {n}' for cls, n in error_counts)
+            rate_limits.append(f'{prefix}_rate_limit_hits_total{{{label}}} {hits}')
+            for bound, n in zip(PROMETHEUS_BUCKETS, cumulative):
+                histograms.append(f'{prefix}_latency_seconds_bucket{{{label},le="{bound}"}} {n}')
+            histograms.append(f'{prefix}_latency_seconds_bucket{{{label},le="+Inf"}} {count}')
+            histograms.append(f'{prefix}_latency_seconds_sum{{{label}}} {total}')
+            histograms.append(f'{prefix}_latency_seconds_count{{{label}}} {count}')
+
+        lines += [f'# HELP {prefix}_errors_total Failed REST calls, by endpoint and error class.',
+                  f'# TYPE {prefix}_errors_total counter'] + errors
+        lines += [f'# HELP {prefix}_rate_limit_hits_total Rate-limit rejections, by endpoint.',
+                  f'# TYPE {prefix}_rate_limit_hits_total counter'] + rate_limits
+        lines += [f'# HELP {prefix}_latency_seconds REST call latency, by endpoint.',
+                  f'# TYPE {prefix}_latency_seconds histogram'] + histograms
+        lines += [f'# HELP {prefix}_bytes_sent_total Request body bytes, by endpoint.',
+                  f'# TYPE {prefix}_bytes_sent_total counter']
+        lines += [f'{prefix}_bytes_sent_total{{endpoint="{e}"}} {t[1]}' for e, t in sorted(transfer.items())]
+        lines += [f'# HELP {prefix}_bytes_received_total Response body bytes, by endpoint.',
+                  f'# TYPE {prefix}_bytes_received_total counter']
+        lines += [f'{prefix}_bytes_received_total{{endpoint="{e}"}} {t[2]}' for e, t in sorted(transfer.items())]
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+
+# Shared by every client wrapper in the process
+METRICS = ClientMetrics()
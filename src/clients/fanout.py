@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+"""
+Fan-out of one market-data feed to consumers that read at different speeds.
+Every subscriber gets its own bounded buffer and delivery policy, so a slow
+consumer only loses its own messages and never holds up the feed or the
+other subscribers:
+
+    ALL       every message, in order; the oldest is dropped when the queue is full
+    CONFLATE  only the latest message per key (pair) that has not been read yet
+    SAMPLE    at most `rate` times a second, the latest message of every key
+              updated since the previous sample, as a dict
+
+    hub = FanOut()
+    ticks = hub.subscribe('strategy', ALL, callback=on_tick)
+    ui = hub.subscribe('dash', SAMPLE, rate=4)
+    client.run('ticker', pairs, hub.publish)
+    ui.get()    # {'XBT/USD': TickerUpdate(...), ...}
+
+publish() is non-blocking: one deque or dict operation per subscriber.
+"""
+
+ALL = 'all'
+CONFLATE = 'conflate'
+SAMPLE = 'sample'
+
+DEFAULT_MAXSIZE = 10000
+
+
+def _default_key(message):
+    return getattr(message, 'pair', None)
+
+
+class Subscriber:
+    def __init__(self, name, policy=ALL, maxsize=DEFAULT_MAXSIZE, rate=None, clock=time.monotonic):
+        """
+        Args:
+            name (str): Label used in stats.
+            policy (str): ALL, CONFLATE or SAMPLE.
+            maxsize (int): Queued messages (ALL) or pending keys (CONFLATE, SAMPLE)
+                kept before messages are dropped.
+            rate (float): Samples per second, for SAMPLE.
+            clock (callable): Monotonic time source, replaceable in tests.
+        """
+        if policy not in (ALL, CONFLATE, SAMPLE):
+            raise ValueError(f"Unknown delivery policy: {policy}")
+        if policy == SAMPLE and not rate:
+            raise ValueError("SAMPLE delivery needs a rate")
+        self.name = name
+        self.policy = policy
+        self.maxsize = maxsize
+        self.period = 1.0 / rate if rate else 0.0
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._latest = OrderedDict()
+        self._next_sample = clock()
+        self.closed = False
+        self.stats = dict.fromkeys(('received', 'delivered', 'dropped', 'conflated'), 0)
+
+    def offer(self, message, key=None):
+        """
+        Buffer one message according to the policy. Never blocks.
+        """
+        with self._cond:
+            if self.closed:
+                return
+            stats = self.stats
+            stats['received'] += 1
+            if self.policy == ALL:
+                if len(self._queue) >= self.maxsize:
+                    self._queue.popleft()
+                    stats['dropped'] += 1
+                self._queue.append(message)
+            elif key in self._latest:
+                self._latest[key] = message
+                stats['conflated'] += 1
+            else:
+                if len(self._latest) >= self.maxsize:
+                    self._latest.popitem(last=False)
+                    stats['dropped'] += 1
+                self._latest[key] = message
+            self._cond.notify()
+
+    def _ready(self):
+        if self.policy == ALL:
+            return bool(self._queue)
+        if self.policy == CONFLATE:
+            return bool(self._latest)
+        return bool(self._latest) and self._clock() >= self._next_sample
+
+    def _wait_time(self, deadline):
+        # SAMPLE has to wake up when the next sample is due, not only on notify
+        wait = None if deadline is None else max(0.0, deadline - self._clock())
+        if self.policy == SAMPLE and self._latest:
+            due = max(0.0, self._next_sample - self._clock())
+            wait = due if wait is None else min(wait, due)
+        return wait
+
+    def get(self, timeout=None):
+        """
+        Next delivery, or None if none is ready within timeout seconds (or
+        the subscriber was closed). SAMPLE returns {key: message}.
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        with self._cond:
+            while not self._ready():
+                if self.closed:
+                    return None
+                if deadline is not None and self._clock() >= deadline:
+                    return None
+                self._cond.wait(self._wait_time(deadline))
+            if self.policy == ALL:
+                item = self._queue.popleft()
+            elif self.policy == CONFLATE:
+                _, item = self._latest.popitem(last=False)
+            else:
+                item, self._latest = dict(self._latest), OrderedDict()
+                self._next_sample = max(self._next_sample + self.period, self._clock())
+            self.stats['delivered'] += 1
+            return item
+
+    def pending(self):
+        with self._cond:
+            return len(self._queue) if self.policy == ALL else len(self._latest)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def __iter__(self):
+        while True:
+            item = self.get()
+            if item is None:
+                return
+            yield item
+
+
+class FanOut:
+    def __init__(self, key=_default_key):
+        """
+        Args:
+            key (callable): Conflation key of a message; defaults to its pair.
+        """
+        self.key = key
+        self._subscribers = ()
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, name, policy=ALL, maxsize=DEFAULT_MAXSIZE, rate=None, callback=None):
+        """
+        Add a subscriber. Without a callback, read it with get() or by
+        iterating; with one, a dedicated thread calls callback(item), so a
+        slow callback only delays its own deliveries.
+        """
+        subscriber = Subscriber(name, policy, maxsize, rate)
+        with self._lock:
+            self._subscribers = self._subscribers + (subscriber,)
+            if callback is not None:
+                thread = threading.Thread(
+                    target=self._deliver, args=(subscriber, callback), name=f'fanout-{name}', daemon=True
+                )
+                self._threads[subscriber] = thread
+                thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscriber)
+            thread = self._threads.pop(subscriber, None)
+        subscriber.close()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def publish(self, message):
+        key = self.key(message)
+        # The tuple is replaced, never mutated, so no lock is needed here
+        for subscriber in self._subscribers:
+            subscriber.offer(message, key)
+
+    def close(self):
+        for subscriber in self._subscribers:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {s.name: dict(s.stats, pending=s.pending(), policy=s.policy) for s in self._subscribers}
+
+    @staticmethod
+    def _deliver(subscriber, callback):
+        for item in subscriber:
+            try:
+                callback(item)
+            except Exception as e:
+                print(f"FanOut.deliver: {subscriber.name}: {e}")
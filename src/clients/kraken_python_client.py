@@ -1,6 +1,23 @@
 from rust_kraken_client import rust_kraken_client as kraken
 import json
-import pandas as pd
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from top_of_book import TopOfBook
+from quote_cache import QUOTE_CACHE
+from rate_limiter import RATE_LIMITER, is_rate_limit_error
+from pair_registry import PAIR_REGISTRY, UnknownPairError
+from orders_cache import OrdersCache
+from client_metrics import METRICS
+
+# Kraken's per-call limits for AddOrderBatch and CancelOrderBatch
+ADD_ORDER_BATCH_SIZE = 15
+CANCEL_ORDER_BATCH_SIZE = 50
+# Ticker chunks per get_quotes call: what the Rust client fetches in
+# parallel, and well under the public counter's limit
+QUOTE_CHUNKS_PER_CALL = 4
 
 """
 This client is used to interact with the rust kraken API.
@@ -8,38 +25,187 @@ rust_client -> rust_kraken_client -> kraken_python_client
 For lowest latency, use rust_kraken_client directly
 """
 class KrakenPythonClient:
-    def __init__(self,asset='XBTUSD'):
+    def __init__(self,asset='XBTUSD',config_path=None,quote_cache=QUOTE_CACHE,rate_limiter=RATE_LIMITER,
+                 pair_registry=PAIR_REGISTRY,request_policy=None,metrics=METRICS):
         self.asset = asset
+        # One persistent handle: config, decoded secret and the
+        # keep-alive connection pool are reused across every call.
+        self.client = kraken.KrakenClient(config_path)
+        # Shared with the other client wrappers; None disables caching
+        self.quote_cache = quote_cache
+        # Host-wide Kraken call counters; None disables rate limiting
+        self.rate_limiter = rate_limiter
+        # Symbol translation and order checks; None sends symbols as given
+        self.pair_registry = pair_registry
+        # Open orders by txid, updated incrementally on every poll
+        self.orders_cache = OrdersCache()
+        # Opt-in hedging/retry/circuit-breaker policy (request_policy.RequestPolicy)
+        # for idempotent public calls; None sends every call once
+        self.request_policy = request_policy
+        # Per-endpoint latency/error metrics; None disables recording
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.add_transfer_source(self.transfer_stats)
+
+    def _rest_pair(self,asset):
+        if self.pair_registry is None:
+            return asset
+        return self.pair_registry.translate(asset)
+
+    def _call(self,endpoint,func,*args,cost=None):
+        """
+        Run one REST call through the request policy, if it covers the
+        endpoint, and the shared rate limiter.
+        """
+        if self.request_policy is not None and self.request_policy.applies_to(endpoint):
+            # Every attempt, hedges and retries included, takes rate budget,
+            # outside the time the policy measures
+            if self.rate_limiter is None:
+                return self.request_policy.call(endpoint, self._send, endpoint, func, args)
+            return self.request_policy.call(
+                endpoint, self._send, endpoint, func, args,
+                acquire=lambda: self.rate_limiter.acquire(endpoint, cost=cost),
+                try_acquire=lambda: self.rate_limiter.try_acquire(endpoint, cost=cost) == 0,
+            )
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(endpoint, cost=cost)
+        return self._send(endpoint, func, args)
+
+    def _send(self,endpoint,func,args):
+        try:
+            if self.metrics is not None:
+                return self.metrics.timed(endpoint, func, *args)
+            return func(*args)
+        except Exception as e:
+            if self.rate_limiter is not None and is_rate_limit_error(e):
+                self.rate_limiter.penalize(endpoint)
+            raise
+
+    def _fetch_top_of_book(self,asset):
+        bid, bid_size, ask, ask_size, timestamp = self._call('Depth', self.client.get_top_of_book, asset)
+        return TopOfBook(asset, bid, bid_size, ask, ask_size, timestamp)
+
+    def _top_of_book(self,asset):
+        # Keyed by the REST name so every alias shares one cache entry
+        pair = self._rest_pair(asset)
+        if self.quote_cache is None:
+            return self._fetch_top_of_book(pair)
+        return self.quote_cache.get_or_fetch(pair, lambda: self._fetch_top_of_book(pair))
+
+    def transfer_stats(self):
+        """
+        Returns:
+            dict: endpoint -> (requests, bytes_sent, bytes_received) counted by the Rust client
+        """
+        return self.client.transfer_stats()
 
     def test_connection(self):
         try:
-            kraken.get_bid('XBTUSD')[0]
+            self._call('Ticker', self.client.get_bid, 'XBTUSD')
             return True
         except:
             return False
 
     def get_bid(self,asset='XBTUSD',index=0):
         """
-        Get the bid price of an asset.
+        Get the bid price of an asset. Only the best level is returned;
+        index is kept for compatibility and must be 0.
         """
+        if index != 0:
+            raise ValueError(f"KrakenPythonClient.get_bid: index must be 0, got {index}")
         try:
-            return kraken.get_bid(asset)[index]
-        except TypeError:
-            return kraken.get_bid(asset)
+            return self._top_of_book(asset).bid
         except Exception as e:
             print(f"KrakenPythonClient.get_bid: {e}")
     
     def get_ask(self,asset='XBTUSD',index=0):
         """
-        Get the ask price of an asset.
+        Get the ask price of an asset. Only the best level is returned;
+        index is kept for compatibility and must be 0.
         """
+        if index != 0:
+            raise ValueError(f"KrakenPythonClient.get_ask: index must be 0, got {index}")
         try:
-            return kraken.get_ask(asset)[index]
-        except TypeError:
-            return kraken.get_ask(asset)
+            return self._top_of_book(asset).ask
         except Exception as e:
             print(f"KrakenPythonClient.get_ask: {e}")
     
+    def get_top_of_book(self,asset='XBTUSD'):
+        """
+        Get bid, ask, their sizes and the exchange timestamp from one request.
+        Use the returned snapshot's mid and spread instead of separate
+        get_bid/get_ask calls so both sides come from the same moment.
+        Served from the shared quote cache while the pair's TTL has not expired.
+
+        Returns:
+            TopOfBook: immutable snapshot
+        """
+        try:
+            return self._top_of_book(asset)
+        except Exception as e:
+            print(f"KrakenPythonClient.get_top_of_book: {e}")
+
+    def get_orderbook(self,asset='XBTUSD',depth=100):
+        """
+        Get the order book with volumes and timestamps.
+
+        Args:
+            asset (str): Pair name.
+            depth (int): Levels per side (Kraken allows up to 500).
+
+        Returns:
+            OrderBook: bid_price, bid_volume, bid_time, ask_price, ask_volume
+            and ask_time as contiguous float64 NumPy arrays, best level first.
+        """
+        try:
+            return self._call('Depth', self.client.get_orderbook, self._rest_pair(asset), depth)
+        except Exception as e:
+            print(f"KrakenPythonClient.get_orderbook: {e}")
+
+    def get_quotes(self,pairs,chunk_size=50):
+        """
+        Get bid, ask, last and 24h volume for many pairs at once.
+        Pairs are sent chunk_size at a time in comma-separated Ticker requests.
+
+        Returns:
+            Quotes: columnar result with pairs, bid, bid_volume, ask, ask_volume,
+            last and volume lists (row i belongs to pairs[i]) plus an errors
+            dict for pairs that could not be quoted.
+        """
+        try:
+            # Unknown pairs are rejected locally; the rest are requested by
+            # REST name and reported back under the caller's names.
+            requested = {}
+            errors = {}
+            for pair in pairs:
+                try:
+                    requested.setdefault(self._rest_pair(pair), pair)
+                except UnknownPairError as e:
+                    errors[pair] = str(e)
+            rest_pairs = list(requested)
+            chunk_size = max(1, chunk_size)
+            step = chunk_size * QUOTE_CHUNKS_PER_CALL
+            quotes = None
+            # Each call takes budget for its own chunks, so a long sweep
+            # never asks the limiter for more than the counter holds
+            for start in range(0, len(rest_pairs) or 1, step):
+                group = rest_pairs[start:start + step]
+                chunks = max(1, math.ceil(len(group) / chunk_size))
+                part = self._call('Ticker', self.client.get_quotes, group, chunk_size, cost=chunks)
+                # Rejected chunks are split and retried inside the call
+                if self.rate_limiter is not None and part.requests > chunks:
+                    self.rate_limiter.charge('Ticker', part.requests - chunks)
+                if quotes is None:
+                    quotes = part
+                else:
+                    quotes.extend(part)
+            quotes.pairs = [requested.get(p, p) for p in quotes.pairs]
+            errors.update({requested.get(p, p): e for p, e in quotes.errors.items()})
+            quotes.errors = errors
+            return quotes
+        except Exception as e:
+            print(f"KrakenPythonClient.get_quotes: {e}")
+
     def get_balance(self,asset=None):
         """
         Get the balance of an asset.
@@ -48,10 +214,10 @@ class KrakenPythonClient:
         try:
             if asset == None:
                 # Returns all balances
-                return kraken.get_balance()
+                return self._call('Balance', self.client.get_balance)
             else:
                 # Returns specific balance
-                return kraken.get_balance()[asset]
+                return self._call('Balance', self.client.get_balance)[asset]
         except Exception as e:
             print(f"KrakenPythonClient.get_balance: {e}")
 
@@ -60,7 +226,7 @@ class KrakenPythonClient:
         Get the spread of an asset.
         """
         try:
-            return kraken.get_spread(asset)
+            return self._top_of_book(asset).spread
         except Exception as e:
             print(f"KrakenPythonClient.get_spread: {e}")
     
@@ -69,11 +235,60 @@ class KrakenPythonClient:
         Add an order to the Kraken API.
         """
         try:
-            order_response = kraken.add_order(asset, side, price, volume)
+            pair = asset
+            if self.pair_registry is not None:
+                # Reject symbols, sizes and precisions Kraken would refuse
+                pair = self.pair_registry.order_pair(asset, price, volume)
+            order_response = self._call('AddOrder', self.client.add_order, pair, side, price, volume)
             return order_response
         except Exception as e:
             print(f"KrakenPythonClient.add_order: {e}")
     
+    def add_orders(self,orders,batch_size=ADD_ORDER_BATCH_SIZE):
+        """
+        Add many limit orders with Kraken's AddOrderBatch endpoint.
+        Orders are grouped by pair, since a batch holds a single pair, and
+        each group is sent in chunks of up to batch_size orders.
+
+        Args:
+            orders (list): (asset, side, price, volume) tuples.
+            batch_size (int): Orders per AddOrderBatch call, at most 15.
+
+        Returns:
+            list: One dict per order, in input order, with 'txid',
+            'description' and 'error' (None when the order was placed).
+        """
+        results = [None] * len(orders)
+        groups = {}
+        for index, (asset, side, price, volume) in enumerate(orders):
+            try:
+                pair = asset
+                if self.pair_registry is not None:
+                    pair = self.pair_registry.order_pair(asset, price, volume)
+                groups.setdefault(pair, []).append((index, side, price, volume))
+            except Exception as e:
+                results[index] = {'txid': None, 'description': None, 'error': str(e)}
+
+        batch_size = max(1, min(batch_size, ADD_ORDER_BATCH_SIZE))
+        for pair, entries in groups.items():
+            for start in range(0, len(entries), batch_size):
+                chunk = entries[start:start + batch_size]
+                try:
+                    if len(chunk) == 1:
+                        # AddOrderBatch needs at least two orders
+                        _, side, price, volume = chunk[0]
+                        response = self._call('AddOrder', self.client.add_order, pair, side, price, volume)
+                        placed = [(response.txid[0] if response.txid else None, response.description, None)]
+                    else:
+                        placed = self._call('AddOrderBatch', self.client.add_order_batch, pair,
+                                            [(side, price, volume) for _, side, price, volume in chunk])
+                except Exception as e:
+                    print(f"KrakenPythonClient.add_orders: {e}")
+                    placed = [(None, None, str(e))] * len(chunk)
+                for (index, *_), (txid, description, error) in zip(chunk, placed):
+                    results[index] = {'txid': txid, 'description': description, 'error': error}
+        return results
+
     def get_open_orders(self, asset=None, order_type='open', headers=None):
         """
         Retrieve open orders with optional asset filtering and column selection.
@@ -84,65 +299,48 @@ class KrakenPythonClient:
             headers (list|str, optional): Columns to return. Use '*' for all columns. Defaults to None for basic columns.
         
         Returns:
-            pd.DataFrame: DataFrame containing the requested orders
+            pd.DataFrame: DataFrame containing the requested orders, empty when there are none
         """
         try:
-            # Get and parse orders
-            orders_response = kraken.get_open_orders_raw()
+            orders_response = self._call('OpenOrders', self.client.get_open_orders_raw)
             orders_data = json.loads(orders_response)
             orders_dict = orders_data.get('result', {}).get(order_type, {})
-            
-            if not orders_dict:
-                no_orders = pd.DataFrame([{
-                    'order_id': None,
-                    'descr_pair': asset,
-                    'descr_type': 'buy',
-                    'descr_price': 0.0,
-                    'vol': 0.0,
-                    'vol_exec': 0.0
-                }])
-                return no_orders
-
-            # Convert to DataFrame
-            df = (
-                pd.DataFrame.from_dict(orders_dict, orient='index')
-                .reset_index()
-                .rename(columns={'index': 'order_id'})
-            )
 
-            # Expand description fields
-            if 'descr' in df.columns:
-                descr_df = pd.json_normalize(df['descr'])
-                descr_df.columns = [f"descr_{col}" for col in descr_df.columns]
-                df = pd.concat([df.drop('descr', axis=1), descr_df], axis=1)
-
-            # Filter by asset if specified
-            if asset is not None and 'descr_pair' in df.columns:
-                df = df[df['descr_pair'] == asset.upper()]
-
-            # Convert data types
-            numeric_cols = ['vol', 'vol_exec', 'cost', 'fee', 'price', 'stopprice', 'limitprice']
-            for col in numeric_cols:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-
-            time_cols = ['opentm', 'starttm', 'expiretm']
-            for col in time_cols:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], unit='s', errors='coerce')
-
-            # Select columns to return
-            if headers is None:
-                return df[['order_id', 'descr_pair', 'descr_type', 'descr_price', 'vol', 'vol_exec']]
-            elif headers == '*' or headers == []:
-                return df
+            if order_type == 'open':
+                self.orders_cache.update(orders_dict)
+                cache = self.orders_cache
             else:
-                # Validate requested headers exist
-                valid_headers = [h for h in headers if h in df.columns]
-                return df[valid_headers]
+                cache = OrdersCache()
+                cache.update(orders_dict)
+
+            pair = None
+            if asset is not None:
+                # Kraken describes orders with the pair's altname
+                pair = asset.upper()
+                if self.pair_registry is not None:
+                    try:
+                        pair = self.pair_registry.altname(asset)
+                    except Exception:
+                        pass
+
+            return cache.to_frame(pair=pair, headers=headers)
         except Exception as e:
             print(f"KrakenPythonClient.get_open_orders: {e}")
 
+    def poll_open_orders(self):
+        """
+        Poll OpenOrders and return only what changed since the last poll.
+
+        Returns:
+            OrdersDiff: added, changed and removed OrderRecords
+        """
+        try:
+            orders_response = self._call('OpenOrders', self.client.get_open_orders_raw)
+            orders_dict = json.loads(orders_response).get('result', {}).get('open', {})
+            return self.orders_cache.update(orders_dict)
+        except Exception as e:
+            print(f"KrakenPythonClient.poll_open_orders: {e}")
+
     def get_order_id(self):
         pass
 
@@ -151,7 +349,37 @@ class KrakenPythonClient:
         Cancel an order from the Kraken API.
         """
         try:
-            return kraken.cancel_order(order_id)
+            return self._call('CancelOrder', self.client.cancel_order, order_id)
         except Exception as e:
             print(f"KrakenPythonClient.cancel_order: {e}")
+
+    def cancel_orders(self,txids,batch_size=CANCEL_ORDER_BATCH_SIZE):
+        """
+        Cancel many orders with Kraken's CancelOrderBatch endpoint, in
+        chunks of up to batch_size txids.
+
+        Returns:
+            dict: txid -> True if the order was cancelled, else False.
+        """
+        txids = list(txids)
+        results = {}
+        partial = []
+        batch_size = max(1, min(batch_size, CANCEL_ORDER_BATCH_SIZE))
+        for start in range(0, len(txids), batch_size):
+            chunk = txids[start:start + batch_size]
+            try:
+                count = self._call('CancelOrderBatch', self.client.cancel_order_batch, chunk)
+            except Exception as e:
+                print(f"KrakenPythonClient.cancel_orders: {e}")
+                count = 0
+            results.update(dict.fromkeys(chunk, count == len(chunk)))
+            if 0 < count < len(chunk):
+                partial.extend(chunk)
+
+        if partial:
+            # Kraken only reports a count; the open orders tell which ones went
+            if self.poll_open_orders() is not None:
+                for txid in partial:
+                    results[txid] = txid not in self.orders_cache
+        return results
         
\ No newline at end of file
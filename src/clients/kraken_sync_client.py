@@ -1,30 +1,128 @@
 import asyncio
+import threading
 #from src.kraken_api import KrakenClient
 import sys
 import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 try:
     from src.kraken_api import KrakenClient
 except:
     from kraken_api import KrakenClient
+from quote_cache import QUOTE_CACHE
+from pair_registry import PAIR_REGISTRY
+
+
+class _LoopThread:
+    """
+    An event loop running forever on a daemon thread.
+    Coroutines are submitted from other threads with submit().
+    """
+    def __init__(self, name='kraken-sync-loop'):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
 
 class KrakenSyncClient:
-    def __init__(self):
+    """
+    Blocking wrapper around the async KrakenClient.
+    Owns one event loop on a background thread, so the pooled session of
+    the async client survives between calls.
+    """
+    def __init__(self, quote_cache=QUOTE_CACHE, timeout=10.0):
         self.client = KrakenClient()
+        # Shared with the other client wrappers; None disables caching
+        self.quote_cache = quote_cache
+        self.timeout = timeout
+        self._runner = _LoopThread()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the background loop.
+
+        Returns:
+            concurrent.futures.Future: resolves to the coroutine's result
+        """
+        return self._runner.submit(coro)
+
+    def _run(self, coro):
+        future = self.submit(coro)
+        try:
+            return future.result(self.timeout)
+        except BaseException:
+            # A timed out or interrupted call must not keep running on the
+            # loop, holding rate budget and a connection
+            future.cancel()
+            raise
+
+    def get_many(self, requests, return_exceptions=True):
+        """
+        Run several async KrakenClient calls concurrently on the loop.
+
+        Args:
+            requests (list): (method_name, *args) tuples, e.g. [('get_bid', 'XXBTZUSD'), ('get_balance',)]
+            return_exceptions (bool): Put exceptions in the result list instead of raising the first one.
+
+        Returns:
+            list: results in request order
+        """
+        async def gather():
+            calls = [getattr(self.client, name)(*args) for name, *args in requests]
+            return await asyncio.gather(*calls, return_exceptions=return_exceptions)
+        return self._run(gather())
+
+    def close(self):
+        """
+        Close the async session and stop the background loop.
+        """
+        if not self._runner.loop.is_closed():
+            self._run(self.client.close())
+            self._runner.stop()
+
+    def _fetch_top_of_book(self, pair):
+        return self._run(self.client.get_top_of_book(pair))
+
+    def get_top_of_book(self, pair='XXBTZUSD'):
+        # Keyed by the REST name so every alias shares one cache entry
+        pair = PAIR_REGISTRY.translate(pair)
+        if self.quote_cache is None:
+            return self._fetch_top_of_book(pair)
+        return self.quote_cache.get_or_fetch(pair, lambda: self._fetch_top_of_book(pair))
 
     def get_bid(self, pair='XXBTZUSD'):
-        return asyncio.run(self.client.get_bid(pair))
+        return self.get_top_of_book(pair).bid
 
     def get_ask(self, pair='XXBTZUSD'):
-        return asyncio.run(self.client.get_ask(pair))
+        return self.get_top_of_book(pair).ask
 
     def get_balance(self, return_type=''):
-        balance = asyncio.run(self.client.get_balance())
+        balance = self._run(self.client.get_balance())
         if return_type == 'float':
             return float(balance['ZUSD'][0])
-        return asyncio.run(self.client.get_balance())
+        return balance
 
     def get_clean_orderbook(self, depth=1, pair='XXBTZUSD'):
-        return asyncio.run(self.client.get_clean_orderbook(depth=depth, pair=pair))
+        return self._run(self.client.get_clean_orderbook(depth=depth, pair=pair))
@@ -0,0 +1,209 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from order_book import OrderBookManager
+from rust_ws_py import GapEvent, Subscription
+
+"""
+Live Kraken public feeds backed by rust_ws_py.Subscription.
+Each subscription keeps one WebSocket open on a Rust thread that reads and
+decodes frames without holding the GIL. Updates reach Python as
+TickerUpdate, BookUpdate or TradeUpdate objects, consumed in one of three
+ways:
+
+    client = KrakenWsClient()
+    for update in client.stream('book', ['XBT/USD'], depth=10):   # iterator
+        ...
+    async for update in client.astream('ticker', ['XBT/USD']):    # asyncio
+        ...
+    runner = client.run('trade', ['XBT/USD'], on_trade)           # callback
+    runner.stop()
+
+BookFeed keeps an OrderBookManager of checksum-verified L2 books current
+from the 'book' channel for any number of pairs.
+
+Subscriptions reconnect on their own with jittered backoff and subscribe
+their pairs again; a book whose checksum fails is resubscribed on the
+open connection. Subscription.stats() reports reconnects, gaps and
+downtime. With report_gaps=True every outage and checksum failure is also
+delivered as a GapEvent in the stream.
+"""
+
+CHANNELS = ('ticker', 'book', 'trade')
+# Bounds how long a blocked recv() delays stop() and task cancellation
+POLL_TIMEOUT = 0.25
+
+
+class CallbackRunner:
+    """
+    Feeds every update of a subscription to a callback on a daemon thread.
+    """
+    def __init__(self, subscription, callback, on_error=None):
+        self.subscription = subscription
+        self.callback = callback
+        self.on_error = on_error
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f'kraken-ws-{subscription.channel}-callback', daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+        self.subscription.close()
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                update = self.subscription.recv(POLL_TIMEOUT)
+            except Exception as e:
+                print(f"CallbackRunner.recv: {e}")
+                if self.on_error is not None:
+                    self.on_error(e)
+                return
+            if update is None:
+                continue
+            try:
+                self.callback(update)
+            except Exception as e:
+                print(f"CallbackRunner.callback: {e}")
+
+
+class BookFeed:
+    """
+    Keeps local L2 books current from the 'book' channel. A pair whose
+    checksum fails is unsubscribed and subscribed again on the open
+    connection, which brings a fresh snapshot for that pair only.
+    """
+    def __init__(self, client, pairs, depth=10):
+        self.client = client
+        self.pairs = list(pairs)
+        self.depth = depth
+        self.books = OrderBookManager(depth, resync=self._request_resync)
+        self.resyncs = 0
+        self.gaps = 0
+        self._resync = set()
+        self._resync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='kraken-ws-books', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _request_resync(self, pair):
+        with self._resync_lock:
+            self._resync.add(pair)
+
+    def _resync_pairs(self, subscription):
+        with self._resync_lock:
+            pairs, self._resync = sorted(self._resync), set()
+        if pairs:
+            subscription.remove_pairs(pairs)
+            subscription.add_pairs(pairs)
+            self.resyncs += len(pairs)
+
+    def _run(self):
+        try:
+            with self.client.subscribe('book', self.pairs, self.depth, report_gaps=True) as subscription:
+                while not self._stop.is_set():
+                    self._resync_pairs(subscription)
+                    update = subscription.recv(POLL_TIMEOUT)
+                    if isinstance(update, GapEvent):
+                        # Snapshots follow the reconnect or resubscribe; until
+                        # then the books are stale and deltas are ignored
+                        self.gaps += 1
+                        self.books.invalidate(update.pairs)
+                    elif update is not None:
+                        self.books.on_update(update)
+        except Exception as e:
+            print(f"BookFeed.recv: {e}")
+
+
+class KrakenWsClient:
+    def __init__(self, url=None, capacity=10000, reconnect=True, max_backoff=30.0):
+        """
+        Args:
+            url (str, optional): WebSocket endpoint; defaults to wss://ws.kraken.com.
+            capacity (int): Updates buffered per subscription before new ones
+                are dropped (see Subscription.dropped).
+            reconnect (bool): Reopen dropped connections instead of ending the stream.
+            max_backoff (float): Longest wait in seconds between reconnect attempts.
+        """
+        self.url = url
+        self.capacity = capacity
+        self.reconnect = reconnect
+        self.max_backoff = max_backoff
+
+    def subscribe(self, channel, pairs, depth=10, report_gaps=False):
+        """
+        Open a subscription and return it. Iterate over it, or call
+        recv(timeout); close it when done, or use it as a context manager.
+
+        Args:
+            channel (str): 'ticker', 'book' or 'trade'.
+            pairs (list): WebSocket pair names, e.g. ['XBT/USD'].
+            depth (int): Book depth, for the 'book' channel.
+            report_gaps (bool): Deliver a GapEvent after every reconnect.
+        """
+        if channel not in CHANNELS:
+            raise ValueError(f"Unknown channel: {channel}")
+        return Subscription(channel, list(pairs), depth=depth, url=self.url, capacity=self.capacity,
+                            reconnect=self.reconnect, max_backoff=self.max_backoff, report_gaps=report_gaps)
+
+    def stream(self, channel, pairs, depth=10):
+        """
+        Yield updates until the connection ends; the subscription is closed
+        when the generator is.
+        """
+        with self.subscribe(channel, pairs, depth) as subscription:
+            yield from subscription
+
+    async def astream(self, channel, pairs, depth=10):
+        """
+        Async generator of updates. Waiting happens on a dedicated worker
+        thread, so the event loop is never blocked.
+        """
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'kraken-ws-{channel}')
+        subscription = self.subscribe(channel, pairs, depth)
+        try:
+            while True:
+                update = await loop.run_in_executor(executor, subscription.recv, POLL_TIMEOUT)
+                if update is not None:
+                    yield update
+        finally:
+            subscription.close()
+            executor.shutdown(wait=False)
+
+    def run(self, channel, pairs, callback, depth=10, on_error=None):
+        """
+        Call callback(update) for every update on a background thread.
+        Returns the started CallbackRunner; call stop() on it to end.
+
+        Args:
+            on_error (callable, optional): Called with the exception if the
+                connection fails.
+        """
+        subscription = self.subscribe(channel, pairs, depth)
+        return CallbackRunner(subscription, callback, on_error).start()
+
+    def books(self, pairs, depth=10):
+        """
+        Start a BookFeed for pairs and return it; read the books through
+        feed.books.top_of_book(pair), feed.books.book(pair) and so on.
+        """
+        return BookFeed(self, pairs, depth).start()
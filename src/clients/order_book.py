@@ -0,0 +1,328 @@
+import threading
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+
+from top_of_book import TopOfBook
+
+"""
+Local L2 order books maintained from the WebSocket 'book' channel.
+A book starts from the channel's snapshot and applies each delta as it
+arrives. After every message its top ten levels are hashed the way Kraken
+does it (CRC32 of the price and volume strings without dots or leading
+zeros) and compared with the checksum Kraken sent. A mismatch marks the
+book out of sync and asks the feed for a fresh snapshot.
+
+Each side keeps its prices in a sorted list (bids negated, so index 0 is
+always the best level) next to a dict of level data. Finding a level is a
+bisect; best price and depth-at-price are O(1); cumulative volume is a
+bisect into prefix sums that are rebuilt lazily after a change.
+"""
+
+CHECKSUM_LEVELS = 10
+
+
+class ChecksumError(Exception):
+    pass
+
+
+def _checksum_text(text):
+    return text.replace('.', '').lstrip('0')
+
+
+def _level_fields(level):
+    """
+    (price, volume, price_text, volume_text) from either a rust_ws_py level
+    (price, volume, timestamp, price_text, volume_text) or a raw Kraken
+    level [price_text, volume_text, timestamp, ...].
+    """
+    if len(level) >= 5 and isinstance(level[3], str):
+        return float(level[0]), float(level[1]), level[3], level[4]
+    price, volume = level[0], level[1]
+    return float(price), float(volume), str(price), str(volume)
+
+
+class BookSide:
+    __slots__ = ('descending', '_keys', '_levels', '_cumulative')
+
+    def __init__(self, descending):
+        """
+        Args:
+            descending (bool): True for bids, where the best price is the highest.
+        """
+        self.descending = descending
+        self._keys = []          # sorted, best first (negated prices for bids)
+        self._levels = {}        # price -> (volume, price_text, volume_text)
+        self._cumulative = None  # prefix sums of volume along _keys
+
+    def _key(self, price):
+        return -price if self.descending else price
+
+    def clear(self):
+        self._keys = []
+        self._levels = {}
+        self._cumulative = None
+
+    def apply(self, price, volume, price_text, volume_text):
+        key = self._key(price)
+        if volume == 0:
+            if self._levels.pop(price, None) is not None:
+                del self._keys[bisect_left(self._keys, key)]
+                self._cumulative = None
+            return
+        if price not in self._levels:
+            self._keys.insert(bisect_left(self._keys, key), key)
+        self._levels[price] = (volume, price_text, volume_text)
+        self._cumulative = None
+
+    def truncate(self, depth):
+        # Kraken stops sending updates for levels pushed out of the subscribed depth
+        if len(self._keys) > depth:
+            for key in self._keys[depth:]:
+                del self._levels[self._key(key)]
+            del self._keys[depth:]
+            self._cumulative = None
+
+    def best(self):
+        """
+        (price, volume) of the best level, or None if the side is empty.
+        """
+        if not self._keys:
+            return None
+        price = self._key(self._keys[0])
+        return price, self._levels[price][0]
+
+    def volume_at(self, price):
+        level = self._levels.get(price)
+        return level[0] if level else 0.0
+
+    def cumulative_volume(self, price):
+        """
+        Total volume at prices equal to or better than price.
+        """
+        if self._cumulative is None:
+            total = 0.0
+            self._cumulative = cumulative = []
+            for key in self._keys:
+                total += self._levels[self._key(key)][0]
+                cumulative.append(total)
+        index = bisect_right(self._keys, self._key(price))
+        return self._cumulative[index - 1] if index else 0.0
+
+    def levels(self, n=None):
+        """
+        [(price, volume), ...] best first, at most n levels.
+        """
+        keys = self._keys if n is None else self._keys[:n]
+        return [(self._key(k), self._levels[self._key(k)][0]) for k in keys]
+
+    def checksum_text(self, n=CHECKSUM_LEVELS):
+        parts = []
+        for key in self._keys[:n]:
+            _, price_text, volume_text = self._levels[self._key(key)]
+            parts.append(_checksum_text(price_text))
+            parts.append(_checksum_text(volume_text))
+        return ''.join(parts)
+
+    def copy(self):
+        side = BookSide(self.descending)
+        side._keys = list(self._keys)
+        side._levels = dict(self._levels)
+        return side
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class L2Book:
+    __slots__ = ('pair', 'depth', 'asks', 'bids', 'synced', 'updated_at', 'updates')
+
+    def __init__(self, pair, depth=10):
+        """
+        Args:
+            pair (str): WebSocket pair name, e.g. 'XBT/USD'.
+            depth (int): Subscribed book depth; deeper levels are discarded.
+        """
+        self.pair = pair
+        self.depth = depth
+        self.asks = BookSide(descending=False)
+        self.bids = BookSide(descending=True)
+        self.synced = False
+        self.updated_at = None
+        self.updates = 0
+
+    def apply_snapshot(self, asks, bids, timestamp=None):
+        self.asks.clear()
+        self.bids.clear()
+        self.synced = True
+        self.apply_update(asks, bids, timestamp=timestamp)
+
+    def apply_update(self, asks, bids, checksum=None, timestamp=None):
+        """
+        Apply a delta and, when checksum is given, verify the result.
+
+        Raises:
+            ChecksumError: the book no longer matches the exchange's. The
+                book is marked out of sync and needs a new snapshot.
+        """
+        for level in asks:
+            self.asks.apply(*_level_fields(level))
+        for level in bids:
+            self.bids.apply(*_level_fields(level))
+        self.asks.truncate(self.depth)
+        self.bids.truncate(self.depth)
+        self.updated_at = timestamp if timestamp is not None else time.time()
+        self.updates += 1
+        if checksum is not None and checksum != self.checksum():
+            self.synced = False
+            raise ChecksumError(f"Checksum mismatch for {self.pair}: expected {checksum}, got {self.checksum()}")
+
+    def copy(self):
+        book = L2Book(self.pair, self.depth)
+        book.asks = self.asks.copy()
+        book.bids = self.bids.copy()
+        book.synced = self.synced
+        book.updated_at = self.updated_at
+        book.updates = self.updates
+        return book
+
+    def checksum(self):
+        text = self.asks.checksum_text() + self.bids.checksum_text()
+        return zlib.crc32(text.encode('ascii'))
+
+    @property
+    def best_bid(self):
+        return self.bids.best()
+
+    @property
+    def best_ask(self):
+        return self.asks.best()
+
+    @property
+    def mid(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    @property
+    def spread(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def top_of_book(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return TopOfBook(self.pair, bid[0], bid[1], ask[0], ask[1], self.updated_at or 0.0)
+
+    def to_depth(self, n=None):
+        """
+        {'asks': [[price, volume], ...], 'bids': [...]}, best first, like a
+        REST Depth result without timestamps.
+        """
+        return {
+            'asks': [list(level) for level in self.asks.levels(n)],
+            'bids': [list(level) for level in self.bids.levels(n)],
+        }
+
+    def __repr__(self):
+        return (f"L2Book(pair='{self.pair}', bid={self.best_bid}, ask={self.best_ask}, "
+                f"levels={len(self.bids)}/{len(self.asks)}, synced={self.synced})")
+
+
+class OrderBookManager:
+    def __init__(self, depth=10, resync=None):
+        """
+        Args:
+            depth (int): Subscribed book depth.
+            resync (callable, optional): Called with a pair whose book failed
+                its checksum; it should arrange for a new snapshot.
+        """
+        self.depth = depth
+        self.resync = resync
+        self._books = {}
+        self._lock = threading.Lock()
+        self.stats = dict.fromkeys(('snapshots', 'updates', 'checksum_errors', 'ignored'), 0)
+
+    def _book(self, pair):
+        # Caller holds the lock
+        book = self._books.get(pair)
+        if book is None:
+            book = self._books[pair] = L2Book(pair, self.depth)
+        return book
+
+    def book(self, pair):
+        """
+        Private copy of a pair's L2Book, safe to query while the feed keeps
+        updating, or None if the pair has no book yet.
+        """
+        with self._lock:
+            book = self._books.get(pair)
+            return book.copy() if book is not None else None
+
+    @contextmanager
+    def locked(self, pair):
+        """
+        The live L2Book of a pair (or None) with updates held off until the
+        block ends, for reads that should not pay for a copy. Keep the block
+        short: the feed thread waits on it.
+        """
+        with self._lock:
+            yield self._books.get(pair)
+
+    def pairs(self):
+        with self._lock:
+            return list(self._books)
+
+    def invalidate(self, pairs=None):
+        """
+        Mark books out of sync, e.g. after the feed lost data, until their
+        next snapshot arrives.
+        """
+        with self._lock:
+            for pair in self._books if pairs is None else pairs:
+                book = self._books.get(pair)
+                if book is not None:
+                    book.synced = False
+
+    def on_update(self, update):
+        """
+        Apply one BookUpdate from rust_ws_py.Subscription. Deltas for a book
+        that is out of sync are ignored until its next snapshot.
+        """
+        with self._lock:
+            book = self._book(update.pair)
+            if update.snapshot:
+                book.apply_snapshot(update.asks, update.bids, update.recv_time)
+                self.stats['snapshots'] += 1
+                return
+            if not book.synced:
+                self.stats['ignored'] += 1
+                return
+            try:
+                book.apply_update(update.asks, update.bids, update.checksum, update.recv_time)
+                self.stats['updates'] += 1
+                return
+            except ChecksumError as e:
+                self.stats['checksum_errors'] += 1
+                print(f"OrderBookManager.on_update: {e}")
+        if self.resync is not None:
+            self.resync(update.pair)
+
+    def top_of_book(self, pair):
+        with self._lock:
+            book = self._books.get(pair)
+            return book.top_of_book() if book is not None and book.synced else None
+
+    def snapshot(self, pair, n=None):
+        """
+        Consistent copy of one book as a Depth-style dict, or None if the
+        book is not in sync.
+        """
+        with self._lock:
+            book = self._books.get(pair)
+            return book.to_depth(n) if book is not None and book.synced else None
@@ -0,0 +1,179 @@
+import threading
+
+"""
+Incremental open-orders cache.
+Keeps the account's open orders keyed by txid between OpenOrders polls.
+Each poll only parses orders that are new or whose fill, status or price
+changed, reports what changed, and keeps orders as slotted records.
+A pandas DataFrame is built only when a caller asks for one.
+"""
+
+# Columns returned by KrakenPythonClient.get_open_orders when no headers are given
+BASIC_COLUMNS = ['order_id', 'descr_pair', 'descr_type', 'descr_price', 'vol', 'vol_exec']
+
+_TIME_COLUMNS = ('opentm', 'starttm', 'expiretm')
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class OrderRecord:
+    __slots__ = ('order_id', 'descr_pair', 'descr_type', 'descr_ordertype', 'descr_price',
+                 'descr_price2', 'descr_leverage', 'descr_order', 'descr_close',
+                 'vol', 'vol_exec', 'cost', 'fee', 'price', 'stopprice', 'limitprice',
+                 'status', 'opentm', 'starttm', 'expiretm', 'userref', 'refid', 'misc', 'oflags')
+
+    def __init__(self, order_id, data):
+        descr = data.get('descr') or {}
+        self.order_id = order_id
+        self.descr_pair = descr.get('pair')
+        self.descr_type = descr.get('type')
+        self.descr_ordertype = descr.get('ordertype')
+        self.descr_price = _float(descr.get('price'))
+        self.descr_price2 = _float(descr.get('price2'))
+        self.descr_leverage = descr.get('leverage')
+        self.descr_order = descr.get('order')
+        self.descr_close = descr.get('close')
+        self.vol = _float(data.get('vol'))
+        self.vol_exec = _float(data.get('vol_exec'))
+        self.cost = _float(data.get('cost'))
+        self.fee = _float(data.get('fee'))
+        self.price = _float(data.get('price'))
+        self.stopprice = _float(data.get('stopprice'))
+        self.limitprice = _float(data.get('limitprice'))
+        self.status = data.get('status')
+        self.opentm = _float(data.get('opentm'))
+        self.starttm = _float(data.get('starttm'))
+        self.expiretm = _float(data.get('expiretm'))
+        self.userref = data.get('userref')
+        self.refid = data.get('refid')
+        self.misc = data.get('misc')
+        self.oflags = data.get('oflags')
+
+    @property
+    def remaining(self):
+        return self.vol - self.vol_exec
+
+    def __repr__(self):
+        return (f"OrderRecord(order_id='{self.order_id}', pair='{self.descr_pair}', type='{self.descr_type}', "
+                f"price={self.descr_price}, vol={self.vol}, vol_exec={self.vol_exec}, status='{self.status}')")
+
+
+def _signature(data):
+    # Fields that change while an order rests; anything else is fixed at placement
+    descr = data.get('descr') or {}
+    return (data.get('status'), data.get('vol_exec'), data.get('vol'),
+            descr.get('price'), descr.get('price2'))
+
+
+class OrdersDiff:
+    __slots__ = ('added', 'changed', 'removed')
+
+    def __init__(self, added, changed, removed):
+        """
+        Args:
+            added (list): OrderRecords seen for the first time.
+            changed (list): OrderRecords whose status, fill or price moved.
+            removed (list): OrderRecords no longer open (filled, cancelled or expired).
+        """
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+    def __repr__(self):
+        return f"OrdersDiff(added={len(self.added)}, changed={len(self.changed)}, removed={len(self.removed)})"
+
+
+class OrdersCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}     # txid -> OrderRecord
+        self._signatures = {}  # txid -> _signature of the last parsed entry
+        self._frame = None
+
+    def update(self, orders):
+        """
+        Apply one OpenOrders result ({txid: order}) and return what changed
+        since the previous call. Unchanged orders are not parsed again.
+        """
+        added, changed, removed = [], [], []
+        with self._lock:
+            records = self._records
+            signatures = self._signatures
+            for txid, data in orders.items():
+                signature = _signature(data)
+                previous = signatures.get(txid)
+                if previous == signature:
+                    continue
+                record = OrderRecord(txid, data)
+                records[txid] = record
+                signatures[txid] = signature
+                (added if previous is None else changed).append(record)
+            if len(records) > len(orders):
+                for txid in [t for t in records if t not in orders]:
+                    removed.append(records.pop(txid))
+                    del signatures[txid]
+            if added or changed or removed:
+                self._frame = None
+        return OrdersDiff(added, changed, removed)
+
+    def get(self, txid):
+        return self._records.get(txid)
+
+    def orders(self, pair=None):
+        """
+        Open orders as OrderRecords, optionally for one pair (Kraken altname).
+        """
+        with self._lock:
+            records = list(self._records.values())
+        if pair is None:
+            return records
+        return [r for r in records if r.descr_pair == pair]
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._signatures.clear()
+            self._frame = None
+
+    def to_frame(self, pair=None, headers=None):
+        """
+        Build a DataFrame of the cached orders, one column per OrderRecord field.
+        The full frame is reused until the next update that changes something.
+
+        Args:
+            pair (str, optional): Only orders for this Kraken altname.
+            headers (list|str, optional): Columns to return; '*' or [] for all, None for BASIC_COLUMNS.
+        """
+        import pandas as pd
+
+        with self._lock:
+            df = self._frame
+            if df is None:
+                records = list(self._records.values())
+                columns = {name: [getattr(r, name) for r in records] for name in OrderRecord.__slots__}
+                df = pd.DataFrame(columns, columns=list(OrderRecord.__slots__))
+                for name in _TIME_COLUMNS:
+                    df[name] = pd.to_datetime(df[name], unit='s', errors='coerce')
+                self._frame = df
+
+        if pair is not None:
+            df = df[df['descr_pair'] == pair]
+        if headers is None:
+            return df[BASIC_COLUMNS].copy()
+        if headers == '*' or headers == []:
+            return df.copy()
+        return df[[h for h in headers if h in df.columns]]
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, txid):
+        return txid in self._records
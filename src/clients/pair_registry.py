@@ -0,0 +1,318 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import urllib.request
+from decimal import Decimal
+
+from rate_limiter import RATE_LIMITER
+
+"""
+Kraken pair metadata registry.
+AssetPairs is fetched once, cached on disk and indexed so that any alias
+of a pair ('XBTUSD', 'XXBTZUSD', 'XBT/USD', 'BTC/USD', 'BTCUSD') resolves
+in O(1) to the same PairInfo, which carries the canonical REST, WS and
+altname forms plus tick size, lot decimals and ordermin. Callers use it
+to translate or reject symbols locally instead of learning from HTTP errors.
+"""
+
+ASSET_PAIRS_PATH = '/0/public/AssetPairs'
+DEFAULT_API_URL = 'https://api.kraken.com'
+DEFAULT_CACHE_PATH = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..', '..', 'resources', 'data', 'cache', 'asset_pairs.json'
+))
+DEFAULT_MAX_AGE = 24 * 60 * 60
+# After a failed load, wait this long before trying the exchange again
+RETRY_AFTER = 60
+
+# Kraken's legacy asset codes and the names most people use for them
+_ASSET_ALIASES = {'XBT': 'BTC', 'XDG': 'DOGE'}
+
+
+def _decimal(value):
+    # str() gives the shortest repr, so 0.1 becomes Decimal('0.1') rather
+    # than the exact binary value of the float
+    return Decimal(str(value))
+
+
+class UnknownPairError(KeyError):
+    pass
+
+
+class PairInfo:
+    __slots__ = ('name', 'altname', 'wsname', 'base', 'quote',
+                 'pair_decimals', 'lot_decimals', 'tick_size', 'ordermin', 'status')
+
+    def __init__(self, name, data):
+        self.name = name
+        self.altname = data.get('altname', name)
+        self.wsname = data.get('wsname')
+        self.base = data.get('base')
+        self.quote = data.get('quote')
+        self.pair_decimals = int(data.get('pair_decimals', 8))
+        self.lot_decimals = int(data.get('lot_decimals', 8))
+        self.tick_size = float(data.get('tick_size') or 10 ** -self.pair_decimals)
+        self.ordermin = float(data.get('ordermin') or 0.0)
+        self.status = data.get('status', 'online')
+
+    def aliases(self):
+        names = {self.name, self.altname}
+        if self.wsname:
+            names.add(self.wsname)
+            names.add(self.wsname.replace('/', ''))
+            base, _, quote = self.wsname.partition('/')
+            base = _ASSET_ALIASES.get(base, base)
+            quote = _ASSET_ALIASES.get(quote, quote)
+            names.add(f"{base}/{quote}")
+            names.add(f"{base}{quote}")
+        return {n.upper() for n in names}
+
+    def __repr__(self):
+        return (f"PairInfo(name='{self.name}', altname='{self.altname}', wsname='{self.wsname}', "
+                f"tick_size={self.tick_size}, lot_decimals={self.lot_decimals}, ordermin={self.ordermin})")
+
+
+class PairRegistry:
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, max_age=DEFAULT_MAX_AGE, rate_limiter=RATE_LIMITER):
+        """
+        Args:
+            cache_path (str): JSON file holding the last AssetPairs result.
+            max_age (float): Seconds before the disk cache is refreshed from the exchange.
+            rate_limiter (RateLimiter, optional): Limiter used for the AssetPairs request.
+        """
+        self.cache_path = cache_path
+        self.max_age = max_age
+        self.rate_limiter = rate_limiter
+        self._lock = threading.Lock()
+        self._pairs = {}
+        self._index = {}
+        self._loaded_at = None
+        self._failed_at = None
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def load(self, refresh=False):
+        """
+        Build the index from the disk cache, fetching AssetPairs when the
+        cache is missing, older than max_age or refresh is set. A stale
+        cache is still used if the exchange cannot be reached.
+        """
+        with self._lock:
+            cached = self._read_cache()
+            fresh = cached is not None and time.time() - cached['fetched_at'] < self.max_age
+            if fresh and not refresh:
+                self._build(cached['result'], cached['fetched_at'])
+                return self
+            try:
+                result = self._fetch()
+            except Exception as e:
+                if cached is None:
+                    raise
+                print(f"PairRegistry.load: using stale cache ({e})")
+                self._failed_at = time.time()
+                self._build(cached['result'], cached['fetched_at'])
+                return self
+            fetched_at = time.time()
+            self._write_cache(result, fetched_at)
+            self._build(result, fetched_at)
+            return self
+
+    def load_from(self, asset_pairs):
+        """
+        Build the index from an AssetPairs result dict without touching disk or network.
+        """
+        with self._lock:
+            self._build(asset_pairs, time.time())
+        return self
+
+    def _retry_pending(self):
+        return self._failed_at is not None and time.time() - self._failed_at < RETRY_AFTER
+
+    def _needs_load(self):
+        # Whether the next lookup would read the disk cache or call the exchange
+        if self._retry_pending():
+            return False
+        return self._loaded_at is None or time.time() - self._loaded_at >= self.max_age
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None:
+            if self._retry_pending():
+                raise RuntimeError("Pair registry unavailable")
+            try:
+                self.load()
+            except Exception:
+                self._failed_at = time.time()
+                raise
+        elif self._needs_load():
+            try:
+                self.load()
+            except Exception as e:
+                self._failed_at = time.time()
+                print(f"PairRegistry: refresh failed, keeping current index ({e})")
+
+    async def ensure_loaded_async(self):
+        """
+        Load or refresh the index in the default executor when the next
+        lookup would block on the disk cache or the AssetPairs request, so
+        async clients never stall their event loop. A failure is left for
+        the lookup to report, which it does without retrying until
+        RETRY_AFTER has passed.
+        """
+        if self._needs_load():
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._ensure_loaded)
+            except Exception:
+                pass
+
+    def _fetch(self):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire('AssetPairs')
+        # KRAKEN_API_URL points every client at another host, e.g. a cassette server
+        url = os.environ.get('KRAKEN_API_URL', DEFAULT_API_URL).rstrip('/') + ASSET_PAIRS_PATH
+        with urllib.request.urlopen(url, timeout=10) as response:
+            payload = json.loads(response.read())
+        if payload.get('error'):
+            raise RuntimeError(f"Kraken API error: {payload['error']}")
+        return payload['result']
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, 'r') as f:
+                cached = json.load(f)
+            return cached if 'result' in cached and 'fetched_at' in cached else None
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, result, fetched_at):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'fetched_at': fetched_at, 'result': result}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"PairRegistry: could not write cache ({e})")
+
+    def _build(self, asset_pairs, loaded_at):
+        pairs = {}
+        index = {}
+        for name, data in asset_pairs.items():
+            # '.d' entries are dark-pool duplicates of a regular pair
+            if name.endswith('.d'):
+                continue
+            info = PairInfo(name, data)
+            pairs[name] = info
+            for alias in info.aliases():
+                index.setdefault(alias, info)
+        self._pairs = pairs
+        self._index = index
+        self._loaded_at = loaded_at
+
+    def lookup(self, symbol):
+        """
+        Return the PairInfo for any alias of a pair, or None.
+        """
+        self._ensure_loaded()
+        return self._index.get(symbol.upper())
+
+    def resolve(self, symbol):
+        """
+        Like lookup, but raises UnknownPairError for symbols Kraken does not list.
+        """
+        info = self.lookup(symbol)
+        if info is None:
+            raise UnknownPairError(f"Unknown Kraken pair: {symbol}")
+        return info
+
+    def translate(self, symbol):
+        """
+        Translate any alias to Kraken's REST pair name.
+        Unknown pairs raise UnknownPairError. If the registry itself cannot
+        be loaded the symbol is passed through unchanged, so a metadata
+        outage does not stop trading.
+        """
+        try:
+            info = self.lookup(symbol)
+        except Exception:
+            return symbol
+        if info is None:
+            raise UnknownPairError(f"Unknown Kraken pair: {symbol}")
+        return info.name
+
+    def rest_name(self, symbol):
+        return self.resolve(symbol).name
+
+    def ws_name(self, symbol):
+        return self.resolve(symbol).wsname
+
+    def altname(self, symbol):
+        return self.resolve(symbol).altname
+
+    def is_valid(self, symbol):
+        return self.lookup(symbol) is not None
+
+    def split_valid(self, symbols):
+        """
+        Returns:
+            tuple: (valid, invalid) lists, order preserved
+        """
+        valid, invalid = [], []
+        for symbol in symbols:
+            (valid if self.is_valid(symbol) else invalid).append(symbol)
+        return valid, invalid
+
+    def validate_order(self, symbol, price, volume):
+        """
+        Check an order against the pair's precision, tick size and minimum
+        size, in decimal arithmetic so float rounding cannot pass or fail it.
+
+        Returns:
+            PairInfo: the resolved pair
+
+        Raises:
+            UnknownPairError: symbol is not a Kraken pair
+            ValueError: price or volume would be rejected by the exchange
+        """
+        info = self.resolve(symbol)
+        size = _decimal(volume)
+        if size < _decimal(info.ordermin):
+            raise ValueError(f"Volume {volume} is below ordermin {info.ordermin} for {info.altname}")
+        if size % Decimal(1).scaleb(-info.lot_decimals):
+            raise ValueError(f"Volume {volume} has more than {info.lot_decimals} decimals for {info.altname}")
+        if price is not None:
+            value = _decimal(price)
+            if value % Decimal(1).scaleb(-info.pair_decimals):
+                raise ValueError(f"Price {price} has more than {info.pair_decimals} decimals for {info.altname}")
+            if value % _decimal(info.tick_size):
+                raise ValueError(f"Price {price} is not a multiple of tick size {info.tick_size} for {info.altname}")
+        return info
+
+    def order_pair(self, symbol, price, volume):
+        """
+        REST pair name for an order that passes validate_order. Like
+        translate, if the registry itself cannot be loaded the symbol is
+        sent unchanged and unchecked, so a metadata outage does not stop
+        trading.
+
+        Raises:
+            UnknownPairError, ValueError: as validate_order
+        """
+        try:
+            self._ensure_loaded()
+        except Exception as e:
+            print(f"PairRegistry.order_pair: sending {symbol} unchecked ({e})")
+            return symbol
+        return self.validate_order(symbol, price, volume).name
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def __contains__(self, symbol):
+        return self.is_valid(symbol)
+
+
+# Shared by every client wrapper in the process; loads on first lookup
+PAIR_REGISTRY = PairRegistry()
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import OrderedDict
+
+"""
+Process-wide quote cache shared by the Kraken client wrappers.
+KrakenPythonClient, KrakenSyncClient (and the Plotter through it) read
+quotes through QUOTE_CACHE, so a pair fetched by one component is served
+to the others until its TTL runs out instead of hitting the exchange again.
+"""
+
+
+class _Flight:
+    """
+    One in-progress fetch that concurrent callers of the same key wait on.
+    """
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QuoteCache:
+    def __init__(self, default_ttl=0.25, max_pairs=512, clock=time.monotonic):
+        """
+        Args:
+            default_ttl (float): Seconds a quote stays fresh unless the pair has its own TTL.
+            max_pairs (int): Least recently used pairs are evicted beyond this many entries.
+            clock (callable): Monotonic time source, replaceable in tests.
+        """
+        self.default_ttl = default_ttl
+        self.max_pairs = max_pairs
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, fetched_at)
+        self._ttls = {}
+        self._inflight = {}
+        self._counters = dict.fromkeys(
+            ('hits', 'misses', 'stale', 'coalesced', 'evictions', 'errors'), 0
+        )
+
+    def set_ttl(self, key, ttl):
+        """
+        Set a freshness TTL for one pair. None restores the default.
+        """
+        with self._lock:
+            if ttl is None:
+                self._ttls.pop(key, None)
+            else:
+                self._ttls[key] = ttl
+
+    def get_ttl(self, key):
+        return self._ttls.get(key, self.default_ttl)
+
+    def get(self, key):
+        """
+        Return the cached value for key if it is still fresh, else None.
+        """
+        with self._lock:
+            return self._lookup(key)
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Return a fresh cached value or call fetch() to refresh it.
+        While a fetch for key is running, other callers of the same key
+        wait for its result instead of sending their own request.
+        Errors raised by fetch() are re-raised to every waiting caller.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fetch()
+            if flight.value is not None:
+                self.put(key, flight.value)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._counters['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def invalidate(self, key=None):
+        """
+        Drop one key, or every entry when key is None.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """
+        Return hit/miss/staleness counters and the current size.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+            lookups = stats['hits'] + stats['misses'] + stats['stale']
+            stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+            return stats
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Callers hold self._lock for the helpers below
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self._counters['misses'] += 1
+            return None
+        value, fetched_at = entry
+        if self._clock() - fetched_at >= self._ttls.get(key, self.default_ttl):
+            self._counters['stale'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._counters['hits'] += 1
+        return value
+
+    def _store(self, key, value):
+        self._entries[key] = (value, self._clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_pairs:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+
+# Shared by every client wrapper in the process
+QUOTE_CACHE = QuoteCache()
@@ -0,0 +1,368 @@
+import asyncio
+import heapq
+import itertools
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+"""
+Host-wide Kraken REST rate limiter.
+Models Kraken's API call counters (a counter that grows by a cost per call
+and decays at a fixed rate) per endpoint class. The counter state lives in a
+small file guarded by an OS file lock, so the collector, strategy
+subprocesses, the Plotter and the UIs all draw from the same budget.
+
+Within a process, callers of the same counter are served by priority:
+order placement first, then account queries, then market-data polling.
+Lower priorities also leave headroom on the shared counter so an order
+never finds it full because of polling.
+"""
+
+PRIORITY_ORDER = 0
+PRIORITY_ACCOUNT = 1
+PRIORITY_MARKET_DATA = 2
+
+# Counter each endpoint draws from and what one call costs
+ENDPOINT_COSTS = {
+    'Ticker': ('public', 1),
+    'Depth': ('public', 1),
+    'Trades': ('public', 1),
+    'OHLC': ('public', 1),
+    'Spread': ('public', 1),
+    'AssetPairs': ('public', 1),
+    'Assets': ('public', 1),
+    'Balance': ('private', 1),
+    'OpenOrders': ('private', 1),
+    'ClosedOrders': ('private', 1),
+    'QueryOrders': ('private', 1),
+    'GetWebSocketsToken': ('private', 1),
+    'TradesHistory': ('private', 2),
+    'Ledgers': ('private', 2),
+    'AddOrder': ('trading', 1),
+    'AddOrderBatch': ('trading', 1),
+    'CancelOrder': ('trading', 1),
+    'CancelOrderBatch': ('trading', 1),
+    'EditOrder': ('trading', 1),
+}
+
+DEFAULT_PRIORITY = {
+    'public': PRIORITY_MARKET_DATA,
+    'private': PRIORITY_ACCOUNT,
+    'trading': PRIORITY_ORDER,
+}
+
+# (max counter, decay per second) for each verification tier
+TIERS = {
+    'starter': {'public': (15, 1.0), 'private': (15, 0.33), 'trading': (60, 1.0)},
+    'intermediate': {'public': (15, 1.0), 'private': (20, 0.5), 'trading': (125, 2.34)},
+    'pro': {'public': (15, 1.0), 'private': (20, 1.0), 'trading': (180, 3.75)},
+}
+
+# Share of the counter kept free for higher priorities
+HEADROOM = {
+    PRIORITY_ORDER: 0.0,
+    PRIORITY_ACCOUNT: 0.1,
+    PRIORITY_MARKET_DATA: 0.2,
+}
+
+BUCKETS = ('public', 'private', 'trading')
+_HEADER = struct.Struct('d')   # wall-clock time of the boot the timestamps belong to
+_RECORD = struct.Struct('dd')  # counter level, last update (monotonic seconds)
+_STATE_SIZE = _HEADER.size + _RECORD.size * len(BUCKETS)
+# Boot times computed by different processes differ by clock adjustments only
+BOOT_TOLERANCE = 5.0
+
+
+class RateLimitTimeout(Exception):
+    pass
+
+
+def _boot_time():
+    # time.monotonic starts over at boot, so its readings are only
+    # comparable with readings taken since the same boot
+    return time.time() - time.monotonic()
+
+
+def _user_path(path):
+    root, ext = os.path.splitext(path)
+    user = os.getuid() if hasattr(os, 'getuid') else os.environ.get('USERNAME', 'user')
+    return f"{root}_{user}{ext}"
+
+
+class _SharedCounters:
+    """
+    Counter levels stored in a file and updated under an exclusive lock.
+    time.monotonic is system-wide, so timestamps are comparable between
+    processes; state written before the last reboot is discarded.
+
+    The file is opened on first use. If it belongs to another user, the
+    fallback path (if any) is used instead.
+    """
+    def __init__(self, path, fallback=None):
+        self.path = path
+        self.fallback = fallback
+        self._local = threading.Lock()
+        self._file = None
+
+    def _open(self):
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        except PermissionError:
+            if self.fallback is None:
+                raise
+            self.path, self.fallback = self.fallback, None
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._file = os.fdopen(fd, 'r+b', buffering=0)
+
+    def _lock(self):
+        self._local.acquire()
+        try:
+            if self._file is None:
+                self._open()
+        except BaseException:
+            self._local.release()
+            raise
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._local.release()
+
+    def update(self, func):
+        """
+        Run func(levels) under the lock, where levels maps bucket ->
+        [level, updated]. Changes to levels are written back.
+        """
+        self._lock()
+        try:
+            self._file.seek(0)
+            data = self._file.read(_STATE_SIZE)
+            boot = _boot_time()
+            # A new file, an older layout or state from before the last reboot starts empty
+            current = (len(data) == _STATE_SIZE
+                       and abs(_HEADER.unpack_from(data, 0)[0] - boot) <= BOOT_TOLERANCE)
+            levels = {}
+            for i, bucket in enumerate(BUCKETS):
+                if current:
+                    levels[bucket] = list(_RECORD.unpack_from(data, _HEADER.size + i * _RECORD.size))
+                else:
+                    levels[bucket] = [0.0, time.monotonic()]
+            result = func(levels)
+            self._file.seek(0)
+            self._file.write(_HEADER.pack(boot) + b''.join(_RECORD.pack(*levels[b]) for b in BUCKETS))
+            return result
+        finally:
+            self._unlock()
+
+
+class RateLimiter:
+    def __init__(self, tier='starter', path=None):
+        """
+        Args:
+            tier (str): Kraken verification tier ('starter', 'intermediate', 'pro').
+            path (str, optional): Counter file shared by all processes on the host.
+                The default is shared by every user that can open it; other
+                users get a file of their own.
+        """
+        self.limits = TIERS[tier]
+        if path is None:
+            default = os.path.join(tempfile.gettempdir(), 'kraken_rate_limits.bin')
+            self._counters = _SharedCounters(default, fallback=_user_path(default))
+        else:
+            self._counters = _SharedCounters(path)
+        self._cond = threading.Condition()
+        self._waiting = {bucket: [] for bucket in BUCKETS}
+        self._seq = itertools.count()
+        self.rate_limit_hits = 0
+
+    @property
+    def path(self):
+        return self._counters.path
+
+    def cost_of(self, endpoint):
+        return ENDPOINT_COSTS.get(endpoint, ('public', 1))
+
+    def _limit(self, bucket, priority):
+        max_count, _ = self.limits[bucket]
+        return max_count * (1 - HEADROOM.get(priority, 0.0))
+
+    def _request(self, endpoint, priority, cost):
+        """
+        Resolve the bucket, priority and cost of a call.
+
+        Raises:
+            ValueError: if the cost exceeds what the counter can ever hold
+                at that priority, since no amount of waiting would help.
+        """
+        bucket, default_cost = self.cost_of(endpoint)
+        if priority is None:
+            priority = DEFAULT_PRIORITY[bucket]
+        cost = default_cost if cost is None else cost
+        limit = self._limit(bucket, priority)
+        if cost > limit:
+            raise ValueError(f"Cost {cost} for {endpoint} exceeds the {bucket} counter limit of {limit:g}")
+        return bucket, priority, cost
+
+    def _take(self, bucket, cost, priority):
+        _, decay = self.limits[bucket]
+        limit = self._limit(bucket, priority)
+
+        def take(levels):
+            level, updated = levels[bucket]
+            now = time.monotonic()
+            level = max(0.0, level - max(0.0, now - updated) * decay)
+            if level + cost <= limit:
+                levels[bucket] = [level + cost, now]
+                return 0.0
+            levels[bucket] = [level, now]
+            return (level + cost - limit) / decay
+
+        return self._counters.update(take)
+
+    def try_acquire(self, endpoint, priority=None, cost=None):
+        """
+        Take budget for one call without waiting.
+
+        Returns:
+            float: 0 if the call may go now, else seconds until it could.
+        """
+        bucket, priority, cost = self._request(endpoint, priority, cost)
+        return self._take(bucket, cost, priority)
+
+    def _enqueue(self, bucket, priority):
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting[bucket], ticket)
+        return ticket
+
+    def _is_first(self, bucket, ticket):
+        with self._cond:
+            return self._waiting[bucket][0] == ticket
+
+    def _dequeue(self, bucket, ticket):
+        with self._cond:
+            queue = self._waiting[bucket]
+            queue.remove(ticket)
+            heapq.heapify(queue)
+            self._cond.notify_all()
+
+    def acquire(self, endpoint, priority=None, cost=None, timeout=None):
+        """
+        Block until the endpoint's counter has room, serving waiters of the
+        same counter in priority order.
+
+        Raises:
+            RateLimitTimeout: if timeout seconds pass first.
+            ValueError: if cost is more than the counter can hold.
+        """
+        bucket, priority, cost = self._request(endpoint, priority, cost)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = self._enqueue(bucket, priority)
+        try:
+            while True:
+                first = self._is_first(bucket, ticket)
+                wait = 0.05
+                if first:
+                    # The counter file is updated outside the condition, so
+                    # other threads can join the queue meanwhile
+                    wait = self._take(bucket, cost, priority)
+                    if wait == 0:
+                        return
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RateLimitTimeout(f"No rate budget for {endpoint} within {timeout}s")
+                    wait = min(wait, remaining)
+                with self._cond:
+                    # Skip the wait if this call reached the front meanwhile
+                    if (self._waiting[bucket][0] == ticket) == first:
+                        self._cond.wait(min(wait, 0.05))
+        finally:
+            self._dequeue(bucket, ticket)
+
+    async def acquire_async(self, endpoint, priority=None, cost=None):
+        """
+        Awaitable acquire for the async clients; sleeps on the event loop
+        instead of blocking it, and queues with the threads that use acquire.
+        """
+        bucket, priority, cost = self._request(endpoint, priority, cost)
+        ticket = self._enqueue(bucket, priority)
+        try:
+            while True:
+                wait = 0.05
+                if self._is_first(bucket, ticket):
+                    wait = self._take(bucket, cost, priority)
+                    if wait == 0:
+                        return
+                await asyncio.sleep(min(wait, 0.05))
+        finally:
+            self._dequeue(bucket, ticket)
+
+    def charge(self, endpoint, cost):
+        """
+        Add calls that were already sent, e.g. retries made inside one
+        client call, to the endpoint's counter without waiting.
+        """
+        bucket, _ = self.cost_of(endpoint)
+        _, decay = self.limits[bucket]
+
+        def add(levels):
+            level, updated = levels[bucket]
+            now = time.monotonic()
+            level = max(0.0, level - max(0.0, now - updated) * decay)
+            levels[bucket] = [level + cost, now]
+
+        self._counters.update(add)
+
+    def penalize(self, endpoint):
+        """
+        Record an 'EAPI:Rate limit exceeded' answer: fill the endpoint's
+        counter so every process backs off until it has decayed.
+        """
+        bucket, _ = self.cost_of(endpoint)
+        max_count, _ = self.limits[bucket]
+        self.rate_limit_hits += 1
+
+        def fill(levels):
+            levels[bucket] = [float(max_count), time.monotonic()]
+
+        self._counters.update(fill)
+
+    def levels(self):
+        """
+        Current decayed counter level per bucket.
+        """
+        def read(levels):
+            now = time.monotonic()
+            return {
+                bucket: max(0.0, level - max(0.0, now - updated) * self.limits[bucket][1])
+                for bucket, (level, updated) in levels.items()
+            }
+        return self._counters.update(read)
+
+
+def is_rate_limit_error(error):
+    return 'rate limit' in str(error).lower()
+
+
+# Shared by every client wrapper in the process
+RATE_LIMITER = RateLimiter(
+    tier=os.environ.get('KRAKEN_TIER', 'starter'),
+    path=os.environ.get('KRAKEN_RATE_LIMIT_FILE'),
+)
@@ -0,0 +1,314 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from rate_limiter import ENDPOINT_COSTS, is_rate_limit_error
+from client_metrics import classify_error
+
+"""
+Tail-latency policy for idempotent Kraken REST calls.
+A call that has not answered after the endpoint's recent p95 latency is
+hedged: a second identical request is sent and whichever answers first
+wins. Failed calls are retried with full-jitter exponential backoff, and
+an endpoint that keeps failing trips a circuit breaker so callers fail
+fast instead of queueing behind a broken edge node.
+
+Rate budget is taken before a request's latency is measured, so time
+spent queueing for budget neither triggers a hedge nor inflates the p95.
+A hedge is only sent if budget is free right away.
+
+Kraken errors caused by the request itself (an unknown pair, invalid
+arguments) are raised at once: a retry would fail the same way, and the
+endpoint answered, so they do not count towards its breaker.
+
+Only public endpoints are eligible; orders and account calls are never
+duplicated. The Rust client releases the GIL while a request is in
+flight, so the hedge runs in parallel on a worker thread.
+"""
+
+HEDGEABLE_ENDPOINTS = frozenset(
+    endpoint for endpoint, (bucket, _) in ENDPOINT_COSTS.items() if bucket == 'public'
+)
+
+# Kraken error families, and single errors, that every retry would repeat
+PERMANENT_ERROR_CLASSES = frozenset(('EQuery', 'EOrder'))
+PERMANENT_ERRORS = ('EGeneral:Invalid arguments',)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def is_permanent_error(error):
+    if classify_error(error) in PERMANENT_ERROR_CLASSES:
+        return True
+    text = str(error)
+    return any(message in text for message in PERMANENT_ERRORS)
+
+
+class LatencyTracker:
+    """
+    Recent latencies of one endpoint, in seconds.
+    """
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures. Once reset_timeout
+    has passed one trial call is let through; its outcome closes the
+    breaker or opens it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.opens = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def abandon_trial(self):
+        """
+        End a half-open trial that said nothing about the endpoint, e.g. one
+        refused for rate limit; the breaker waits out reset_timeout again.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opens += 1
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+
+
+class RequestPolicy:
+    def __init__(self, hedge=True, hedge_quantile=0.95, min_samples=20, default_hedge_delay=0.25,
+                 min_hedge_delay=0.01, max_retries=2, backoff_base=0.05, backoff_cap=1.0,
+                 failure_threshold=5, reset_timeout=10.0, max_workers=8, clock=time.monotonic):
+        """
+        Args:
+            hedge (bool): Send a backup request when the first one is slow.
+            hedge_quantile (float): Latency quantile used as the hedge delay.
+            min_samples (int): Samples needed before the quantile is trusted;
+                default_hedge_delay is used until then.
+            min_hedge_delay (float): Lower bound on the hedge delay in seconds.
+            max_retries (int): Retries after a failed attempt.
+            backoff_base (float): First retry backoff ceiling in seconds, doubled per retry.
+            backoff_cap (float): Largest backoff ceiling in seconds.
+            failure_threshold (int): Consecutive failures that open an endpoint's breaker.
+            reset_timeout (float): Seconds an open breaker waits before a trial call.
+            max_workers (int): Threads running hedged requests.
+            clock (callable): Monotonic time source, replaceable in tests.
+        """
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._breakers = {}
+        self._counters = dict.fromkeys(
+            ('calls', 'hedges', 'hedge_wins', 'hedges_skipped', 'retries', 'rejected'), 0
+        )
+
+    def applies_to(self, endpoint):
+        return endpoint in HEDGEABLE_ENDPOINTS
+
+    def latency(self, endpoint):
+        with self._lock:
+            tracker = self._latency.get(endpoint)
+            if tracker is None:
+                tracker = self._latency[endpoint] = LatencyTracker()
+            return tracker
+
+    def breaker(self, endpoint):
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = self._breakers[endpoint] = CircuitBreaker(
+                    self.failure_threshold, self.reset_timeout, self._clock
+                )
+            return breaker
+
+    def hedge_delay(self, endpoint):
+        tracker = self.latency(endpoint)
+        if len(tracker) < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, tracker.quantile(self.hedge_quantile))
+
+    def backoff(self, attempt):
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def call(self, endpoint, func, *args, acquire=None, try_acquire=None):
+        """
+        Run func(*args) under the policy: breaker check, hedging and
+        jittered retries. Rate-limit errors are raised at once; backing
+        off from those is the rate limiter's job. Permanent Kraken errors
+        (see is_permanent_error) are raised at once too.
+
+        Args:
+            acquire (callable, optional): Blocks until there is rate budget
+                for one request; called before every attempt.
+            try_acquire (callable, optional): Takes budget for one request
+                if it is free now and returns whether it did; a hedge is
+                only sent when it returns True.
+
+        Raises:
+            CircuitOpenError: the endpoint's breaker is open.
+        """
+        breaker = self.breaker(endpoint)
+        self._count('calls')
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self._count('rejected')
+                raise CircuitOpenError(f"Circuit open for {endpoint}")
+            sent = False
+            try:
+                if acquire is not None:
+                    acquire()
+                sent = True
+                if self.hedge:
+                    result = self._hedged(endpoint, func, args, try_acquire)
+                else:
+                    result = self._timed(endpoint, func, args)
+            except BaseException as e:
+                if not sent or not isinstance(e, Exception) or is_rate_limit_error(e):
+                    # Says nothing about the endpoint; a half-open trial must not stay pending
+                    breaker.abandon_trial()
+                    raise
+                if is_permanent_error(e):
+                    # The endpoint answered; the request was wrong
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._count('retries')
+                time.sleep(self.backoff(attempt - 1))
+                continue
+            breaker.record_success()
+            return result
+
+    def stats(self):
+        """
+        Counters plus per-endpoint p50/p95 latency and breaker state.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            endpoints = set(self._latency) | set(self._breakers)
+        stats['endpoints'] = {}
+        for endpoint in sorted(endpoints):
+            tracker = self.latency(endpoint)
+            breaker = self.breaker(endpoint)
+            stats['endpoints'][endpoint] = {
+                'p50': tracker.quantile(0.5),
+                'p95': tracker.quantile(0.95),
+                'samples': len(tracker),
+                'breaker': breaker.state,
+                'breaker_opens': breaker.opens,
+            }
+        return stats
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _timed(self, endpoint, func, args):
+        start = self._clock()
+        result = func(*args)
+        self.latency(endpoint).record(self._clock() - start)
+        return result
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix='kraken-hedge'
+                )
+            return self._executor
+
+    def _hedged(self, endpoint, func, args, try_acquire=None):
+        pool = self._pool()
+        primary = pool.submit(self._timed, endpoint, func, args)
+        done, _ = wait([primary], timeout=self.hedge_delay(endpoint))
+        if done:
+            return primary.result()
+        if try_acquire is not None and not try_acquire():
+            # Budget is short, so a hedge would only take it from other calls
+            self._count('hedges_skipped')
+            return primary.result()
+
+        self._count('hedges')
+        backup = pool.submit(self._timed, endpoint, func, args)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        self._count('hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error
@@ -0,0 +1,429 @@
+import json
+import math
+import os
+import struct
+import threading
+import time
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+from bars import INTERVALS, Bar
+from top_of_book import TopOfBook
+
+"""
+Market data shared between processes through multiprocessing.shared_memory.
+One MarketDataPublisher writes top of book, L2 books and bars for every
+pair; any number of strategy processes read them with MarketDataReader,
+straight from the shared pages, with no pickling, pipes or sockets. N
+strategies cost one feed instead of N.
+
+    publisher = MarketDataPublisher(pairs, depth=10).start(books=feed.books, aggregator=bars)
+    subprocess.run(cmd, env={**os.environ, **publisher.env()})
+
+    reader = MarketDataReader()          # in the strategy, name from the environment
+    reader.top_of_book('XBT/USD')
+    reader.bars('XBT/USD', '1m', 20)
+
+The bus is four segments: '<name>' holds the layout (pairs, depth,
+intervals, bars kept) and is created last, once the other three exist;
+'<name>_top', '<name>_book' and '<name>_bars' hold one fixed-size slot per
+pair (per pair and interval for bars). Every slot starts with a 64-bit
+sequence number followed by float64 fields, and is guarded by a seqlock:
+the writer makes the sequence odd, writes the fields and makes it even
+again; a reader copies the fields out and keeps them only if it saw the
+same even sequence before and after. Readers never block the writer.
+Aligned 8-byte stores are atomic on the platforms this runs on, and there
+is a single writer per bus.
+"""
+
+ENV_VAR = 'TRADEBYTE_MARKET_DATA'
+MAGIC = b'KMDB'
+VERSION = 1
+HEADER = struct.Struct('<4sII')  # magic, version, length of the JSON layout that follows
+SEGMENTS = ('top', 'book', 'bars')
+TOP_FIELDS = 5                   # bid, bid_size, ask, ask_size, timestamp
+BAR_FIELDS = len(Bar._fields)
+MAX_RETRIES = 1000
+
+# Segments created by this process; they stay registered with its resource tracker
+_created = set()
+
+
+def _book_fields(depth):
+    # timestamp, number of asks, number of bids, then (price, volume) per level
+    return 3 + 4 * depth
+
+
+def _bars_fields(capacity):
+    # number of bars, then the bars oldest first
+    return 1 + BAR_FIELDS * capacity
+
+
+def _create(name, size):
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    _created.add(shm.name)
+    return shm
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # Before 3.13 attaching registers the segment with this process's
+        # resource tracker, which would unlink it when the reader exits
+        if shm.name not in _created:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class _Layout:
+    """
+    Slot offsets, in 8-byte words, shared by the publisher and the readers.
+    """
+    def __init__(self, pairs, depth, intervals, capacity):
+        self.pairs = list(pairs)
+        self.index = {pair: i for i, pair in enumerate(self.pairs)}
+        self.depth = depth
+        self.intervals = list(intervals)
+        self.interval_index = {interval: i for i, interval in enumerate(self.intervals)}
+        self.capacity = capacity
+        self.fields = {
+            'top': TOP_FIELDS,
+            'book': _book_fields(depth),
+            'bars': _bars_fields(capacity),
+        }
+        self.slots = {
+            'top': len(self.pairs),
+            'book': len(self.pairs),
+            'bars': len(self.pairs) * len(self.intervals),
+        }
+
+    @classmethod
+    def from_metadata(cls, metadata):
+        return cls(metadata['pairs'], metadata['depth'], metadata['intervals'], metadata['capacity'])
+
+    def metadata(self):
+        return {'pairs': self.pairs, 'depth': self.depth, 'intervals': self.intervals, 'capacity': self.capacity}
+
+    def size(self, segment):
+        # Room for at least one word, since empty segments cannot be created
+        return 8 * max(1, self.slots[segment] * (1 + self.fields[segment]))
+
+    def offset(self, segment, pair, interval=None):
+        slot = self.index[pair]
+        if segment == 'bars':
+            slot = slot * len(self.intervals) + self.interval_index[interval]
+        return slot * (1 + self.fields[segment])
+
+
+class _Segment:
+    __slots__ = ('shm', 'seqs', 'words')
+
+    def __init__(self, shm):
+        self.shm = shm
+        # Two views of the same pages: sequence numbers as uint64, fields as float64
+        self.seqs = shm.buf.cast('Q')
+        self.words = shm.buf.cast('d')
+
+    def write(self, offset, values):
+        seq = self.seqs[offset]
+        self.seqs[offset] = seq + 1
+        self.words[offset + 1:offset + 1 + len(values)] = values
+        self.seqs[offset] = seq + 2
+
+    def read(self, offset, n):
+        """
+        Consistent copy of the first n fields of a slot as a list, or None
+        if the slot was never written.
+        """
+        seqs, words = self.seqs, self.words
+        for _ in range(MAX_RETRIES):
+            seq = seqs[offset]
+            if seq == 0:
+                return None
+            if not seq & 1:
+                values = words[offset + 1:offset + 1 + n].tolist()
+                if seqs[offset] == seq:
+                    return values
+            time.sleep(0)
+        raise TimeoutError(f"Shared memory slot {offset} in {self.shm.name} stayed mid-write")
+
+    def close(self, unlink=False):
+        self.seqs.release()
+        self.words.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+            _created.discard(self.shm.name)
+
+
+class MarketDataPublisher:
+    def __init__(self, pairs, depth=10, intervals=tuple(INTERVALS), capacity=100, name=None):
+        """
+        Args:
+            pairs (iterable): WebSocket pair names; the set is fixed for the
+                life of the bus.
+            depth (int): Book levels per side.
+            intervals (iterable): Bar intervals, as keys of a BarAggregator.
+            capacity (int): Most recent bars kept per pair and interval.
+            name (str, optional): Segment name; defaults to one derived from the pid.
+        """
+        self.layout = _Layout(pairs, depth, intervals, capacity)
+        if not self.layout.pairs:
+            raise ValueError("MarketDataPublisher needs at least one pair")
+        self.name = name or f'tradebyte_md_{os.getpid()}'
+        self._segments = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._book_versions = {}
+        self._latest_bars = {}
+        self.stats = dict.fromkeys(SEGMENTS, 0)  # slot writes per segment
+        try:
+            for segment in SEGMENTS:
+                self._segments[segment] = _Segment(_create(f'{self.name}_{segment}', self.layout.size(segment)))
+            layout = json.dumps(self.layout.metadata()).encode()
+            self._directory = _create(self.name, HEADER.size + len(layout))
+        except Exception:
+            self._close_segments()
+            raise
+        self._directory.buf[HEADER.size:HEADER.size + len(layout)] = layout
+        HEADER.pack_into(self._directory.buf, 0, MAGIC, VERSION, len(layout))
+
+    def env(self):
+        """
+        Environment entries that let a child process find the bus.
+        """
+        return {ENV_VAR: self.name}
+
+    def publish_top(self, top):
+        """
+        Publish a TopOfBook for one of the bus pairs.
+        """
+        values = array('d', (top.bid, top.bid_size, top.ask, top.ask_size, top.timestamp))
+        self._write('top', top.pair, values)
+
+    def clear_top(self, pair):
+        """
+        Mark the pair's top of book unavailable, e.g. while its book is out of sync.
+        """
+        self._write('top', pair, array('d', (math.nan,) * TOP_FIELDS))
+
+    def publish_book(self, pair, depth, timestamp):
+        """
+        Publish a book as a Depth-style dict, {'asks': [[price, volume], ...],
+        'bids': [...]} best first; levels beyond the bus depth are dropped.
+        """
+        n = self.layout.depth
+        asks, bids = depth['asks'][:n], depth['bids'][:n]
+        values = array('d', bytes(8 * self.layout.fields['book']))
+        values[0], values[1], values[2] = timestamp, len(asks), len(bids)
+        for base, levels in ((3, asks), (3 + 2 * n, bids)):
+            for i, level in enumerate(levels):
+                values[base + 2 * i] = float(level[0])
+                values[base + 2 * i + 1] = float(level[1])
+        self._write('book', pair, values)
+
+    def publish_bars(self, pair, interval, bars):
+        """
+        Publish the most recent bars of one interval, oldest first.
+        """
+        bars = bars[-self.layout.capacity:]
+        values = array('d', [len(bars)])
+        for bar in bars:
+            values.extend(bar)
+        self._write('bars', pair, values, interval)
+
+    def _write(self, segment, pair, values, interval=None):
+        offset = self.layout.offset(segment, pair, interval)
+        with self._lock:
+            self._segments[segment].write(offset, values)
+            self.stats[segment] += 1
+
+    def sync(self, books=None, aggregator=None):
+        """
+        Publish whatever changed since the last sync from an OrderBookManager
+        (books and top of book) and a BarAggregator.
+        """
+        if books is not None:
+            known = set(books.pairs())
+            for pair in self.layout.pairs:
+                if pair in known:
+                    self._sync_book(books, pair)
+        if aggregator is not None:
+            for pair in self.layout.pairs:
+                for interval in self.layout.intervals:
+                    self._sync_bars(aggregator, pair, interval)
+
+    def _sync_book(self, books, pair):
+        with books.locked(pair) as book:
+            version = (book.updates, book.synced)
+            if self._book_versions.get(pair) == version:
+                return
+            self._book_versions[pair] = version
+            timestamp = book.updated_at or 0.0
+            depth = book.to_depth(self.layout.depth) if book.synced else None
+            top = book.top_of_book() if book.synced else None
+        if depth is None:
+            self.publish_book(pair, {'asks': [], 'bids': []}, timestamp)
+            self.clear_top(pair)
+            return
+        self.publish_book(pair, depth, timestamp)
+        if top is not None:
+            self.publish_top(top)
+
+    def _sync_bars(self, aggregator, pair, interval):
+        latest = aggregator.latest(pair, interval)
+        if latest is None or self._latest_bars.get((pair, interval)) == latest:
+            return
+        self._latest_bars[(pair, interval)] = latest
+        self.publish_bars(pair, interval, aggregator.bars(pair, interval, self.layout.capacity))
+
+    def start(self, books=None, aggregator=None, period=0.05):
+        """
+        Call sync() every period seconds on a daemon thread. Returns self.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(books, aggregator, period), name='shm-bus-publisher', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def _run(self, books, aggregator, period):
+        while not self._stop.wait(period):
+            try:
+                self.sync(books, aggregator)
+            except Exception as e:
+                print(f"MarketDataPublisher.sync: {e}")
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _close_segments(self):
+        for segment in self._segments.values():
+            segment.close(unlink=True)
+        self._segments = {}
+
+    def close(self):
+        """
+        Stop publishing and remove the segments. Attached readers keep their
+        mapping until they close it.
+        """
+        self.stop()
+        with self._lock:
+            self._directory.close()
+            self._directory.unlink()
+            _created.discard(self._directory.name)
+            self._close_segments()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class MarketDataReader:
+    def __init__(self, name=None):
+        """
+        Args:
+            name (str, optional): Bus name; defaults to the TRADEBYTE_MARKET_DATA
+                environment variable set by the process that started this one.
+        """
+        name = name or os.environ.get(ENV_VAR)
+        if not name:
+            raise ValueError(f"No market data bus given and {ENV_VAR} is not set")
+        self.name = name
+        directory = _attach(name)
+        try:
+            magic, version, length = HEADER.unpack_from(directory.buf, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{name} is not a version {VERSION} market data bus")
+            metadata = json.loads(bytes(directory.buf[HEADER.size:HEADER.size + length]))
+        finally:
+            directory.close()
+        self.layout = _Layout.from_metadata(metadata)
+        self._segments = {}
+        try:
+            for segment in SEGMENTS:
+                self._segments[segment] = _Segment(_attach(f'{name}_{segment}'))
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def pairs(self):
+        return list(self.layout.pairs)
+
+    @property
+    def intervals(self):
+        return list(self.layout.intervals)
+
+    def _read(self, segment, pair, n, interval=None):
+        if pair not in self.layout.index:
+            raise KeyError(f"{pair} is not published on {self.name}")
+        if segment == 'bars' and interval not in self.layout.interval_index:
+            raise KeyError(f"{interval} bars are not published on {self.name}")
+        return self._segments[segment].read(self.layout.offset(segment, pair, interval), n)
+
+    def top_of_book(self, pair):
+        """
+        Latest TopOfBook, or None if there is none or the book is out of sync.
+        """
+        values = self._read('top', pair, TOP_FIELDS)
+        if values is None or math.isnan(values[0]):
+            return None
+        return TopOfBook(pair, *values)
+
+    def book(self, pair, n=None):
+        """
+        {'asks': [[price, volume], ...], 'bids': [...], 'timestamp': t}, best
+        first and at most n levels, or None if no book was published. Both
+        sides are empty while the book is out of sync.
+        """
+        depth = self.layout.depth
+        values = self._read('book', pair, self.layout.fields['book'])
+        if values is None:
+            return None
+        n = depth if n is None else min(n, depth)
+        timestamp, n_asks, n_bids = values[0], min(int(values[1]), n), min(int(values[2]), n)
+        asks, bids = values[3:3 + 2 * depth], values[3 + 2 * depth:]
+        return {
+            'asks': [asks[i:i + 2] for i in range(0, 2 * n_asks, 2)],
+            'bids': [bids[i:i + 2] for i in range(0, 2 * n_bids, 2)],
+            'timestamp': timestamp,
+        }
+
+    def bars(self, pair, interval, n=None):
+        """
+        Up to n most recent bars, oldest first.
+        """
+        capacity = self.layout.capacity
+        n = capacity if n is None else min(n, capacity)
+        values = self._read('bars', pair, self.layout.fields['bars'], interval)
+        if values is None:
+            return []
+        count = int(values[0])
+        first = max(0, count - n)
+        bars = []
+        for i in range(first, count):
+            fields = values[1 + BAR_FIELDS * i:1 + BAR_FIELDS * (i + 1)]
+            fields[-1] = int(fields[-1])
+            bars.append(Bar(*fields))
+        return bars
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
+        self._segments = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
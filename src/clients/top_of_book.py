@@ -0,0 +1,54 @@
+"""
+Immutable top-of-book snapshot shared by the Kraken client wrappers.
+Every field comes from one exchange response, so bid, ask and spread
+always describe the same moment.
+"""
+
+
+class TopOfBook:
+    __slots__ = ('pair', 'bid', 'bid_size', 'ask', 'ask_size', 'timestamp')
+
+    def __init__(self, pair, bid, bid_size, ask, ask_size, timestamp):
+        set_field = object.__setattr__
+        set_field(self, 'pair', pair)
+        set_field(self, 'bid', float(bid))
+        set_field(self, 'bid_size', float(bid_size))
+        set_field(self, 'ask', float(ask))
+        set_field(self, 'ask_size', float(ask_size))
+        set_field(self, 'timestamp', float(timestamp))
+
+    @classmethod
+    def from_depth(cls, pair, depth):
+        """
+        Build a snapshot from one pair's Kraken Depth result,
+        {'asks': [[price, volume, timestamp], ...], 'bids': [...]}.
+        """
+        bid, bid_size, bid_ts = depth['bids'][0][:3]
+        ask, ask_size, ask_ts = depth['asks'][0][:3]
+        return cls(pair, bid, bid_size, ask, ask_size, max(float(bid_ts), float(ask_ts)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"TopOfBook is immutable (tried to set '{name}')")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"TopOfBook is immutable (tried to delete '{name}')")
+
+    @property
+    def mid(self):
+        return (self.bid + self.ask) / 2
+
+    @property
+    def spread(self):
+        return self.ask - self.bid
+
+    def __eq__(self, other):
+        if not isinstance(other, TopOfBook):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, f) for f in self.__slots__))
+
+    def __repr__(self):
+        return (f"TopOfBook(pair='{self.pair}', bid={self.bid}, bid_size={self.bid_size}, "
+                f"ask={self.ask}, ask_size={self.ask_size}, timestamp={self.timestamp})")
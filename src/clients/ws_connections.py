@@ -0,0 +1,290 @@
+import math
+import threading
+import time
+
+"""
+Multiplexed WebSocket connections for a large pair universe.
+Kraken accepts many pairs per subscription, so ConnectionManager carries a
+whole pair set, e.g. the collector's 156 pairs, on a few sockets instead of
+one connection per pair. Pairs are sharded across connections by their
+observed message rate, so no socket carries much more traffic than the
+others. Pairs can be added or removed while running; the change is sent
+on an already open socket, and a periodic rebalance moves busy pairs off
+overloaded connections.
+
+    manager = ConnectionManager('ticker', pairs, on_update=handle).start()
+    manager.add_pairs(['DOT/USD'])
+    manager.stats()
+"""
+
+DEFAULT_MAX_PAIRS = 50
+# Messages per second one connection should carry at most
+DEFAULT_MAX_RATE = 400.0
+# Weight of the newest sample in the per-pair rate estimate
+RATE_SMOOTHING = 0.3
+
+
+def plan_shards(rates, max_pairs=DEFAULT_MAX_PAIRS, max_rate=DEFAULT_MAX_RATE):
+    """
+    Split pairs into as few shards as the limits allow, balancing message
+    rate by assigning the busiest pairs first to the least loaded shard.
+
+    Args:
+        rates (dict): pair -> messages per second.
+
+    Returns:
+        list: One list of pairs per shard.
+    """
+    if not rates:
+        return []
+    count = max(1, math.ceil(len(rates) / max_pairs))
+    if max_rate:
+        count = max(count, math.ceil(sum(rates.values()) / max_rate))
+    shards = [[] for _ in range(count)]
+    loads = [0.0] * count
+    for pair in sorted(rates, key=lambda p: (-rates[p], p)):
+        index = min((i for i in range(count) if len(shards[i]) < max_pairs), key=loads.__getitem__)
+        shards[index].append(pair)
+        loads[index] += rates[pair]
+    return shards
+
+
+class PairRates:
+    """
+    Smoothed messages-per-second estimate per pair.
+    """
+    def __init__(self, default_rate=1.0, clock=time.monotonic):
+        self.default_rate = default_rate
+        self._clock = clock
+        # Incremented without a lock; a lost count only nudges an estimate
+        self._counts = {}
+        self._rates = {}
+        self._sampled_at = clock()
+
+    def record(self, pair):
+        self._counts[pair] = self._counts.get(pair, 0) + 1
+
+    def sample(self):
+        """
+        Fold the counts since the last sample into the estimates.
+        """
+        now = self._clock()
+        elapsed = now - self._sampled_at
+        if elapsed <= 0:
+            return
+        counts, self._counts = self._counts, {}
+        self._sampled_at = now
+        for pair in set(counts) | set(self._rates):
+            rate = counts.get(pair, 0) / elapsed
+            previous = self._rates.get(pair)
+            self._rates[pair] = rate if previous is None else (
+                RATE_SMOOTHING * rate + (1 - RATE_SMOOTHING) * previous
+            )
+
+    def rate(self, pair):
+        return self._rates.get(pair, self.default_rate)
+
+    def forget(self, pair):
+        self._rates.pop(pair, None)
+        self._counts.pop(pair, None)
+
+
+class _Shard:
+    __slots__ = ('runner', 'pairs')
+
+    def __init__(self, runner, pairs):
+        self.runner = runner
+        self.pairs = set(pairs)
+
+
+class ConnectionManager:
+    def __init__(self, channel, pairs=(), on_update=None, depth=10, max_pairs=DEFAULT_MAX_PAIRS,
+                 max_rate=DEFAULT_MAX_RATE, imbalance=1.5, rebalance_interval=60.0,
+                 default_rate=1.0, client=None, clock=time.monotonic):
+        """
+        Args:
+            channel (str): 'ticker', 'book' or 'trade'.
+            pairs (iterable): WebSocket pair names to start with.
+            on_update (callable): Called with every update, from the connection threads.
+            depth (int): Book depth, for the 'book' channel.
+            max_pairs (int): Most pairs on one connection.
+            max_rate (float): Messages per second above which another connection is opened.
+            imbalance (float): Rebalance once the busiest connection carries this
+                multiple of the average load.
+            rebalance_interval (float): Seconds between automatic rebalances; None disables them.
+            default_rate (float): Rate assumed for a pair before it has been measured.
+            client (KrakenWsClient, optional): Opens the connections.
+            clock (callable): Monotonic time source, replaceable in tests.
+        """
+        if client is None:
+            from kraken_ws_client import KrakenWsClient
+            client = KrakenWsClient()
+        self.client = client
+        self.channel = channel
+        self.on_update = on_update
+        self.depth = depth
+        self.max_pairs = max_pairs
+        self.max_rate = max_rate
+        self.imbalance = imbalance
+        self.rebalance_interval = rebalance_interval
+        self.rates = PairRates(default_rate, clock)
+        self.moves = 0
+        self._initial = list(dict.fromkeys(pairs))
+        self._shards = []
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._maintenance = None
+
+    def start(self):
+        with self._lock:
+            for pairs in plan_shards({p: self.rates.rate(p) for p in self._initial},
+                                     self.max_pairs, self.max_rate):
+                self._open(pairs)
+        if self.rebalance_interval:
+            self._maintenance = threading.Thread(
+                target=self._maintain, name=f'kraken-ws-{self.channel}-rebalance', daemon=True
+            )
+            self._maintenance.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            shards, self._shards = self._shards, []
+        for shard in shards:
+            shard.runner.stop()
+
+    @property
+    def pairs(self):
+        with self._lock:
+            return {pair for shard in self._shards for pair in shard.pairs}
+
+    def connection_count(self):
+        with self._lock:
+            return len(self._shards)
+
+    def shard_of(self, pair):
+        """
+        Index of the connection carrying pair, or None.
+        """
+        with self._lock:
+            for index, shard in enumerate(self._shards):
+                if pair in shard.pairs:
+                    return index
+        return None
+
+    def add_pairs(self, pairs):
+        """
+        Subscribe pairs on the least loaded connections with room,
+        opening a new connection when all are full.
+        """
+        with self._lock:
+            current = self.pairs
+            new = [p for p in dict.fromkeys(pairs) if p not in current]
+            planned = {shard: set(shard.pairs) for shard in self._shards}
+            opened = []
+            for pair in sorted(new, key=lambda p: -self.rates.rate(p)):
+                candidates = [s for s, planned_pairs in planned.items() if len(planned_pairs) < self.max_pairs]
+                if candidates:
+                    planned[min(candidates, key=lambda s: self._load(planned[s]))].add(pair)
+                elif opened and len(opened[-1]) < self.max_pairs:
+                    opened[-1].append(pair)
+                else:
+                    opened.append([pair])
+            for shard, planned_pairs in planned.items():
+                added = sorted(planned_pairs - shard.pairs)
+                if added:
+                    shard.runner.subscription.add_pairs(added)
+                    shard.pairs.update(added)
+            for group in opened:
+                self._open(group)
+
+    def remove_pairs(self, pairs):
+        """
+        Unsubscribe pairs; connections left without pairs are closed.
+        """
+        removed = set(pairs)
+        with self._lock:
+            for shard in list(self._shards):
+                gone = shard.pairs & removed
+                if not gone:
+                    continue
+                shard.pairs -= gone
+                if shard.pairs:
+                    shard.runner.subscription.remove_pairs(sorted(gone))
+                else:
+                    self._shards.remove(shard)
+                    shard.runner.stop()
+            for pair in removed:
+                self.rates.forget(pair)
+
+    def rebalance(self):
+        """
+        Move pairs from the busiest connection to the quietest until the
+        load is within the imbalance factor, opening a connection first if
+        the total rate needs one. Returns the number of pairs moved.
+        """
+        moved = 0
+        with self._lock:
+            total = sum(self._load(s.pairs) for s in self._shards)
+            if self.max_rate and self._shards and total > len(self._shards) * self.max_rate:
+                self._open([])
+            while len(self._shards) > 1:
+                loads = [self._load(s.pairs) for s in self._shards]
+                busiest = max(range(len(loads)), key=loads.__getitem__)
+                quietest = min(range(len(loads)), key=loads.__getitem__)
+                mean = sum(loads) / len(loads)
+                if loads[busiest] <= self.imbalance * mean:
+                    break
+                gap = loads[busiest] - loads[quietest]
+                source, target = self._shards[busiest], self._shards[quietest]
+                # Largest pair whose move narrows the gap
+                movable = [p for p in source.pairs if self.rates.rate(p) < gap]
+                if not movable or len(target.pairs) >= self.max_pairs:
+                    break
+                pair = max(movable, key=self.rates.rate)
+                source.runner.subscription.remove_pairs([pair])
+                source.pairs.discard(pair)
+                target.runner.subscription.add_pairs([pair])
+                target.pairs.add(pair)
+                moved += 1
+            for shard in [s for s in self._shards if not s.pairs]:
+                self._shards.remove(shard)
+                shard.runner.stop()
+        self.moves += moved
+        return moved
+
+    def stats(self):
+        with self._lock:
+            shards = [(sorted(s.pairs), s.runner.subscription) for s in self._shards]
+        return {
+            'connections': len(shards),
+            'moves': self.moves,
+            'shards': [{
+                'pairs': len(pairs),
+                'rate': self._load(pairs),
+                'received': subscription.received,
+                'dropped': subscription.dropped,
+            } for pairs, subscription in shards],
+        }
+
+    def _load(self, pairs):
+        return sum(self.rates.rate(p) for p in pairs)
+
+    def _open(self, pairs):
+        # An empty shard subscribes nothing until pairs are moved onto it
+        runner = self.client.run(self.channel, list(pairs), self._dispatch, depth=self.depth)
+        self._shards.append(_Shard(runner, pairs))
+
+    def _dispatch(self, update):
+        self.rates.record(update.pair)
+        if self.on_update is not None:
+            self.on_update(update)
+
+    def _maintain(self):
+        while not self._stop.wait(self.rebalance_interval):
+            try:
+                self.rates.sample()
+                self.rebalance()
+            except Exception as e:
+                print(f"ConnectionManager.rebalance: {e}")
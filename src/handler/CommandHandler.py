@@ -9,10 +9,51 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../apps/data-collector")))
 from kraken_data import KrakenOrderBookCollector
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../clients")))
+from shm_bus import MarketDataPublisher
 
 class CommandHandler:
     def __init__(self):
-        pass
+        self.market_data = None
+
+    def serve_market_data(self, pairs, depth=10):
+        """
+        METHOD: Bus (Pairs)
+        Example: Bus XBT/USD ETH/USD
+        Publish books, top of book and bars for pairs to shared memory.
+        Strategies started afterwards find the bus through their environment.
+        """
+        # Imported here so the handler still loads without the rust_ws_py build
+        from bars import BarAggregator
+        from kraken_ws_client import KrakenWsClient
+
+        if self.market_data is not None:
+            print(f"Market data bus already running: {self.market_data['publisher'].name}")
+            return
+
+        client = KrakenWsClient()
+        feed = client.books(pairs, depth)
+        trades = None
+        try:
+            aggregator = BarAggregator()
+            trades = client.run('trade', pairs, aggregator.on_trades)
+            publisher = MarketDataPublisher(pairs, depth).start(books=feed.books, aggregator=aggregator)
+        except Exception:
+            # e.g. the shared-memory name is taken; don't leave the feeds running
+            if trades is not None:
+                trades.stop()
+            feed.stop()
+            raise
+        self.market_data = {'publisher': publisher, 'feed': feed, 'trades': trades}
+        print(f"Market data bus {publisher.name} serving {', '.join(pairs)}")
+
+    def stop_market_data(self):
+        if self.market_data is None:
+            return
+        self.market_data['trades'].stop()
+        self.market_data['feed'].stop()
+        self.market_data['publisher'].close()
+        self.market_data = None
 
     def start(self, strategy: str, exchange: str, *args, **kwargs):
         """
@@ -27,9 +68,12 @@ class CommandHandler:
             return
 
         cmd = [sys.executable, script_path, exchange] + list(args)
+        env = dict(os.environ)
+        if self.market_data is not None:
+            env.update(self.market_data['publisher'].env())
         
         try:
-            subprocess.run(cmd, check=True)
+            subprocess.run(cmd, check=True, env=env)
         except subprocess.CalledProcessError as e:
             print(f"Strategy execution failed: {e}")
 
@@ -59,7 +103,20 @@ class CommandHandler:
                 print('')
             except Exception as e:
                 print(f'!!!COMMAND ERROR!!! {e}')
+        elif "bus" in cmd:
+            try:
+                if len(cmd) > 1 and cmd[1] == "stop":
+                    self.stop_market_data()
+                elif len(cmd) > 1:
+                    self.serve_market_data(cmd[1:])
+                else:
+                    print('Example: bus XBT/USD ETH/USD')
+                    print('OR')
+                    print('Example: bus stop')
+            except Exception as e:
+                print(f'!!!COMMAND ERROR!!! {e}')
         elif "exit" in cmd or "quit" in cmd:
+            self.stop_market_data()
             sys.exit()
         elif "help" in cmd:
             try:
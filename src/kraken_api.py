@@ -2,47 +2,342 @@
 
 import os
 import sys
+import time
 import yaml
 import asyncio
+import numpy as np
 from kraken.spot import SpotAsyncClient
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "clients")))
+
+from top_of_book import TopOfBook
+from rate_limiter import RATE_LIMITER, is_rate_limit_error
+from pair_registry import PAIR_REGISTRY, UnknownPairError
+from client_metrics import METRICS
+
+
+def _normalize_pair(pair):
+    """
+    Reduce a pair name to a comparable form: 'XBT/USD', 'XBTUSD' and
+    'XXBTZUSD' all become 'XBTUSD'.
+    """
+    name = pair.upper().replace('/', '')
+    if len(name) == 8 and name[0] in 'XZ' and name[4] in 'XZ':
+        name = name[1:4] + name[5:]
+    if name.startswith('BTC'):
+        name = 'XBT' + name[3:]
+    elif name.startswith('DOGE'):
+        name = 'XDG' + name[4:]
+    return name
+
+
+def _book_arrays(book):
+    # Kraken sends [price_str, volume_str, timestamp] per level; one
+    # conversion builds each side as a single float64 block.
+    return {
+        side: np.array(book.get(side) or np.empty((0, 3)), dtype=np.float64).reshape(-1, 3)
+        for side in ('asks', 'bids')
+    }
+
+
+class RateBudget:
+    """
+    Async token bucket: at most `rate` requests per second, in bursts of
+    up to `burst`. One budget is shared by every request to a host.
+    """
+    def __init__(self, rate=5.0, burst=10):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        # asyncio.Lock binds to a loop, so it is made on first use in each loop
+        self._lock = None
+        self._lock_loop = None
+
+    def _loop_lock(self):
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def acquire(self):
+        async with self._loop_lock():
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class FanoutResult:
+    """
+    Outcome of a concurrent fan-out: per-pair results plus per-pair
+    errors, so one failing pair does not sink the batch.
+    """
+    __slots__ = ('results', 'errors')
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __repr__(self):
+        return f"FanoutResult(results={len(self.results)}, errors={len(self.errors)})"
 
-import yaml
-import os
-import asyncio
-from kraken.spot import SpotAsyncClient
 
 class KrakenClient:
+    """
+    Async Kraken REST client.
+    One SpotAsyncClient session is opened on first use and reused until
+    close(). Prefer using it as an async context manager:
+
+        async with KrakenClient() as client:
+            book = await client.get_top_of_book('XXBTZUSD')
+    """
     def __init__(self):
         config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config", "config.yaml"))
         with open(config_path, "r") as f:
             config = yaml.safe_load(f)
         self.api_key = config['kraken']['api_key']
         self.api_secret = config['kraken']['api_secret']
+        self._client = None
+        self._client_loop = None
+        # Shared by every fan-out against the public REST host
+        self.public_budget = RateBudget()
+        # Host-wide Kraken call counters; None disables rate limiting
+        self.rate_limiter = RATE_LIMITER
+        # Symbol translation; None sends symbols as given
+        self.pair_registry = PAIR_REGISTRY
+        # Per-endpoint latency/error metrics; None disables recording
+        self.metrics = METRICS
+
+    def _rest_pair(self, pair):
+        if self.pair_registry is None:
+            return pair
+        return self.pair_registry.translate(pair)
+
+    async def _load_pairs(self):
+        # The first lookup may read the disk cache or fetch AssetPairs,
+        # which must not block the event loop
+        if self.pair_registry is not None:
+            await self.pair_registry.ensure_loaded_async()
 
-    async def _with_client(self, coro):
-        client = SpotAsyncClient(key=self.api_key, secret=self.api_secret)
+    def _split_known(self, pairs):
+        # Unknown pairs are answered locally instead of with a failed request
+        known, unknown = [], {}
+        for pair in pairs:
+            try:
+                self._rest_pair(pair)
+                known.append(pair)
+            except UnknownPairError as e:
+                unknown[pair] = e
+        return known, unknown
+
+    async def __aenter__(self):
+        await self._session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _session(self):
+        loop = asyncio.get_running_loop()
+        # A session is bound to the loop that created it, so a new loop
+        # (e.g. a later asyncio.run) needs its own session.
+        if self._client is not None and self._client_loop is not loop:
+            stale, stale_loop = self._client, self._client_loop
+            self._client, self._client_loop = None, None
+            await self._close_stale(stale, stale_loop)
+        if self._client is None:
+            # KRAKEN_API_URL points the session at another host, e.g. a cassette server
+            base_url = os.environ.get('KRAKEN_API_URL')
+            if base_url:
+                self._client = SpotAsyncClient(key=self.api_key, secret=self.api_secret, url=base_url)
+            else:
+                self._client = SpotAsyncClient(key=self.api_key, secret=self.api_secret)
+            self._client_loop = loop
+        return self._client
+
+    @staticmethod
+    async def _close_stale(client, loop):
+        # Close the old session on its own loop while that loop still runs;
+        # otherwise here, so its connector is released either way
         try:
-            return await coro(client)
-        finally:
+            if loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.async_close(), loop))
+            else:
+                await client.async_close()
+        except Exception as e:
+            print(f"KrakenClient._session: closing previous session: {e}")
+
+    async def close(self):
+        """
+        Close the pooled session. The next call opens a new one.
+        """
+        client, self._client, self._client_loop = self._client, None, None
+        if client is not None:
             await client.async_close()
 
+    async def _request(self, method, path, params=None):
+        """
+        One REST call on the pooled session, paced by the shared rate limiter.
+        """
+        endpoint = path.rsplit("/", 1)[-1]
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(endpoint)
+        client = await self._session()
+        start = time.perf_counter()
+        try:
+            result = await client.request(method, path, params=params)
+        except Exception as e:
+            if self.metrics is not None:
+                self.metrics.observe(endpoint, time.perf_counter() - start, e)
+            if self.rate_limiter is not None and is_rate_limit_error(e):
+                self.rate_limiter.penalize(endpoint)
+            raise
+        if self.metrics is not None:
+            self.metrics.observe(endpoint, time.perf_counter() - start)
+        return result
+
     async def get_balance(self):
-        return await self._with_client(lambda client: client.request("POST", "/0/private/Balance"))
+        return await self._request("POST", "/0/private/Balance")
 
     async def get_clean_orderbook(self, depth=1, pair='XXBTZUSD'):
-        async def fetch(client):
-            res = await client.request("GET", "/0/public/Depth", params={"pair": pair, "count": depth})
-            asks = [ask[0] for ask in res[pair].get('asks', [])]
-            bids = [bid[0] for bid in res[pair].get('bids', [])]
-            return asks, bids
-        return await self._with_client(fetch)
+        await self._load_pairs()
+        pair = self._rest_pair(pair)
+        res = await self._request("GET", "/0/public/Depth", params={"pair": pair, "count": depth})
+        asks = [ask[0] for ask in res[pair].get('asks', [])]
+        bids = [bid[0] for bid in res[pair].get('bids', [])]
+        return asks, bids
+
+    async def get_orderbook(self, depth=100, pair='XXBTZUSD'):
+        """
+        Order book with volumes and timestamps.
+
+        Returns:
+            dict: 'asks' and 'bids' as C-contiguous float64 arrays of shape
+            (levels, 3) with columns price, volume, timestamp, best level first.
+        """
+        await self._load_pairs()
+        pair = self._rest_pair(pair)
+        res = await self._request("GET", "/0/public/Depth", params={"pair": pair, "count": depth})
+        return _book_arrays(next(iter(res.values())))
+
+    async def get_top_of_book(self, pair='XXBTZUSD'):
+        """
+        Best bid and ask with sizes from a single Depth(count=1) request.
+        """
+        await self._load_pairs()
+        pair = self._rest_pair(pair)
+        res = await self._request("GET", "/0/public/Depth", params={"pair": pair, "count": 1})
+        return TopOfBook.from_depth(pair, next(iter(res.values())))
 
     async def get_ask(self, pair='XXBTZUSD'):
-        orderbook = await self.get_clean_orderbook(depth=1, pair=pair)
-        return float(orderbook[0][0]) if orderbook and orderbook[0] else None
+        return (await self.get_top_of_book(pair)).ask
 
     async def get_bid(self, pair='XXBTZUSD'):
-        orderbook = await self.get_clean_orderbook(depth=1, pair=pair)
-        return float(orderbook[1][0]) if orderbook and orderbook[1] else None
+        return (await self.get_top_of_book(pair)).bid
+
+    async def _fan_out(self, jobs, worker, concurrency, budget):
+        """
+        Run worker(job, request, result) for every job. request(path, params)
+        is a public GET that holds one of `concurrency` slots and takes rate
+        budget, so every request a worker sends counts against both limits.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        budget = budget or self.public_budget
+        result = FanoutResult()
+
+        async def request(path, params):
+            async with semaphore:
+                await budget.acquire()
+                return await self._request("GET", path, params=params)
+
+        async def run(job):
+            try:
+                await worker(job, request, result)
+            except Exception as e:
+                for pair in (job if isinstance(job, list) else [job]):
+                    result.errors[pair] = e
+
+        await asyncio.gather(*(run(job) for job in jobs))
+        return result
+
+    async def gather_orderbooks(self, pairs, depth=10, concurrency=10, budget=None):
+        """
+        Fetch Depth for many pairs concurrently.
+
+        Args:
+            pairs (list): Pair names.
+            depth (int): Levels per side.
+            concurrency (int): Maximum requests in flight.
+            budget (RateBudget, optional): Rate budget, defaults to the client's public budget.
+
+        Returns:
+            FanoutResult: results maps pair -> {'asks': ndarray, 'bids': ndarray}
+            laid out like get_orderbook
+        """
+        async def worker(pair, request, result):
+            params = {"pair": self._rest_pair(pair), "count": depth}
+            res = await request("/0/public/Depth", params)
+            result.results[pair] = _book_arrays(next(iter(res.values())))
+
+        await self._load_pairs()
+        known, unknown = self._split_known(pairs)
+        result = await self._fan_out(known, worker, concurrency, budget)
+        result.errors.update(unknown)
+        return result
+
+    async def gather_tickers(self, pairs, chunk_size=50, concurrency=4, budget=None):
+        """
+        Fetch Ticker for many pairs with chunked comma-separated requests.
+        A chunk that Kraken rejects is retried pair by pair so only the
+        invalid pairs end up in errors.
+
+        Returns:
+            FanoutResult: results maps pair -> raw Kraken ticker dict
+        """
+        async def fetch(chunk, request):
+            rest_pairs = ",".join(self._rest_pair(pair) for pair in chunk)
+            return await request("/0/public/Ticker", {"pair": rest_pairs})
+
+        async def worker(chunk, request, result):
+            try:
+                res = await fetch(chunk, request)
+            except Exception:
+                if len(chunk) == 1:
+                    raise
+                # Each single-pair retry waits for its own concurrency slot
+                singles = await asyncio.gather(*(fetch([pair], request) for pair in chunk), return_exceptions=True)
+                for pair, res in zip(chunk, singles):
+                    if isinstance(res, Exception):
+                        result.errors[pair] = res
+                    else:
+                        result.results[pair] = next(iter(res.values()))
+                return
+            by_name = {_normalize_pair(key): value for key, value in res.items()}
+            for pair in chunk:
+                # Kraken answers with REST names; the heuristic only matters
+                # when the registry could not be loaded
+                value = res.get(self._rest_pair(pair), by_name.get(_normalize_pair(pair)))
+                if value is None and len(chunk) == 1 and len(res) == 1:
+                    value = next(iter(res.values()))
+                if value is None:
+                    result.errors[pair] = KeyError(f"{pair} missing from Ticker response")
+                else:
+                    result.results[pair] = value
+
+        await self._load_pairs()
+        pairs, unknown = self._split_known(pairs)
+        chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+        result = await self._fan_out(chunks, worker, concurrency, budget)
+        result.errors.update(unknown)
+        return result
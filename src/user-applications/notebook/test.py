@@ -22,15 +22,16 @@ max_per_order = 250
 
 def main():
     client = KrakenPythonClient()
-    eurusd = client.get_bid('EURUSD')
+    # One snapshot so bid and ask come from the same response
+    book = client.get_top_of_book('EURQUSD')
+    bid_price = book.bid
+    ask_price = book.ask
+
     eurq_balance = client.get_balance(asset)
-    eurq_value = eurq_balance * client.get_bid('EURQUSD')
+    eurq_value = eurq_balance * bid_price
     eur_balance = total_capital - eurq_value
     imbalance = (eurq_value - eur_balance) / total_capital
 
-    bid_price = client.get_bid('EURQUSD')
-    ask_price = client.get_ask('EURQUSD')
-
     bid_bias = max(0.5 - imbalance, 0)
     ask_bias = max(0.5 + imbalance, 0)
 
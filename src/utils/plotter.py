@@ -32,12 +32,14 @@ class Plotter:
             while True:
                 t = time.time() - t0
 
-                # Get the live bid and ask prices
-                bid = self.client.get_bid()
-                ask = self.client.get_ask()
-
-                if bid is None or ask is None:
-                    continue  # Skip if bid/ask is None
+                # Get the live bid and ask prices from one (cached) snapshot
+                book = self.client.get_top_of_book()
+                if book is None:
+                    # The client returns None after printing the error; retry shortly
+                    time.sleep(0.1)
+                    continue
+                bid = book.bid
+                ask = book.ask
 
                 # Calculate the midpoint between the bid and ask
                 midpoint = (bid + ask) / 2
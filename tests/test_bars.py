@@ -0,0 +1,83 @@
+# tests/test_bars.py
+
+import sys
+import os
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients')))
+from bars import BarAggregator, BarSeries
+
+
+def test_ohlcv_and_vwap_across_intervals():
+    completed = []
+    agg = BarAggregator(intervals=('1s', '1m'), on_bar=lambda pair, name, bar: completed.append((name, bar)))
+    agg.on_trade('XBT/USD', 100.0, 1.0, 60.2)
+    agg.on_trade('XBT/USD', 102.0, 3.0, 60.7)
+    agg.on_trade('XBT/USD', 99.0, 1.0, 61.1)
+
+    first, second = agg.bars('XBT/USD', '1s')
+    assert (first.start, first.open, first.high, first.low, first.close) == (60.0, 100.0, 102.0, 100.0, 102.0)
+    assert first.volume == 4.0 and first.vwap == 101.5 and first.trades == 2
+    assert second.open == 99.0
+    assert completed == [('1s', first)]
+
+    minute = agg.latest('XBT/USD', '1m')
+    assert (minute.open, minute.high, minute.low, minute.close, minute.volume) == (100.0, 102.0, 99.0, 99.0, 5.0)
+
+
+def test_gaps_are_filled_and_ring_wraps():
+    series = BarSeries(1, capacity=4)
+    series.add(10.0, 1.0, 0.5)
+    series.add(11.0, 1.0, 3.5)
+    assert [b.start for b in series.bars()] == [0.0, 1.0, 2.0, 3.0]
+    assert [b.close for b in series.bars()] == [10.0, 10.0, 10.0, 11.0]
+    assert series.bar(1).volume == 0.0
+
+    # A late trade lands in its own bar while it is still buffered
+    series.add(9.0, 2.0, 1.2)
+    assert series.bar(2).low == 9.0 and series.bar(2).volume == 2.0
+
+    series.add(12.0, 1.0, 5.0)
+    assert len(series) == 4
+    assert series.column('start') == [2.0, 3.0, 4.0, 5.0]
+    series.add(1.0, 1.0, 0.1)
+    assert series.late == 1
+
+
+def test_on_bar_reports_the_closed_bar_across_a_gap():
+    completed = []
+    agg = BarAggregator(intervals=('1s',), on_bar=lambda pair, name, bar: completed.append(bar))
+    agg.on_trade('XBT/USD', 100.0, 2.0, 0.5)
+    agg.on_trade('XBT/USD', 101.0, 1.0, 3.5)
+    assert [(b.start, b.volume) for b in completed] == [(0.0, 2.0), (1.0, 0.0), (2.0, 0.0)]
+
+    completed.clear()
+    sparse = BarAggregator(intervals=('1s',), capacity=3, on_bar=lambda pair, name, bar: completed.append(bar))
+    sparse.on_trade('XBT/USD', 100.0, 2.0, 0.5)
+    sparse.on_trade('XBT/USD', 101.0, 1.0, 50.5)
+    assert completed[0].start == 0.0 and completed[0].volume == 2.0
+    assert sparse.latest('XBT/USD', '1s').start == 50.0
+
+
+def test_trade_updates_and_ticks():
+    agg = BarAggregator(intervals=('5m',))
+    agg.on_trades(SimpleNamespace(pair='ETH/USD', trades=[(2000.0, 0.5, 300.0, 'b', 'l'),
+                                                           (2010.0, 0.5, 301.0, 's', 'm')]))
+    assert agg.latest('ETH/USD', '5m').vwap == 2005.0
+
+    agg.on_tick('SOL/USD', '99.0', '101.0', 600.0)
+    bar = agg.latest('SOL/USD', '5m')
+    assert bar.close == 100.0 and bar.vwap == 100.0 and bar.volume == 0.0
+    assert agg.bars('DOT/USD', '5m') == []
+
+
+def test_long_gap_fills_in_one_step_across_the_ring_end():
+    series = BarSeries(1, capacity=5)
+    for t in (0.5, 1.5, 2.5):
+        series.add(10.0 + t, 1.0, t)
+    # Fillers wrap from the last slot back to the first
+    assert series.add(20.0, 1.0, 100.5) == 98
+    assert [b.start for b in series.bars()] == [2.0, 97.0, 98.0, 99.0, 100.0]
+    assert [b.close for b in series.bars()] == [12.5, 12.5, 12.5, 12.5, 20.0]
+    assert [b.trades for b in series.bars()] == [1, 0, 0, 0, 1]
+    assert series.bar(1).volume == 0.0 and series.bar(1).vwap == 12.5
@@ -0,0 +1,100 @@
+# tests/test_cassette.py
+
+import sys
+import os
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients')))
+from cassette import Cassette, CassetteServer, request_key
+
+
+class FakeKraken(BaseHTTPRequestHandler):
+    calls = []
+
+    def _answer(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        FakeKraken.calls.append((self.command, self.path, self.headers.get('API-Key'), body))
+        answer = json.dumps({'error': [], 'result': {'path': self.path, 'n': len(FakeKraken.calls)}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(answer)))
+        self.end_headers()
+        self.wfile.write(answer)
+
+    do_GET = _answer
+    do_POST = _answer
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    FakeKraken.calls = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeKraken)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(url, body=None, headers=None):
+    request = urllib.request.Request(url, data=body, headers=headers or {})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def test_request_key_ignores_nonce_and_query_order():
+    a = request_key('POST', '/0/private/Balance', b'nonce=1&asset=XBT', 'application/x-www-form-urlencoded')
+    b = request_key('POST', '/0/private/Balance', b'asset=XBT&nonce=2', 'application/x-www-form-urlencoded')
+    assert a == b
+    assert request_key('GET', '/0/public/Depth?pair=XBTUSD&count=1') == \
+        request_key('GET', '/0/public/Depth?count=1&pair=XBTUSD')
+    c = request_key('POST', '/0/private/CancelOrderBatch', b'{"nonce":"5","orders":["A"]}', 'application/json')
+    d = request_key('POST', '/0/private/CancelOrderBatch', b'{"orders":["A"],"nonce":"6"}', 'application/json')
+    assert c == d
+
+
+def test_record_then_replay_offline(tmp_path, upstream):
+    path = str(tmp_path / 'kraken.json.gz')
+    with CassetteServer.open(path, mode='record', upstream=upstream) as server:
+        assert os.environ['KRAKEN_API_URL'] == server.url
+        first = fetch(server.url + '/0/public/Depth?pair=XBTUSD&count=1')
+        fetch(server.url + '/0/private/Balance', b'nonce=1', {'API-Key': 'key', 'API-Sign': 'sig'})
+    assert 'KRAKEN_API_URL' not in os.environ
+    assert FakeKraken.calls[1][2] == 'key'
+
+    cassette = Cassette.load(path)
+    assert len(cassette) == 2
+    with open(path, 'rb') as f:
+        assert b'API-Sign' not in f.read()
+
+    with CassetteServer.open(path, mode='replay', latency=0.05) as server:
+        start = time.monotonic()
+        assert fetch(server.url + '/0/public/Depth?count=1&pair=XBTUSD') == first
+        assert time.monotonic() - start >= 0.05
+        balance = fetch(server.url + '/0/private/Balance', b'nonce=99', {'API-Key': 'key'})
+        assert balance['result']['path'] == '/0/private/Balance'
+        with pytest.raises(urllib.error.HTTPError) as missing:
+            fetch(server.url + '/0/public/Ticker?pair=ETHUSD')
+        assert missing.value.code == 404
+        assert server.stats['missing'] == 1
+    assert len(FakeKraken.calls) == 2
+
+
+def test_repeats_replay_in_recorded_order(tmp_path, upstream):
+    path = str(tmp_path / 'kraken.json')
+    with CassetteServer.open(path, mode='record', upstream=upstream) as server:
+        for _ in range(2):
+            fetch(server.url + '/0/public/Ticker?pair=XBTUSD')
+    with CassetteServer.open(path, mode='replay') as server:
+        answers = [fetch(server.url + '/0/public/Ticker?pair=XBTUSD')['result']['n'] for _ in range(3)]
+    assert answers == [1, 2, 1]
@@ -0,0 +1,65 @@
+# tests/test_client_metrics.py
+
+import sys
+import os
+import gc
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients')))
+from client_metrics import ClientMetrics, LatencyHistogram, classify_error
+
+
+def test_histogram_percentiles_within_bucket_precision():
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    assert histogram.count == 1000
+    assert histogram.percentile(0.5) == pytest.approx(0.5, rel=0.07)
+    assert histogram.percentile(0.99) == pytest.approx(0.99, rel=0.07)
+    assert histogram.percentile(1.0) == 1.0
+    assert histogram.cumulative([0.1, 2.0]) == [pytest.approx(100, abs=7), 1000]
+
+
+def test_error_classes():
+    assert classify_error(RuntimeError("ParseError(\"Kraken API error: [String(\\\"EAPI:Rate limit exceeded\\\")]\")")) == 'rate_limit'
+    assert classify_error(RuntimeError("Kraken API error: ['EOrder:Insufficient funds']")) == 'EOrder'
+    assert classify_error(RuntimeError("HttpError(reqwest::Error { kind: Request })")) == 'http'
+    assert classify_error(TimeoutError('timed out')) == 'timeout'
+    assert classify_error(KeyError('x')) == 'KeyError'
+
+
+def test_timed_records_calls_errors_and_rate_limits():
+    metrics = ClientMetrics()
+    assert metrics.timed('Depth', lambda: 1) == 1
+
+    def limited():
+        raise RuntimeError("EAPI:Rate limit exceeded")
+
+    with pytest.raises(RuntimeError):
+        metrics.timed('Depth', limited)
+    depth = metrics.snapshot()['Depth']
+    assert depth['calls'] == 2
+    assert depth['errors'] == {'rate_limit': 1}
+    assert depth['rate_limit_hits'] == 1
+    assert depth['latency']['count'] == 2
+
+
+def test_prometheus_dump_and_transfer_sources():
+    class Client:
+        def transfer_stats(self):
+            return {'Ticker': (3, 0, 4096)}
+
+    metrics = ClientMetrics()
+    client = Client()
+    metrics.add_transfer_source(client.transfer_stats)
+    metrics.observe('Ticker', 0.02)
+    text = metrics.to_prometheus()
+    assert 'kraken_client_requests_total{endpoint="Ticker"} 1' in text
+    assert 'kraken_client_latency_seconds_bucket{endpoint="Ticker",le="0.025"} 1' in text
+    assert 'kraken_client_latency_seconds_bucket{endpoint="Ticker",le="+Inf"} 1' in text
+    assert 'kraken_client_bytes_received_total{endpoint="Ticker"} 4096' in text
+
+    del client
+    gc.collect()
+    assert metrics.transfer() == {}
@@ -0,0 +1,64 @@
+# tests/test_fanout.py
+
+import sys
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients')))
+from fanout import ALL, CONFLATE, SAMPLE, FanOut
+
+
+def tick(pair, price):
+    return SimpleNamespace(pair=pair, price=price)
+
+
+def test_policies_share_one_feed():
+    hub = FanOut()
+    every = hub.subscribe('strategy', ALL, maxsize=3)
+    latest = hub.subscribe('plotter', CONFLATE)
+    for i in range(5):
+        hub.publish(tick('XBT/USD', i))
+    hub.publish(tick('ETH/USD', 100))
+
+    assert [every.get(0).price for _ in range(3)] == [3, 4, 100]
+    assert every.stats['dropped'] == 3
+    assert every.get(0) is None
+
+    assert latest.get(0).price == 4
+    assert latest.get(0).price == 100
+    assert latest.stats['conflated'] == 4
+
+
+def test_sampling_limits_delivery_rate():
+    hub = FanOut()
+    ui = hub.subscribe('dash', SAMPLE, rate=20)
+    hub.publish(tick('XBT/USD', 1))
+    first = ui.get(1)
+    assert first['XBT/USD'].price == 1
+
+    start = time.monotonic()
+    hub.publish(tick('XBT/USD', 2))
+    hub.publish(tick('XBT/USD', 3))
+    second = ui.get(1)
+    assert time.monotonic() - start >= 0.04
+    assert second['XBT/USD'].price == 3
+
+
+def test_slow_callback_does_not_block_publisher():
+    hub = FanOut()
+    release = threading.Event()
+    seen = []
+    hub.subscribe('slow', CONFLATE, callback=lambda m: (release.wait(5), seen.append(m.price)))
+    fast = hub.subscribe('fast', ALL)
+
+    start = time.monotonic()
+    for i in range(1000):
+        hub.publish(tick('XBT/USD', i))
+    assert time.monotonic() - start < 1.0
+    assert fast.pending() == 1000
+
+    release.set()
+    hub.close()
+    assert seen and seen[-1] == 999 and len(seen) < 1000
@@ -0,0 +1,106 @@
+# tests/test_kraken_api.py
+
+import sys
+import os
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('kraken.spot')
+pytest.importorskip('numpy')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from kraken_api import KrakenClient, RateBudget
+
+
+class FakeKraken(KrakenClient):
+    """
+    KrakenClient answering REST calls from a handler instead of the network.
+    """
+    def __init__(self, handler):
+        self._client = None
+        self._client_loop = None
+        self.public_budget = RateBudget(rate=1000.0, burst=1000)
+        self.rate_limiter = None
+        self.pair_registry = None
+        self.metrics = None
+        self.handler = handler
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _request(self, method, path, params=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return self.handler(path, params)
+        finally:
+            self.in_flight -= 1
+
+
+def ticker_handler(path, params):
+    pairs = params['pair'].split(',')
+    if 'BADPAIR' in pairs:
+        raise RuntimeError("['EQuery:Unknown asset pair']")
+    return {pair: {'c': ['1.0', '1']} for pair in pairs}
+
+
+def test_rejected_chunk_isolates_bad_pair_within_concurrency():
+    client = FakeKraken(ticker_handler)
+    pairs = ['XBTUSD', 'ETHUSD', 'BADPAIR', 'SOLUSD', 'ADAUSD', 'DOTUSD']
+    result = asyncio.run(client.gather_tickers(pairs, chunk_size=6, concurrency=2))
+
+    assert not result.ok
+    assert set(result.errors) == {'BADPAIR'}
+    assert set(result.results) == set(pairs) - {'BADPAIR'}
+    assert client.max_in_flight <= 2
+
+
+def test_orderbook_errors_are_per_pair():
+    def handler(path, params):
+        if params['pair'] == 'ETHUSD':
+            raise ConnectionError('reset')
+        return {params['pair']: {'asks': [['101.0', '1.0', 0]], 'bids': [['100.0', '2.0', 0]]}}
+
+    client = FakeKraken(handler)
+    result = asyncio.run(client.gather_orderbooks(['XBTUSD', 'ETHUSD'], concurrency=1))
+    assert isinstance(result.errors['ETHUSD'], ConnectionError)
+    assert result.results['XBTUSD']['bids'][0][0] == 100.0
+    assert repr(result) == 'FanoutResult(results=1, errors=1)'
+
+
+def test_rate_budget_works_across_event_loops():
+    budget = RateBudget(rate=1000.0, burst=2)
+
+    async def take(n):
+        await asyncio.gather(*(budget.acquire() for _ in range(n)))
+
+    asyncio.run(take(4))
+    asyncio.run(take(4))
+
+
+class Session:
+    def __init__(self):
+        self.closed_on = None
+
+    async def async_close(self):
+        self.closed_on = asyncio.get_running_loop()
+
+
+def test_stale_session_is_closed_on_its_own_loop():
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever, daemon=True)
+    thread.start()
+    try:
+        session = Session()
+        asyncio.run(KrakenClient._close_stale(session, other))
+        assert session.closed_on is other
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join()
+        other.close()
+
+    # A finished asyncio.run leaves a closed loop; the session is closed here instead
+    session = Session()
+    asyncio.run(KrakenClient._close_stale(session, other))
+    assert session.closed_on is not None and session.closed_on is not other
@@ -0,0 +1,34 @@
+# tests/test_kraken_sync_client.py
+
+import sys
+import os
+import asyncio
+import concurrent.futures
+
+import pytest
+
+pytest.importorskip('kraken.spot')
+pytest.importorskip('numpy')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients')))
+from kraken_sync_client import KrakenSyncClient, _LoopThread
+
+
+def test_timed_out_call_is_cancelled_on_the_loop():
+    client = KrakenSyncClient.__new__(KrakenSyncClient)
+    client.timeout = 0.05
+    client._runner = _LoopThread()
+    cancelled = concurrent.futures.Future()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set_result(True)
+            raise
+
+    try:
+        with pytest.raises(concurrent.futures.TimeoutError):
+            client._run(slow())
+        assert cancelled.result(1)
+    finally:
+        client._runner.stop()
@@ -0,0 +1,89 @@
+# tests/test_order_book.py
+
+import sys
+import os
+import zlib
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients')))
+from order_book import ChecksumError, L2Book, OrderBookManager
+
+
+def level(price, volume):
+    # Same shape as a rust_ws_py BookUpdate level
+    return (float(price), float(volume), 1700000000.0, price, volume)
+
+
+def update(pair, asks=(), bids=(), snapshot=False, checksum=None):
+    return SimpleNamespace(pair=pair, asks=list(asks), bids=list(bids), snapshot=snapshot,
+                           checksum=checksum, recv_time=1700000000.0)
+
+
+def test_snapshot_delta_and_truncation():
+    book = L2Book('XBT/USD', depth=3)
+    book.apply_snapshot(
+        [level('101.0', '1.0'), level('102.0', '2.0'), level('103.0', '3.0')],
+        [level('100.0', '1.5'), level('99.0', '2.5'), level('98.0', '3.5')],
+    )
+    assert book.best_bid == (100.0, 1.5)
+    assert book.best_ask == (101.0, 1.0)
+    assert book.spread == 1.0
+
+    book.apply_update([level('100.5', '0.5')], [level('100.0', '0.00000000')])
+    assert book.best_ask == (100.5, 0.5)
+    assert book.best_bid == (99.0, 2.5)
+    # 103.0 fell out of the subscribed depth
+    assert book.asks.levels() == [(100.5, 0.5), (101.0, 1.0), (102.0, 2.0)]
+    assert book.bids.volume_at(98.0) == 3.5
+    assert book.asks.cumulative_volume(101.5) == 1.5
+    assert book.bids.cumulative_volume(98.0) == 6.0
+    assert book.bids.cumulative_volume(100.0) == 0.0
+
+
+def test_checksum_matches_kraken_format():
+    book = L2Book('XBT/USD')
+    book.apply_snapshot([level('0.05005', '0.00000500')], [level('0.05004', '1.50000000')])
+    expected = zlib.crc32(b'5005' + b'500' + b'5004' + b'150000000')
+    assert book.checksum() == expected
+
+    with pytest.raises(ChecksumError):
+        book.apply_update([level('0.05006', '1.00000000')], [], checksum=expected)
+    assert not book.synced
+
+
+def test_manager_resyncs_on_checksum_mismatch():
+    requested = []
+    manager = OrderBookManager(depth=10, resync=requested.append)
+    manager.on_update(update('ETH/USD', [level('2001.0', '1.0')], [level('2000.0', '1.0')], snapshot=True))
+    manager.on_update(update('ETH/USD', bids=[level('1999.0', '2.0')], checksum=12345))
+    assert requested == ['ETH/USD']
+    assert manager.top_of_book('ETH/USD') is None
+
+    # Deltas are ignored until the next snapshot
+    manager.on_update(update('ETH/USD', bids=[level('1998.0', '2.0')]))
+    assert manager.stats['ignored'] == 1
+    manager.on_update(update('ETH/USD', [level('2002.0', '1.0')], [level('2001.5', '1.0')], snapshot=True))
+    assert manager.top_of_book('ETH/USD').mid == 2001.75
+
+
+def test_invalidate_waits_for_snapshot():
+    manager = OrderBookManager()
+    manager.on_update(update('XBT/USD', [level('101.0', '1.0')], [level('100.0', '1.0')], snapshot=True))
+    manager.invalidate(['XBT/USD', 'ETH/USD'])
+    assert manager.top_of_book('XBT/USD') is None
+    manager.on_update(update('XBT/USD', [level('102.0', '1.0')], [level('101.0', '1.0')], snapshot=True))
+    assert manager.top_of_book('XBT/USD').bid == 101.0
+
+
+def test_book_returns_a_copy():
+    manager = OrderBookManager()
+    assert manager.book('XBT/USD') is None
+    manager.on_update(update('XBT/USD', [level('101.0', '1.0')], [level('100.0', '1.0')], snapshot=True))
+    copy = manager.book('XBT/USD')
+    manager.on_update(update('XBT/USD', [level('101.0', '5.0')], [level('99.0', '2.0')], snapshot=True))
+    assert copy.asks.volume_at(101.0) == 1.0
+    assert copy.bids.cumulative_volume(99.0) == 1.0
+    with manager.locked('XBT/USD') as live:
+        assert live.asks.volume_at(101.0) == 5.0
@@ -0,0 +1,61 @@
+# tests/test_orders_cache.py
+
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients')))
+from orders_cache import OrdersCache
+
+
+def order(pair='XBTUSD', side='buy', price='50000.0', vol='0.01', vol_exec='0.00000000', status='open'):
+    return {
+        'status': status, 'opentm': 1700000000.0, 'starttm': 0, 'expiretm': 0,
+        'descr': {'pair': pair, 'type': side, 'ordertype': 'limit', 'price': price, 'price2': '0'},
+        'vol': vol, 'vol_exec': vol_exec, 'cost': '0', 'fee': '0', 'price': '0',
+    }
+
+
+def test_diff_between_polls():
+    cache = OrdersCache()
+    diff = cache.update({'A': order(), 'B': order(side='sell', price='51000.0')})
+    assert [r.order_id for r in diff.added] == ['A', 'B']
+    assert cache.get('B').descr_price == 51000.0
+
+    assert not cache.update({'A': order(), 'B': order(side='sell', price='51000.0')})
+
+    diff = cache.update({'A': order(vol_exec='0.005'), 'C': order(pair='ETHEUR')})
+    assert [r.order_id for r in diff.added] == ['C']
+    assert [r.order_id for r in diff.changed] == ['A']
+    assert [r.order_id for r in diff.removed] == ['B']
+    assert cache.get('A').remaining == pytest.approx(0.005)
+    assert len(cache) == 2 and 'B' not in cache
+
+
+def test_unchanged_orders_are_not_reparsed():
+    cache = OrdersCache()
+    cache.update({'A': order()})
+    record = cache.get('A')
+    cache.update({'A': order()})
+    assert cache.get('A') is record
+
+
+def test_orders_filtered_by_pair():
+    cache = OrdersCache()
+    cache.update({'A': order(), 'B': order(pair='ETHEUR')})
+    assert [r.order_id for r in cache.orders('ETHEUR')] == ['B']
+
+
+def test_to_frame_empty_and_filtered():
+    pytest.importorskip('pandas')
+    cache = OrdersCache()
+    empty = cache.to_frame()
+    assert empty.empty
+    assert list(empty.columns) == ['order_id', 'descr_pair', 'descr_type', 'descr_price', 'vol', 'vol_exec']
+
+    cache.update({'A': order(), 'B': order(pair='ETHEUR', vol='2.5')})
+    df = cache.to_frame(pair='ETHEUR')
+    assert list(df['order_id']) == ['B']
+    assert df['vol'].iloc[0] == 2.5
+    assert 'opentm' in cache.to_frame(headers='*').columns
@@ -0,0 +1,141 @@
+# tests/test_pair_registry.py
+
+import sys
+import os
+import asyncio
+import json
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients')))
+from pair_registry import PairRegistry, UnknownPairError
+
+
+ASSET_PAIRS = {
+    'XXBTZUSD': {
+        'altname': 'XBTUSD', 'wsname': 'XBT/USD', 'base': 'XXBT', 'quote': 'ZUSD',
+        'pair_decimals': 1, 'lot_decimals': 8, 'tick_size': '0.1', 'ordermin': '0.0001',
+    },
+    'XXBTZUSD.d': {'altname': 'XBTUSD.d', 'base': 'XXBT', 'quote': 'ZUSD'},
+    'XETHZEUR': {
+        'altname': 'ETHEUR', 'wsname': 'ETH/EUR', 'base': 'XETH', 'quote': 'ZEUR',
+        'pair_decimals': 2, 'lot_decimals': 8, 'tick_size': '0.01', 'ordermin': '0.002',
+    },
+}
+
+
+def make_registry(tmp_path):
+    return PairRegistry(cache_path=str(tmp_path / 'asset_pairs.json'), rate_limiter=None).load_from(ASSET_PAIRS)
+
+
+def test_aliases_resolve_to_rest_name(tmp_path):
+    registry = make_registry(tmp_path)
+    for alias in ('XXBTZUSD', 'XBTUSD', 'XBT/USD', 'BTC/USD', 'btcusd'):
+        assert registry.translate(alias) == 'XXBTZUSD'
+    assert registry.ws_name('ETHEUR') == 'ETH/EUR'
+    assert registry.altname('XETHZEUR') == 'ETHEUR'
+    assert 'XXBTZUSD.d' not in registry
+    assert len(registry) == 2
+
+
+def test_unknown_pair_rejected_locally(tmp_path):
+    registry = make_registry(tmp_path)
+    with pytest.raises(UnknownPairError):
+        registry.translate('FOOBAR')
+    assert registry.split_valid(['XBTUSD', 'FOOBAR', 'ETH/EUR']) == (['XBTUSD', 'ETH/EUR'], ['FOOBAR'])
+
+
+def test_validate_order(tmp_path):
+    registry = make_registry(tmp_path)
+    assert registry.validate_order('XBTUSD', 50000.5, 0.001).name == 'XXBTZUSD'
+    with pytest.raises(ValueError):
+        registry.validate_order('XBTUSD', 50000.5, 0.00001)
+    with pytest.raises(ValueError):
+        registry.validate_order('XBTUSD', 50000.55, 0.001)
+
+
+def test_validate_order_checks_tick_size(tmp_path):
+    registry = PairRegistry(cache_path=str(tmp_path / 'asset_pairs.json'), rate_limiter=None).load_from({
+        'XXBTZUSD': dict(ASSET_PAIRS['XXBTZUSD'], tick_size='0.5'),
+    })
+    assert registry.validate_order('XBTUSD', 50000.5, 0.001)
+    with pytest.raises(ValueError, match='tick size'):
+        registry.validate_order('XBTUSD', 50000.3, 0.001)
+
+
+def test_load_uses_fresh_disk_cache(tmp_path):
+    path = tmp_path / 'asset_pairs.json'
+    path.write_text(json.dumps({'fetched_at': time.time(), 'result': ASSET_PAIRS}))
+    registry = PairRegistry(cache_path=str(path), rate_limiter=None)
+    registry._fetch = lambda: pytest.fail('fresh cache should not be refetched')
+    assert registry.translate('BTC/USD') == 'XXBTZUSD'
+
+
+def test_stale_cache_used_when_exchange_unreachable(tmp_path):
+    path = tmp_path / 'asset_pairs.json'
+    path.write_text(json.dumps({'fetched_at': 0, 'result': ASSET_PAIRS}))
+    registry = PairRegistry(cache_path=str(path), rate_limiter=None)
+
+    def offline():
+        raise OSError('offline')
+
+    registry._fetch = offline
+    assert registry.translate('ETH/EUR') == 'XETHZEUR'
+
+
+def test_orders_pass_through_when_registry_unavailable(tmp_path):
+    registry = PairRegistry(cache_path=str(tmp_path / 'missing.json'), rate_limiter=None)
+
+    def offline():
+        raise OSError('offline')
+
+    registry._fetch = offline
+    assert registry.order_pair('XBTUSD', 50000.55, 0.00001) == 'XBTUSD'
+    with pytest.raises(RuntimeError):
+        registry.validate_order('XBTUSD', 50000.5, 0.001)
+
+    registry.load_from(ASSET_PAIRS)
+    assert registry.order_pair('XBTUSD', 50000.5, 0.001) == 'XXBTZUSD'
+    with pytest.raises(ValueError):
+        registry.order_pair('XBTUSD', 50000.5, 0.00001)
+
+
+def test_async_load_runs_off_the_event_loop(tmp_path):
+    registry = PairRegistry(cache_path=str(tmp_path / 'asset_pairs.json'), rate_limiter=None)
+
+    def slow_fetch():
+        time.sleep(0.2)
+        return ASSET_PAIRS
+
+    registry._fetch = slow_fetch
+    ticks = 0
+
+    async def main():
+        nonlocal ticks
+        load = asyncio.ensure_future(registry.ensure_loaded_async())
+        while not load.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        await load
+
+    asyncio.run(main())
+    assert ticks > 5
+    assert registry.translate('XBT/USD') == 'XXBTZUSD'
+
+
+def test_failed_refresh_is_not_retried_on_every_lookup(tmp_path):
+    path = tmp_path / 'asset_pairs.json'
+    path.write_text(json.dumps({'fetched_at': 0, 'result': ASSET_PAIRS}))
+    registry = PairRegistry(cache_path=str(path), rate_limiter=None)
+    calls = []
+
+    def offline():
+        calls.append(1)
+        raise OSError('offline')
+
+    registry._fetch = offline
+    for _ in range(3):
+        assert registry.translate('ETH/EUR') == 'XETHZEUR'
+    asyncio.run(registry.ensure_loaded_async())
+    assert len(calls) == 1
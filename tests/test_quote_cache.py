@@ -0,0 +1,94 @@
+# tests/test_quote_cache.py
+
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients')))
+from quote_cache import QuoteCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry_counts_stale():
+    clock = FakeClock()
+    cache = QuoteCache(default_ttl=1.0, clock=clock)
+    calls = []
+    fetch = lambda: calls.append(1) or len(calls)
+
+    assert cache.get_or_fetch('XBTUSD', fetch) == 1
+    clock.now = 0.5
+    assert cache.get_or_fetch('XBTUSD', fetch) == 1
+    clock.now = 1.5
+    assert cache.get_or_fetch('XBTUSD', fetch) == 2
+
+    stats = cache.stats()
+    assert (stats['misses'], stats['hits'], stats['stale']) == (1, 1, 1)
+
+
+def test_per_pair_ttl():
+    clock = FakeClock()
+    cache = QuoteCache(default_ttl=10.0, clock=clock)
+    cache.set_ttl('ETHUSD', 0.1)
+    cache.put('ETHUSD', 1)
+    cache.put('XBTUSD', 2)
+    clock.now = 0.2
+    assert cache.get('ETHUSD') is None
+    assert cache.get('XBTUSD') == 2
+
+
+def test_lru_eviction():
+    cache = QuoteCache(default_ttl=10.0, max_pairs=2)
+    cache.put('A', 1)
+    cache.put('B', 2)
+    cache.get('A')
+    cache.put('C', 3)
+    assert cache.get('B') is None
+    assert cache.get('A') == 1
+    assert cache.stats()['evictions'] == 1
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = QuoteCache(default_ttl=10.0)
+    calls = []
+    started = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch('XBTUSD', fetch)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [42] * 8
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] >= 1
+
+
+def test_fetch_error_reaches_waiters_and_is_not_cached():
+    cache = QuoteCache(default_ttl=10.0)
+
+    def fetch():
+        raise RuntimeError('boom')
+
+    try:
+        cache.get_or_fetch('XBTUSD', fetch)
+        assert False, 'expected RuntimeError'
+    except RuntimeError:
+        pass
+    assert cache.get('XBTUSD') is None
+    assert cache.stats()['errors'] == 1
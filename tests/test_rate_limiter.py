@@ -0,0 +1,125 @@
+# tests/test_rate_limiter.py
+
+import sys
+import os
+import asyncio
+import struct
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients')))
+from rate_limiter import RateLimiter, RateLimitTimeout, PRIORITY_ORDER, PRIORITY_MARKET_DATA
+
+
+def test_counter_fills_and_reports_wait(tmp_path):
+    limiter = RateLimiter(tier='starter', path=str(tmp_path / 'limits.bin'))
+    # Market data may use 80% of the 15-call public counter
+    for _ in range(12):
+        assert limiter.try_acquire('Ticker') == 0
+    wait = limiter.try_acquire('Ticker')
+    assert 0 < wait <= 1.0
+
+
+def test_headroom_is_left_for_higher_priority(tmp_path):
+    limiter = RateLimiter(tier='starter', path=str(tmp_path / 'limits.bin'))
+    while limiter.try_acquire('Balance', priority=PRIORITY_MARKET_DATA) == 0:
+        pass
+    assert limiter.try_acquire('Balance', priority=PRIORITY_ORDER) == 0
+
+
+def test_state_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / 'limits.bin')
+    first = RateLimiter(tier='starter', path=path)
+    second = RateLimiter(tier='starter', path=path)
+    for _ in range(12):
+        assert first.try_acquire('Depth') == 0
+    assert second.try_acquire('Depth') > 0
+
+
+def test_acquire_times_out(tmp_path):
+    limiter = RateLimiter(tier='starter', path=str(tmp_path / 'limits.bin'))
+    limiter.penalize('OpenOrders')
+    try:
+        limiter.acquire('OpenOrders', timeout=0.1)
+        assert False, 'expected RateLimitTimeout'
+    except RateLimitTimeout:
+        pass
+    assert limiter.rate_limit_hits == 1
+
+
+def test_waiters_served_in_priority_order(tmp_path):
+    limiter = RateLimiter(tier='starter', path=str(tmp_path / 'limits.bin'))
+    limiter.limits = dict(limiter.limits, private=(2, 5.0))
+    limiter.acquire('Balance', priority=PRIORITY_ORDER)
+    limiter.acquire('Balance', priority=PRIORITY_ORDER)
+    served = []
+
+    def call(priority, name):
+        limiter.acquire('Balance', priority=priority, timeout=5)
+        served.append(name)
+
+    low = threading.Thread(target=call, args=(PRIORITY_ORDER + 1, 'low'))
+    high = threading.Thread(target=call, args=(PRIORITY_ORDER, 'high'))
+    low.start()
+    time.sleep(0.05)
+    high.start()
+    low.join()
+    high.join()
+    assert served == ['high', 'low']
+
+
+def test_file_is_opened_lazily_and_old_boot_state_discarded(tmp_path):
+    path = tmp_path / 'limits.bin'
+    limiter = RateLimiter(tier='starter', path=str(path))
+    assert not path.exists()
+
+    # Full counters stamped by an earlier boot, with timestamps from its monotonic clock
+    boot = time.time() - time.monotonic() - 3600
+    path.write_bytes(struct.pack('d', boot) + struct.pack('dd', 15.0, time.monotonic() + 1000) * 3)
+    for _ in range(12):
+        assert limiter.try_acquire('Ticker') == 0
+
+
+def test_charge_counts_calls_already_sent(tmp_path):
+    limiter = RateLimiter(tier='starter', path=str(tmp_path / 'limits.bin'))
+    limiter.charge('Ticker', 12)
+    assert limiter.try_acquire('Ticker') > 0
+    assert limiter.levels()['public'] >= 11.9
+
+
+def test_cost_above_the_limit_is_rejected(tmp_path):
+    limiter = RateLimiter(tier='starter', path=str(tmp_path / 'limits.bin'))
+    # 16 could never fit in the 12 calls market data may use
+    with pytest.raises(ValueError):
+        limiter.acquire('Ticker', cost=16, timeout=1)
+    with pytest.raises(ValueError):
+        limiter.try_acquire('Ticker', cost=16)
+    with pytest.raises(ValueError):
+        asyncio.run(limiter.acquire_async('Ticker', cost=16))
+    assert limiter.try_acquire('Ticker', cost=12) == 0
+
+
+def test_async_waiters_queue_behind_sync_waiters(tmp_path):
+    limiter = RateLimiter(tier='starter', path=str(tmp_path / 'limits.bin'))
+    limiter.limits = dict(limiter.limits, private=(2, 5.0))
+    limiter.acquire('Balance', priority=PRIORITY_ORDER)
+    served = []
+
+    def call():
+        # Needs the whole counter, so it waits for the first call to decay
+        limiter.acquire('Balance', priority=PRIORITY_ORDER, cost=2, timeout=5)
+        served.append('sync')
+
+    async def call_async():
+        # Would fit right away, but must not jump the queue
+        await limiter.acquire_async('Balance', priority=PRIORITY_ORDER)
+        served.append('async')
+
+    first = threading.Thread(target=call)
+    first.start()
+    time.sleep(0.05)
+    asyncio.run(call_async())
+    first.join()
+    assert served == ['sync', 'async']
@@ -0,0 +1,159 @@
+# tests/test_request_policy.py
+
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients')))
+from request_policy import CircuitOpenError, RequestPolicy
+
+
+def test_slow_primary_is_hedged():
+    policy = RequestPolicy(default_hedge_delay=0.05, max_retries=0)
+    calls = []
+    lock = threading.Lock()
+
+    def fetch():
+        with lock:
+            calls.append(1)
+            first = len(calls) == 1
+        time.sleep(1.0 if first else 0.01)
+        return 'slow' if first else 'fast'
+
+    start = time.monotonic()
+    assert policy.call('Ticker', fetch) == 'fast'
+    assert time.monotonic() - start < 0.5
+    stats = policy.stats()
+    assert stats['hedges'] == 1 and stats['hedge_wins'] == 1
+    policy.close()
+
+
+def test_fast_call_is_not_hedged():
+    policy = RequestPolicy(default_hedge_delay=0.5)
+    assert policy.call('Depth', lambda: 42) == 42
+    assert policy.stats()['hedges'] == 0
+    policy.close()
+
+
+def test_retries_with_backoff_then_succeeds():
+    policy = RequestPolicy(hedge=False, max_retries=2, backoff_base=0.001)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError('reset')
+        return 'ok'
+
+    assert policy.call('Ticker', flaky) == 'ok'
+    assert policy.stats()['retries'] == 2
+
+
+def test_rate_limit_errors_are_not_retried():
+    policy = RequestPolicy(hedge=False, max_retries=3)
+    attempts = []
+
+    def limited():
+        attempts.append(1)
+        raise RuntimeError("['EAPI:Rate limit exceeded']")
+
+    with pytest.raises(RuntimeError):
+        policy.call('Ticker', limited)
+    assert len(attempts) == 1
+
+
+def test_breaker_opens_and_recovers():
+    now = [0.0]
+    policy = RequestPolicy(hedge=False, max_retries=0, failure_threshold=2,
+                           reset_timeout=5.0, clock=lambda: now[0])
+
+    def broken():
+        raise ConnectionError('down')
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            policy.call('Depth', broken)
+    with pytest.raises(CircuitOpenError):
+        policy.call('Depth', lambda: 'ok')
+
+    now[0] = 6.0
+    assert policy.call('Depth', lambda: 'ok') == 'ok'
+    assert policy.stats()['endpoints']['Depth']['breaker'] == 'closed'
+
+
+def test_only_public_endpoints_apply():
+    policy = RequestPolicy()
+    assert policy.applies_to('Ticker')
+    assert not policy.applies_to('AddOrder')
+    assert not policy.applies_to('Balance')
+
+
+def test_budget_wait_is_not_timed_or_hedged():
+    policy = RequestPolicy(default_hedge_delay=0.05, max_retries=0)
+    assert policy.call('Ticker', lambda: 'ok', acquire=lambda: time.sleep(0.2)) == 'ok'
+    stats = policy.stats()
+    assert stats['hedges'] == 0
+    assert stats['endpoints']['Ticker']['p95'] < 0.1
+    policy.close()
+
+
+def test_hedge_skipped_without_free_budget():
+    policy = RequestPolicy(default_hedge_delay=0.02, max_retries=0)
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'slow'
+
+    assert policy.call('Ticker', slow, try_acquire=lambda: False) == 'slow'
+    assert len(calls) == 1
+    assert policy.stats()['hedges_skipped'] == 1
+    policy.close()
+
+
+def test_rate_limited_trial_reopens_breaker():
+    now = [0.0]
+    policy = RequestPolicy(hedge=False, max_retries=0, failure_threshold=1,
+                           reset_timeout=5.0, clock=lambda: now[0])
+
+    def broken():
+        raise ConnectionError('down')
+
+    def limited():
+        raise RuntimeError("['EAPI:Rate limit exceeded']")
+
+    with pytest.raises(ConnectionError):
+        policy.call('Depth', broken)
+    now[0] = 6.0
+    with pytest.raises(RuntimeError):
+        policy.call('Depth', limited)
+    assert policy.stats()['endpoints']['Depth']['breaker'] == 'open'
+    now[0] = 12.0
+    assert policy.call('Depth', lambda: 'ok') == 'ok'
+
+
+def test_permanent_errors_are_not_retried_or_counted():
+    policy = RequestPolicy(hedge=False, max_retries=3, failure_threshold=2, backoff_base=0.001)
+    attempts = []
+
+    def unknown_pair():
+        attempts.append(1)
+        raise RuntimeError("Kraken API error: [\"EQuery:Unknown asset pair\"]")
+
+    for _ in range(5):
+        with pytest.raises(RuntimeError):
+            policy.call('Depth', unknown_pair)
+    assert len(attempts) == 5
+    assert policy.breaker('Depth').state == 'closed'
+    assert policy.stats()['retries'] == 0
+
+    def invalid_arguments():
+        raise RuntimeError("['EGeneral:Invalid arguments']")
+
+    with pytest.raises(RuntimeError):
+        policy.call('Ticker', invalid_arguments)
+    assert policy.breaker('Ticker').failures == 0
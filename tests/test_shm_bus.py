@@ -0,0 +1,99 @@
+# tests/test_shm_bus.py
+
+import sys
+import os
+import subprocess
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+CLIENTS = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients'))
+sys.path.insert(0, CLIENTS)
+from bars import BarAggregator
+from order_book import OrderBookManager
+from shm_bus import ENV_VAR, MarketDataPublisher, MarketDataReader
+
+
+def bus_name():
+    return f'test_md_{uuid.uuid4().hex[:8]}'
+
+
+def level(price, volume):
+    return (float(price), float(volume), 0.0, price, volume)
+
+
+def book_update(pair, asks, bids):
+    return SimpleNamespace(pair=pair, asks=asks, bids=bids, snapshot=True, checksum=None, recv_time=10.0)
+
+
+def test_books_tops_and_bars_round_trip():
+    books = OrderBookManager(depth=3)
+    books.on_update(book_update(
+        'XBT/USD',
+        [level('101.0', '1.0'), level('102.0', '2.0')],
+        [level('100.0', '3.0'), level('99.0', '4.0'), level('98.0', '5.0')],
+    ))
+    aggregator = BarAggregator(intervals=('1m',))
+    for price, ts in ((100.0, 0.0), (105.0, 30.0), (103.0, 61.0)):
+        aggregator.on_trade('XBT/USD', price, 1.0, ts)
+
+    with MarketDataPublisher(['XBT/USD', 'ETH/USD'], depth=2, intervals=('1m',), capacity=5,
+                             name=bus_name()) as publisher:
+        publisher.sync(books, aggregator)
+        with MarketDataReader(publisher.name) as reader:
+            assert reader.pairs == ['XBT/USD', 'ETH/USD']
+            top = reader.top_of_book('XBT/USD')
+            assert (top.bid, top.bid_size, top.ask, top.ask_size) == (100.0, 3.0, 101.0, 1.0)
+            book = reader.book('XBT/USD')
+            assert book['asks'] == [[101.0, 1.0], [102.0, 2.0]]
+            assert book['bids'] == [[100.0, 3.0], [99.0, 4.0]]
+            assert reader.book('XBT/USD', 1)['bids'] == [[100.0, 3.0]]
+            bars = reader.bars('XBT/USD', '1m')
+            assert [(b.start, b.open, b.high, b.close, b.trades) for b in bars] == [
+                (0.0, 100.0, 105.0, 105.0, 2), (60.0, 103.0, 103.0, 103.0, 1)]
+            assert reader.top_of_book('ETH/USD') is None
+            assert reader.bars('ETH/USD', '1m') == []
+
+            # Nothing changed, so nothing is rewritten
+            writes = dict(publisher.stats)
+            publisher.sync(books, aggregator)
+            assert publisher.stats == writes
+
+            books.invalidate()
+            publisher.sync(books, aggregator)
+            assert reader.top_of_book('XBT/USD') is None
+            assert reader.book('XBT/USD')['bids'] == []
+
+
+def test_reader_in_another_process():
+    publisher = MarketDataPublisher(['XBT/USD'], depth=1, intervals=('1m',), name=bus_name())
+    try:
+        publisher.publish_book('XBT/USD', {'asks': [[101.0, 1.0]], 'bids': [[100.0, 2.0]]}, 5.0)
+        script = (
+            f"import sys; sys.path.insert(0, {CLIENTS!r})\n"
+            "from shm_bus import MarketDataReader\n"
+            "reader = MarketDataReader()\n"
+            "print(reader.book('XBT/USD')['bids'][0][0])\n"
+            "reader.close()\n"
+        )
+        env = dict(os.environ, **publisher.env())
+        for _ in range(2):
+            # A second run would fail if the first reader had unlinked the bus on exit
+            result = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True)
+            assert result.returncode == 0, result.stderr
+            assert result.stdout.strip() == '100.0'
+    finally:
+        publisher.close()
+
+
+def test_unknown_bus_and_pair(monkeypatch):
+    with pytest.raises(FileNotFoundError):
+        MarketDataReader(bus_name())
+    monkeypatch.delenv(ENV_VAR, raising=False)
+    with pytest.raises(ValueError):
+        MarketDataReader()
+    with MarketDataPublisher(['XBT/USD'], name=bus_name()) as publisher:
+        with MarketDataReader(publisher.name) as reader:
+            with pytest.raises(KeyError):
+                reader.top_of_book('DOGE/USD')
@@ -0,0 +1,95 @@
+# tests/test_ws_connections.py
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clients')))
+from ws_connections import ConnectionManager, plan_shards
+
+
+class FakeSubscription:
+    received = 0
+    dropped = 0
+
+    def __init__(self, pairs):
+        self.pairs = list(pairs)
+
+    def add_pairs(self, pairs):
+        self.pairs += pairs
+
+    def remove_pairs(self, pairs):
+        self.pairs = [p for p in self.pairs if p not in pairs]
+
+
+class FakeRunner:
+    def __init__(self, pairs, callback):
+        self.subscription = FakeSubscription(pairs)
+        self.callback = callback
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+
+class FakeClient:
+    def __init__(self):
+        self.runners = []
+
+    def run(self, channel, pairs, callback, depth=10):
+        runner = FakeRunner(pairs, callback)
+        self.runners.append(runner)
+        return runner
+
+
+def manager(pairs, **kwargs):
+    client = FakeClient()
+    kwargs.setdefault('rebalance_interval', None)
+    return ConnectionManager('ticker', pairs, client=client, **kwargs).start(), client
+
+
+def test_plan_respects_limits_and_balances_rate():
+    rates = {f'P{i}/USD': 1.0 for i in range(156)}
+    rates['XBT/USD'] = 100.0
+    shards = plan_shards(rates, max_pairs=50, max_rate=1000.0)
+    assert len(shards) == 4
+    assert all(len(s) <= 50 for s in shards)
+    assert sorted(p for s in shards for p in s) == sorted(rates)
+
+    assert len(plan_shards({'A': 300.0, 'B': 300.0, 'C': 300.0}, max_pairs=50, max_rate=400.0)) == 3
+
+
+def test_add_and_remove_pairs_at_runtime():
+    mgr, client = manager(['A', 'B', 'C'], max_pairs=2)
+    assert mgr.connection_count() == 2
+
+    mgr.add_pairs(['D', 'E'])
+    assert mgr.pairs == {'A', 'B', 'C', 'D', 'E'}
+    assert mgr.connection_count() == 3
+    assert all(len(r.subscription.pairs) <= 2 for r in client.runners)
+
+    shard = mgr.shard_of('E')
+    mgr.remove_pairs(['E'] + [p for p in mgr.pairs if mgr.shard_of(p) == shard])
+    assert mgr.connection_count() == 2
+    assert sum(r.stopped for r in client.runners) == 1
+
+
+def test_rebalance_moves_busy_pairs():
+    clock = [0.0]
+    mgr, client = manager(['A', 'B', 'C', 'D'], max_pairs=10, max_rate=None, clock=lambda: clock[0])
+    mgr.add_pairs(['E', 'F'])
+    assert mgr.connection_count() == 1
+    mgr._open([])
+
+    received = []
+    mgr.on_update = received.append
+    dispatch = client.runners[0].callback
+    for _ in range(100):
+        for pair in ('A', 'B', 'C'):
+            dispatch(type('Update', (), {'pair': pair})())
+    clock[0] = 1.0
+    mgr.rates.sample()
+
+    assert mgr.rebalance() >= 1
+    loads = [s['rate'] for s in mgr.stats()['shards']]
+    assert max(loads) <= 1.5 * sum(loads) / len(loads)
+    assert len(received) == 300